@@ -0,0 +1,121 @@
+#!/usr/bin/python
+"""
+Benchmark memory use of iCalendar import and export.
+
+Each measurement runs in a forked process and reports how much the peak
+resident set size grew, so that results for different calendar sizes do
+not interfere.  Streaming parsing and serialisation should stay flat as
+the number of events grows.
+"""
+
+import os
+import resource
+from datetime import datetime, timedelta
+
+from benchmark import *
+
+from schooltool.calendar.icalendar import read_icalendar
+from schooltool.calendar.icalendar import iter_calendar_ical
+from schooltool.calendar.icalendar import convert_calendar_to_ical
+from schooltool.calendar.simple import SimpleCalendarEvent
+
+
+class GeneratedICalendarFile(object):
+    """A file-like object with an iCalendar file of `count` events.
+
+    Lines are generated as they are read, so the file itself takes no
+    memory.
+    """
+
+    def __init__(self, count):
+        self.count = count
+
+    def read(self):
+        return ''.join(self)
+
+    def __iter__(self):
+        yield "BEGIN:VCALENDAR\r\n"
+        yield "VERSION:2.0\r\n"
+        yield "PRODID:-//SchoolTool.org/NONSGML SchoolTool//EN\r\n"
+        start = datetime(2005, 9, 1, 9, 0)
+        for n in xrange(self.count):
+            dtstart = start + timedelta(hours=n)
+            yield "BEGIN:VEVENT\r\n"
+            yield "UID:event-%d@example.com\r\n" % n
+            yield "SUMMARY:Event number %d\r\n" % n
+            yield "DTSTART:%sZ\r\n" % dtstart.strftime('%Y%m%dT%H%M%S')
+            yield "DURATION:PT45M\r\n"
+            yield "END:VEVENT\r\n"
+        yield "END:VCALENDAR\r\n"
+
+
+class GeneratedCalendar(object):
+    """A calendar that creates its `count` events while being iterated."""
+
+    def __init__(self, count):
+        self.count = count
+
+    def __iter__(self):
+        start = datetime(2005, 9, 1, 9, 0)
+        for n in xrange(self.count):
+            yield SimpleCalendarEvent(start + timedelta(hours=n),
+                                      timedelta(minutes=45),
+                                      "Event number %d" % n,
+                                      unique_id="event-%d@example.com" % n)
+
+
+def peak_memory_growth(fn):
+    """Return growth of peak RSS (in kilobytes) while running `fn`."""
+    read, write = os.pipe()
+    pid = os.fork()
+    if not pid:
+        os.close(read)
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        fn()
+        after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        os.write(write, str(after - before))
+        os._exit(0)
+    os.close(write)
+    result = int(os.read(read, 100))
+    os.close(read)
+    os.waitpid(pid, 0)
+    return result
+
+
+def parse(count):
+    def fn():
+        for event in read_icalendar(GeneratedICalendarFile(count)):
+            pass
+    return fn
+
+
+def export_streaming(count):
+    def fn():
+        out = open(os.devnull, 'w')
+        for line in iter_calendar_ical(GeneratedCalendar(count)):
+            out.write(line)
+            out.write("\r\n")
+        out.close()
+    return fn
+
+
+def export_list(count):
+    def fn():
+        out = open(os.devnull, 'w')
+        out.write("\r\n".join(convert_calendar_to_ical(
+            GeneratedCalendar(count))) + "\r\n")
+        out.close()
+    return fn
+
+
+def main():
+    for count in (1000, 10000, 50000):
+        print "%d events:" % count
+        print "  parse: %d KB" % peak_memory_growth(parse(count))
+        print "  streaming export: %d KB" % peak_memory_growth(
+            export_streaming(count))
+        print "  list export: %d KB" % peak_memory_growth(export_list(count))
+
+
+if __name__ == '__main__':
+    main()
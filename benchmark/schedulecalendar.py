@@ -0,0 +1,136 @@
+#!/usr/bin/python
+"""
+Benchmark schedule calendar synchronisation after a single day changes.
+
+Compares a full resync of a school year's schedule calendar with an
+incremental one that only touches the changed day.
+"""
+
+from datetime import datetime, date, time, timedelta
+
+from benchmark import *
+
+import pytz
+import transaction
+from ZODB.DB import DB
+from ZODB.MappingStorage import MappingStorage
+from zope.component import provideAdapter
+
+from schooltool.timetable.calendar import ImmutableScheduleCalendar
+from schooltool.timetable.calendar import ScheduleCalendar
+from schooltool.timetable.interfaces import IHaveSchedule
+from schooltool.timetable.interfaces import IImmutableScheduleCalendar
+from schooltool.timetable.schedule import Meeting
+
+
+class SectionStub(object):
+
+    title = 'Math'
+
+
+class PeriodStub(object):
+
+    def __init__(self, title):
+        self.title = title
+
+
+class YearScheduleStub(object):
+    """A school year with a few meetings every weekday."""
+
+    timezone = 'UTC'
+    first = date(2005, 9, 1)
+    last = date(2006, 6, 30)
+
+    periods = [PeriodStub(str(n)) for n in range(5)]
+
+    def __init__(self):
+        self.exceptions = {}
+
+    def iterMeetings(self, first, last=None):
+        if last is None:
+            last = first
+        tz = pytz.timezone(self.timezone)
+        day = max(first, self.first)
+        while day <= min(last, self.last):
+            if day.weekday() < 5:
+                start = self.exceptions.get(day, time(9, 0))
+                for n, period in enumerate(self.periods):
+                    dtstart = tz.localize(datetime.combine(day, start))
+                    yield Meeting(dtstart + timedelta(hours=n),
+                                  timedelta(minutes=45), period=period)
+            day += day.resolution
+
+
+class YearScheduleCalendar(ImmutableScheduleCalendar):
+
+    def makeGUID(self, date, period, int_ids=None):
+        return u'%s.%s' % (date.isoformat(), period.title)
+
+
+section = SectionStub()
+schedule = YearScheduleStub()
+db = DB(MappingStorage())
+connection = db.open()
+
+
+def setup_benchmark():
+    provideAdapter(lambda s: section, (YearScheduleStub, ), IHaveSchedule)
+    provideAdapter(YearScheduleCalendar, (YearScheduleStub, ),
+                   IImmutableScheduleCalendar)
+    calendar = ScheduleCalendar(section)
+    calendar.updateSchedule(schedule)
+    connection.root()['calendar'] = calendar
+    transaction.commit()
+
+
+def shift_day(day):
+    if schedule.exceptions.get(day) == time(10, 0):
+        schedule.exceptions[day] = time(9, 0)
+    else:
+        schedule.exceptions[day] = time(10, 0)
+
+
+CHANGED_DAY = date(2006, 1, 10)
+
+
+def update_all():
+    shift_day(CHANGED_DAY)
+    connection.root()['calendar'].updateSchedule(schedule)
+
+
+def update_changed_day():
+    shift_day(CHANGED_DAY)
+    connection.root()['calendar'].updateSchedule(
+        schedule, first=CHANGED_DAY, last=CHANGED_DAY)
+
+
+def committed(update):
+    def fn():
+        update()
+        transaction.commit()
+    return fn
+
+
+def changed_objects(update):
+    """Count objects an update modifies in a single transaction."""
+    txn = transaction.begin()
+    update()
+    count = len(connection._registered_objects)
+    txn.abort()
+    return count
+
+
+def main():
+    print "Setup took %.3f seconds." % measure(setup_benchmark)
+    print "Calendar has %d events." % len(connection.root()['calendar'])
+    benchmark("Full schedule calendar sync",
+              committed(update_all))
+    benchmark("Incremental schedule calendar sync",
+              committed(update_changed_day))
+    print "Objects changed by full sync: %d" % changed_objects(update_all)
+    print "Objects changed by incremental sync: %d" % changed_objects(
+        update_changed_day)
+
+
+if __name__ == '__main__':
+    main()
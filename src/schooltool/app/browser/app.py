@@ -57,7 +57,8 @@ from z3c.form.browser.checkbox import CheckBoxFieldWidget
 from z3c.form.interfaces import DISPLAY_MODE
 from zc.table.table import FormFullFormatter
 
-from schooltool.calendar.icalendar import convert_calendar_to_ical
+from schooltool.calendar.browser import calendarFeed
+from schooltool.calendar.icalendar import iter_calendar_ical
 from schooltool.app.browser.interfaces import IManageMenuViewletManager
 from schooltool.app.interfaces import ISchoolToolAuthenticationPlugin
 from schooltool.app.interfaces import ISchoolToolApplication
@@ -454,13 +455,17 @@ class ResultsButton(flourish.viewlet.Viewlet):
         item_ids = self.request[self.token_key]
         if not isinstance(item_ids, list):
             item_ids = [item_ids]
-        changed = False
         relationship_view = self.manager.view
-        for item in self.view_items(relationship_view):
-            if relationship_view.getKey(item) in item_ids:
-                self.process_item(relationship_view, item)
-                changed = True
-        return changed
+        items = [item for item in self.view_items(relationship_view)
+                 if relationship_view.getKey(item) in item_ids]
+        if not items:
+            return False
+        self.process_items(relationship_view, items)
+        return True
+
+    def process_items(self, relationship_view, items):
+        for item in items:
+            self.process_item(relationship_view, item)
 
     def update(self):
         self.processSearchResults()
@@ -1097,13 +1102,11 @@ class HTTPCalendarView(BrowserView):
     """Restive view for calendars"""
 
     def GET(self):
-        data = "\r\n".join(convert_calendar_to_ical(self.context)) + "\r\n"
-        request = self.request
-        request.response.setHeader('Content-Type',
-                                   'text/calendar; charset=UTF-8')
-        request.response.setHeader('Content-Length', len(data))
-        request.response.setStatus(200)
-        return data
+        result = calendarFeed(self.context, self.request,
+                              iter_calendar_ical)
+        if self.request.response.getStatus() != 304:
+            self.request.response.setStatus(200)
+        return result
 
     def PUT(self):
         request = self.request
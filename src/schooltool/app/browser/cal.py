@@ -19,6 +19,7 @@
 SchoolTool application views.
 """
 
+import heapq
 import urllib
 import calendar
 from datetime import datetime, date, time, timedelta
@@ -36,7 +37,7 @@ from zope.i18n import translate
 from zope.security.interfaces import ForbiddenAttribute, Unauthorized
 from zope.security.proxy import removeSecurityProxy
 from zope.proxy import sameProxiedObjects
-from zope.security.checker import canAccess, canWrite
+from zope.security.checker import canAccess, canWrite, ProxyFactory
 from zope.security import checkPermission
 from zope.schema import Date, TextLine, Choice, Int, Bool, List, Text
 from zope.schema.interfaces import RequiredMissing, ConstraintNotSatisfied
@@ -78,6 +79,8 @@ from schooltool.table.batch import IterableBatch
 from schooltool.table.table import label_cell_formatter_factory
 from schooltool.calendar.interfaces import ICalendar
 from schooltool.calendar.interfaces import IEditCalendar
+from schooltool.calendar.interfaces import IExpandedCalendarEvent
+from schooltool.calendar.mixins import ExpandedCalendarEvent
 from schooltool.calendar.recurrent import DailyRecurrenceRule
 from schooltool.calendar.recurrent import YearlyRecurrenceRule
 from schooltool.calendar.recurrent import MonthlyRecurrenceRule
@@ -90,6 +93,7 @@ from schooltool.calendar.utils import parse_date, parse_datetimetz
 from schooltool.calendar.utils import parse_time
 from schooltool.calendar.utils import week_start, prev_month, next_month
 from schooltool.common import DateRange
+from schooltool.common.cache import LRUCache
 from schooltool.app.utils import vocabulary
 from schooltool.person.interfaces import IPerson
 from schooltool.term.interfaces import IDateManager
@@ -593,38 +597,140 @@ class CalendarViewBase(BrowserView):
 
         `start_dt` and `end_dt` (datetime objects) are bounds (half-open) for
         the result.
+
+        Events are ordered by start, and events that come from several
+        calendars are only returned once (see ``mergeCalendars``).
         """
         view_link = absoluteURL(self.context, self.request)
-        for calendar, color1, color2 in self.getCalendars():
-            for event in calendar.expand(start_dt, end_dt):
-                if (same(event.__parent__, self.context) and
-                    calendar is not self.context):
-                    # Skip resource booking events (coming from
-                    # overlaid calendars) if they were booked by the
-                    # person whose calendar we are viewing.
-                    # removeSecurityProxy(event.__parent__) and
-                    # removeSecurityProxy(self.context) are needed so we
-                    # could compare them.
-                    continue
-                yield EventForDisplay(event, self.request, color1, color2,
-                                      calendar, self.timezone,
-                                      parent_view_link=view_link)
-
-    def collapseEvents(self, events):
-        """Collapse events that come from multiple calendars."""
-        events = sorted(events, key=lambda e:e.unique_id)
-        by_uid = {}
-        for event in events:
-            uid = (event.context.unique_id, event.context.dtstart)
-            if uid in by_uid:
-                known = by_uid[uid]
-                if (sameProxiedObjects(known.source_calendar,
-                                       known.context.__parent__) or
-                    not sameProxiedObjects(event.source_calendar,
-                                           event.context.__parent__)):
-                    continue
-            by_uid[uid] = event
-        return by_uid.values()
+        merged = self.mergeCalendars(start_dt, end_dt)
+        for event, (calendar, color1, color2) in merged:
+            yield EventForDisplay(event, self.request, color1, color2,
+                                  calendar, self.timezone,
+                                  parent_view_link=view_link)
+
+    def skipEvent(self, event, calendar):
+        """Skip resource booking events of overlaid calendars.
+
+        They are skipped if they were booked by the person whose calendar
+        we are viewing.
+        """
+        # removeSecurityProxy(event.__parent__) and
+        # removeSecurityProxy(self.context) are needed so we could
+        # compare them.
+        return (same(event.__parent__, self.context) and
+                calendar is not self.context)
+
+    def mergeCalendars(self, start_dt, end_dt):
+        """Iterate over (event, calendar info) of all calendars by start.
+
+        Events of each calendar are sorted and the streams are merged.  An
+        event in several calendars is returned once: from the calendar it
+        belongs to if that one is overlaid, from the first one otherwise.
+        """
+        calendars = self.getCalendars()
+        streams = []
+        for n, (calendar, color1, color2) in enumerate(calendars):
+            events = [(event.dtstart, event.unique_id, n, event)
+                      for event in self.expandCalendar(calendar,
+                                                       start_dt, end_dt)
+                      if not self.skipEvent(event, calendar)]
+            events.sort(key=lambda item: item[:3])
+            streams.append(events)
+        chosen = None
+        for item in heapq.merge(*streams):
+            if chosen is not None and chosen[:2] == item[:2]:
+                event, n = item[3], item[2]
+                if (not sameProxiedObjects(calendars[chosen[2]][0],
+                                           chosen[3].__parent__) and
+                    sameProxiedObjects(calendars[n][0], event.__parent__)):
+                    chosen = item
+                continue
+            if chosen is not None:
+                yield chosen[3], calendars[chosen[2]]
+            chosen = item
+        if chosen is not None:
+            yield chosen[3], calendars[chosen[2]]
+
+    def _dayStart(self, day):
+        return self.timezone.localize(datetime.combine(day, time()))
+
+    def expandCalendar(self, calendar, start_dt, end_dt):
+        """Expand events of a calendar in a time interval.
+
+        Expansions of whole days in the view timezone are shared between
+        views and requests through ``calendar_days_cache``.
+        """
+        key = getattr(removeSecurityProxy(calendar), 'cache_key', None)
+        cache = calendar_days_cache
+        start = start_dt.astimezone(self.timezone).date()
+        end = end_dt.astimezone(self.timezone).date()
+        if (key is None or not cache or
+            start_dt != self._dayStart(start) or
+            end_dt != self._dayStart(end)):
+            return calendar.expand(start_dt, end_dt)
+        key += (self.timezone.zone, )
+        occurrences = []
+        missing = []
+        day = start
+        while day < end:
+            cached = cache.get(key + (day, ))
+            if cached is None:
+                missing.append(day)
+            else:
+                occurrences.extend(cached)
+            day += timedelta(1)
+        if missing:
+            expanded = self._expandDays(calendar, missing[0],
+                                        missing[-1] + timedelta(1))
+            for day in missing:
+                cache.set(key + (day, ), expanded[day])
+                occurrences.extend(expanded[day])
+        events = []
+        seen = set()
+        for occurrence in occurrences:
+            if occurrence not in seen:
+                seen.add(occurrence)
+                events.append(self._loadOccurrence(calendar, *occurrence))
+        return events
+
+    def _expandDays(self, calendar, start, end):
+        """Expand calendar events into days from start to end (exclusive).
+
+        Returns a dict of tuples of (unique_id, dtstart) of the
+        occurrences overlapping each day, dtstart is None for events that
+        do not recur.
+        """
+        days = {}
+        day = start
+        while day < end:
+            days[day] = []
+            day += timedelta(1)
+        for event in calendar.expand(self._dayStart(start),
+                                     self._dayStart(end)):
+            dtend = event.dtstart + event.duration
+            if not event.duration:
+                dtend += dtend.resolution
+            if IExpandedCalendarEvent.providedBy(event):
+                occurrence = (event.unique_id, event.dtstart)
+            else:
+                occurrence = (event.unique_id, None)
+            day = max(start, event.dtstart.astimezone(self.timezone).date())
+            last = (dtend - dtend.resolution).astimezone(self.timezone).date()
+            while day < end and day <= last:
+                days[day].append(occurrence)
+                day += timedelta(1)
+        return dict([(day, tuple(occurrences))
+                     for day, occurrences in days.items()])
+
+    def _loadOccurrence(self, calendar, unique_id, dtstart):
+        event = calendar.find(unique_id)
+        if dtstart is None:
+            return event
+        unproxied = removeSecurityProxy(event)
+        occurrence = ExpandedCalendarEvent(unproxied, dtstart=dtstart)
+        if unproxied is not event:
+            occurrence = ProxyFactory(occurrence)
+        return occurrence
 
     def getDays(self, start, end):
         """Get a list of CalendarDay objects for a selected period of time.
@@ -660,7 +766,7 @@ class CalendarViewBase(BrowserView):
         # We have date objects, but ICalendar.expand needs datetime objects
         start_dt = self.timezone.localize(datetime.combine(start, time()))
         end_dt = self.timezone.localize(datetime.combine(end, time()))
-        for event in self.collapseEvents(self.getEvents(start_dt, end_dt)):
+        for event in self.getEvents(start_dt, end_dt):
             #  day1  day2  day3  day4  day5
             # |.....|.....|.....|.....|.....|
             # |     |  [-- event --)  |     |
@@ -784,6 +890,15 @@ class CalendarViewBase(BrowserView):
         return canAccess(self.context, "removeEvent")
 
 
+# Expanded calendar events by day, shared between requests.  Keys are
+# calendar ``cache_key`` tuples extended with the timezone name and the
+# day.  Values are tuples of (unique_id, dtstart) of the occurrences, so
+# they do not refer to objects of any database connection.  Any change to
+# event times changes the calendar key, so stale entries are simply never
+# looked up again.  Resize to 0 to disable.
+calendar_days_cache = LRUCache(size=20000)
+
+
 class DaysCache(object):
     """A cache of calendar days.
 
@@ -82,6 +82,16 @@ class EditTemporalRelationships(EditRelationships):
         active = state.active if state is not None else INACTIVE
         collection.on(date).relate(item, active, code)
 
+    def addMany(self, items, state=None, code=None, date=None):
+        collection = removeSecurityProxy(self.getCollection())
+        active = state.active if state is not None else ACTIVE
+        collection.on(date).relateMany(items, active, code)
+
+    def removeMany(self, items, state=None, code=None, date=None):
+        collection = removeSecurityProxy(self.getCollection())
+        active = state.active if state is not None else INACTIVE
+        collection.on(date).relateMany(items, active, code)
+
     def getSelectedItems(self):
         collection = self.getCollection()
         for person in collection.all():
@@ -93,7 +103,15 @@ class EditTemporalRelationships(EditRelationships):
 
 
 class TemporalRelationshipAddTableMixin(RelationshipAddTableMixin):
-    pass
+
+    def submitItems(self):
+        items = []
+        for item in self.view.getAvailableItems():
+            key = '%s.%s' % (self.button_prefix, self.view.getKey(item))
+            if key in self.request:
+                items.append(removeSecurityProxy(item))
+        if items:
+            self.view.addMany(items)
 
 
 def get_state_column_formatter(table):
@@ -112,6 +130,15 @@ class TemporalRelationshipRemoveTableMixin(RelationshipRemoveTableMixin):
     button_title = _('Update')
     button_image = 'edit-icon.png'
 
+    def submitItems(self):
+        items = []
+        for item in self.view.getSelectedItems():
+            key = '%s.%s' % (self.button_prefix, self.view.getKey(item))
+            if key in self.request:
+                items.append(removeSecurityProxy(item))
+        if items:
+            self.view.removeMany(items)
+
     def makeTextGetter(self):
         settings = self.view.states
         if settings is None:
@@ -633,6 +660,11 @@ class TemporalAddAllResultsButton(TemporalResultsButton,
         item = removeSecurityProxy(item)
         relationship_view.add(item, self.state, self.state.code, self.date)
 
+    def process_items(self, relationship_view, items):
+        items = [removeSecurityProxy(item) for item in items]
+        relationship_view.addMany(
+            items, self.state, self.state.code, self.date)
+
 
 class TemporalRemoveAllResultsButton(TemporalResultsButton,
                                      RemoveAllResultsButton):
@@ -651,3 +683,8 @@ class TemporalRemoveAllResultsButton(TemporalResultsButton,
     def process_item(self, relationship_view, item):
         item = removeSecurityProxy(item)
         relationship_view.remove(item, self.state, self.state.code, self.date)
+
+    def process_items(self, relationship_view, items):
+        items = [removeSecurityProxy(item) for item in items]
+        relationship_view.removeMany(
+            items, self.state, self.state.code, self.date)
@@ -3412,7 +3412,8 @@ def doctest_getEvents_booking():
         >>> ISchoolToolCalendar(toad).addEvent(event)
         >>> event.bookResource(resource)
 
-    We should see only one box for code, yet we should see swim twice:
+    We should see only one box for code, and swim only once, coming from
+    the calendar of toad, who booked the resource:
 
         >>> view.getCalendars = lambda:[
         ...     (calendar, 'r', 'g'),
@@ -3421,9 +3422,121 @@ def doctest_getEvents_booking():
         >>> for e in view.getEvents(datetime(2005, 2, 21, tzinfo=utc),
         ...                         datetime(2005, 3, 1, tzinfo=utc)):
         ...     print e.title, '(%s)' % e.color1
+        swim (m)
         code (r)
+
+    Without toad's calendar, swim comes from the resource calendar:
+
+        >>> view.getCalendars = lambda:[
+        ...     (calendar, 'r', 'g'),
+        ...     (ISchoolToolCalendar(resource), 'b', 'y')]
+        >>> for e in view.getEvents(datetime(2005, 2, 21, tzinfo=utc),
+        ...                         datetime(2005, 3, 1, tzinfo=utc)):
+        ...     print e.title, '(%s)' % e.color1
         swim (b)
-        swim (m)
+        code (r)
+
+    """
+
+
+def doctest_CalendarViewBase_expandCalendar():
+    r"""Test for CalendarViewBase.expandCalendar
+
+    Expansions of stored calendars are cached by day in a cache shared
+    between views.
+
+        >>> import transaction
+        >>> from ZODB.DB import DB
+        >>> from ZODB.MappingStorage import MappingStorage
+        >>> from schooltool.app.browser import cal
+        >>> from schooltool.calendar.recurrent import DailyRecurrenceRule
+
+        >>> from schooltool.common.cache import LRUCache
+        >>> old_cache = cal.calendar_days_cache
+        >>> cal.calendar_days_cache = LRUCache(size=100)
+        >>> def stats():
+        ...     return sorted(cal.calendar_days_cache.stats().items())
+
+        >>> calendar = Calendar(None)
+        >>> swim = createEvent('2005-02-26 19:39', '1h', 'swim')
+        >>> calendar.addEvent(swim)
+        >>> calendar.addEvent(createEvent('2005-02-27 23:00', '2h', 'sleep'))
+        >>> calendar.addEvent(createEvent('2005-02-27 08:00', '1h', 'eat',
+        ...                               recurrence=DailyRecurrenceRule()))
+
+        >>> view = cal.CalendarViewBase(calendar, TestRequest())
+        >>> def expand(first, last):
+        ...     for e in sorted(view.expandCalendar(calendar,
+        ...                                         view._dayStart(first),
+        ...                                         view._dayStart(last)),
+        ...                     key=lambda e: e.dtstart):
+        ...         print e.dtstart, e.title
+
+    Calendars that are not stored are not cached.
+
+        >>> print calendar.cache_key
+        None
+        >>> expand(date(2005, 2, 26), date(2005, 2, 28))
+        2005-02-26 19:39:00+00:00 swim
+        2005-02-27 08:00:00+00:00 eat
+        2005-02-27 23:00:00+00:00 sleep
+        >>> stats()
+        [('hits', 0), ('misses', 0), ('size', 0)]
+
+        >>> db = DB(MappingStorage())
+        >>> connection = db.open()
+        >>> connection.root()['calendar'] = calendar
+        >>> transaction.commit()
+        >>> calendar.cache_key
+        ('unnamed', '...', 3)
+
+        >>> expand(date(2005, 2, 26), date(2005, 3, 1))
+        2005-02-26 19:39:00+00:00 swim
+        2005-02-27 08:00:00+00:00 eat
+        2005-02-27 23:00:00+00:00 sleep
+        2005-02-28 08:00:00+00:00 eat
+        >>> stats()
+        [('hits', 0), ('misses', 3), ('size', 3)]
+
+        >>> expand(date(2005, 2, 28), date(2005, 3, 1))
+        2005-02-27 23:00:00+00:00 sleep
+        2005-02-28 08:00:00+00:00 eat
+        >>> stats()
+        [('hits', 1), ('misses', 3), ('size', 3)]
+
+    Days are cached for each timezone.
+
+        >>> view.timezone = timezone('Europe/Vilnius')
+        >>> expand(date(2005, 2, 27), date(2005, 2, 28))
+        2005-02-27 08:00:00+00:00 eat
+        >>> stats()
+        [('hits', 1), ('misses', 4), ('size', 4)]
+
+    Changes to event times are not cached until committed, and then they
+    change the key of the calendar.
+
+        >>> swim.dtstart = datetime(2005, 2, 28, 12, 0, tzinfo=utc)
+        >>> print calendar.cache_key
+        None
+        >>> view.timezone = utc
+        >>> expand(date(2005, 2, 28), date(2005, 3, 1))
+        2005-02-27 23:00:00+00:00 sleep
+        2005-02-28 08:00:00+00:00 eat
+        2005-02-28 12:00:00+00:00 swim
+
+        >>> transaction.commit()
+        >>> calendar.cache_key[-1]
+        4
+        >>> expand(date(2005, 2, 28), date(2005, 3, 1))
+        2005-02-27 23:00:00+00:00 sleep
+        2005-02-28 08:00:00+00:00 eat
+        2005-02-28 12:00:00+00:00 swim
+        >>> stats()
+        [('hits', 1), ('misses', 5), ('size', 5)]
+
+        >>> connection.close()
+        >>> db.close()
+        >>> cal.calendar_days_cache = old_cache
 
     """
 
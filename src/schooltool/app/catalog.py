@@ -36,6 +36,7 @@ from schooltool.app.interfaces import ICatalogs
 from schooltool.app.interfaces import IVersionedCatalog
 from schooltool.app.app import ActionBase
 from schooltool.table.catalog import FilterImplementing
+from schooltool.table.catalog import AttributeSubstringIndex
 
 
 APP_CATALOGS_KEY = 'schooltool.app.catalog:Catalogs'
@@ -159,15 +160,24 @@ class AttributeCatalog(CatalogImplementing):
     the given interface."""
 
     attributes = ()
+    # attributes searchable by substring
+    substring_attributes = ()
 
     def getVersion(self):
-        return u'attributes:%s, %s' % (
+        version = u'attributes:%s, %s' % (
             tuple(sorted(self.attributes)),
             super(AttributeCatalog, self).getVersion())
+        if self.substring_attributes:
+            version = u'substring:%s, %s' % (
+                tuple(sorted(self.substring_attributes)), version)
+        return version
 
     def setIndexes(self, catalog):
         for name in self.attributes:
-            catalog[name] = catalogindex.ValueIndex(name)
+            if name in self.substring_attributes:
+                catalog[name] = AttributeSubstringIndex(name)
+            else:
+                catalog[name] = catalogindex.ValueIndex(name)
 
 
 @adapter(IIntIdAddedEvent)
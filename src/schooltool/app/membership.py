@@ -108,16 +108,29 @@ That's all.
 
 """
 
-from zope.component import adapts
-
+import datetime
+
+from BTrees import IFBTree
+from BTrees.IOBTree import IOBTree
+from persistent import Persistent
+from zope.component import adapts, getUtility, queryUtility
+from zope.container.contained import Contained
+from zope.intid.interfaces import IIntIds
+from zope.security.proxy import removeSecurityProxy
+
+from schooltool.app.app import StartUpBase
+from schooltool.app.interfaces import ISchoolToolApplication
+from schooltool.app.interfaces import ICatalogs
 from schooltool.relationship import URIObject, RelationshipSchema
-from schooltool.relationship.temporal import TemporalURIObject
+from schooltool.relationship.temporal import TemporalURIObject, ACTIVE
 from schooltool.relationship import getRelatedObjects
+from schooltool.relationship.catalog import LinkCatalog
 from schooltool.relationship.interfaces import IBeforeRelationshipEvent
 from schooltool.relationship.interfaces import InvalidRelationship
 from schooltool.resource.interfaces import IBaseResource
 from schooltool.group.interfaces import IBaseGroup as IGroup
 from schooltool.person.interfaces import IPerson
+from schooltool.term.interfaces import IDateManager
 from schooltool.securitypolicy.crowds import Crowd
 
 from schooltool.common import SchoolToolMessage as _
@@ -205,6 +218,10 @@ def isTransitiveMember(obj, group):
     """
     if obj is group:
         return True
+    ids = _closureIds(obj, group)
+    if ids is not None:
+        closure, obj_id, group_id = ids
+        return closure.isMember(obj_id, group_id)
     # A group usually has more members than a member has groups, so we will
     # find all transitive groups of `obj` and see whether `group` is one of
     # them.  It does not matter if we use breadth-first or depth-first search.
@@ -221,6 +238,337 @@ def isTransitiveMember(obj, group):
     return False
 
 
+def getTransitiveMembers(group):
+    """Return all direct and indirect members of `group`."""
+    ids = _closureIds(group)
+    if ids is not None:
+        closure, group_id = ids
+        int_ids = getUtility(IIntIds)
+        return [int_ids.getObject(member_id)
+                for member_id in closure.getMembers(group_id)]
+    result = []
+    queue = [group]
+    seen = set([id(group)])
+    while queue:
+        for member in getRelatedObjects(queue.pop(), URIMember):
+            if id(member) not in seen:
+                seen.add(id(member))
+                result.append(member)
+                queue.append(member)
+    return result
+
+
+MEMBERSHIP_CLOSURE_KEY = 'schooltool.app.membership.closure'
+
+
+class MembershipClosure(Persistent, Contained):
+    """Transitive closure of group membership.
+
+    Maps int ids of members to int ids of all the groups they belong to
+    (directly or through other groups), and groups to all their members.
+
+        >>> closure = MembershipClosure()
+        >>> closure.add(1, 10)
+        >>> closure.add(10, 20)
+        >>> closure.add(2, 20)
+
+        >>> closure.isMember(1, 20), closure.isMember(2, 10)
+        (True, False)
+        >>> list(closure.getGroups(1))
+        [10, 20]
+        >>> list(closure.getMembers(20))
+        [1, 2, 10]
+
+    Removing a membership forgets the groups that are no longer reachable.
+
+        >>> closure.remove(10, 20)
+        >>> list(closure.getGroups(1))
+        [10]
+        >>> list(closure.getMembers(20))
+        [2]
+
+    Only memberships in effect are kept, so the closure answers for the
+    dates between `valid_from` and `valid_until`, when none of them change.
+
+        >>> from datetime import date
+        >>> closure.isCurrent(date(2014, 1, 1))
+        True
+
+        >>> closure.restrict(date(2014, 1, 1), date(2014, 6, 1))
+        >>> closure.restrict(None, date(2014, 3, 1))
+        >>> closure.valid_from, closure.valid_until
+        (datetime.date(2014, 1, 1), datetime.date(2014, 3, 1))
+
+        >>> closure.isCurrent(date(2013, 12, 31))
+        False
+        >>> closure.isCurrent(date(2014, 2, 28))
+        True
+        >>> closure.isCurrent(date(2014, 3, 1))
+        False
+
+    A closure that misses some memberships is never current.
+
+        >>> closure.complete = False
+        >>> closure.isCurrent(date(2014, 2, 1))
+        False
+
+    """
+
+    # Closures stored before validity was tracked are not trusted.
+    complete = False
+    valid_from = None
+    valid_until = None
+
+    def __init__(self):
+        Persistent.__init__(self)
+        Contained.__init__(self)
+        self.groups = IOBTree()
+        self.members = IOBTree()
+        self.ancestors = IOBTree()
+        self.descendants = IOBTree()
+        self.complete = True
+
+    def _insert(self, tree, key, value):
+        if key not in tree:
+            tree[key] = IFBTree.TreeSet()
+        tree[key].insert(value)
+
+    def _discard(self, tree, key, value):
+        values = tree.get(key)
+        if values is None or value not in values:
+            return
+        values.remove(value)
+        if not values:
+            del tree[key]
+
+    def _collectGroups(self, member_id):
+        result = IFBTree.TreeSet()
+        queue = [member_id]
+        while queue:
+            for group_id in self.groups.get(queue.pop(), ()):
+                if group_id not in result:
+                    result.insert(group_id)
+                    queue.append(group_id)
+        return result
+
+    def add(self, member_id, group_id):
+        self._insert(self.groups, member_id, group_id)
+        self._insert(self.members, group_id, member_id)
+        groups = [group_id] + list(self.ancestors.get(group_id, ()))
+        members = [member_id] + list(self.descendants.get(member_id, ()))
+        for member in members:
+            for group in groups:
+                self._insert(self.ancestors, member, group)
+                self._insert(self.descendants, group, member)
+
+    def remove(self, member_id, group_id):
+        self._discard(self.groups, member_id, group_id)
+        self._discard(self.members, group_id, member_id)
+        members = [member_id] + list(self.descendants.get(member_id, ()))
+        for member in members:
+            old_groups = self.ancestors.get(member, IFBTree.TreeSet())
+            new_groups = self._collectGroups(member)
+            for group in IFBTree.difference(old_groups, new_groups):
+                self._discard(self.descendants, group, member)
+            if new_groups:
+                self.ancestors[member] = new_groups
+            elif member in self.ancestors:
+                del self.ancestors[member]
+
+    def clear(self):
+        self.groups.clear()
+        self.members.clear()
+        self.ancestors.clear()
+        self.descendants.clear()
+        self.complete = True
+        self.valid_from = None
+        self.valid_until = None
+
+    def restrict(self, valid_from, valid_until):
+        if valid_from is not None and (self.valid_from is None or
+                                       valid_from > self.valid_from):
+            self.valid_from = valid_from
+        if valid_until is not None and (self.valid_until is None or
+                                        valid_until < self.valid_until):
+            self.valid_until = valid_until
+
+    def isCurrent(self, date):
+        return (self.complete and
+                (self.valid_from is None or self.valid_from <= date) and
+                (self.valid_until is None or date < self.valid_until))
+
+    def isMember(self, member_id, group_id):
+        return group_id in self.ancestors.get(member_id, ())
+
+    def getGroups(self, member_id):
+        return self.ancestors.get(member_id, IFBTree.TreeSet())
+
+    def getMembers(self, group_id):
+        return self.descendants.get(group_id, IFBTree.TreeSet())
+
+
+def getMembershipClosure():
+    app = ISchoolToolApplication(None, None)
+    if app is None:
+        return None
+    return app.get(MEMBERSHIP_CLOSURE_KEY)
+
+
+def _today():
+    dateman = queryUtility(IDateManager)
+    if dateman is not None:
+        return dateman.today
+    return datetime.date.today()
+
+
+def _closureIds(*objs):
+    """Return the closure and int ids of `objs`, if the closure knows
+    the memberships in effect today."""
+    closure = getMembershipClosure()
+    int_ids = queryUtility(IIntIds)
+    if closure is None or int_ids is None or not closure.isCurrent(_today()):
+        return None
+    ids = tuple([int_ids.queryId(removeSecurityProxy(obj)) for obj in objs])
+    if None in ids:
+        return None
+    return (closure, ) + ids
+
+
+def membershipState(shared, date):
+    """Return whether a membership is in effect on `date`.
+
+    Also returns the dates of the closest state changes before and after
+    `date` (or None), the membership does not change in between.
+
+        >>> from datetime import date
+        >>> shared = {'tmp': ((date(2014, 6, 1), ('i', 'i')),
+        ...                   (date(2014, 1, 1), ('a', 'a')))}
+        >>> membershipState(shared, date(2013, 12, 1))
+        (False, None, datetime.date(2014, 1, 1))
+        >>> membershipState(shared, date(2014, 2, 1))
+        (True, datetime.date(2014, 1, 1), datetime.date(2014, 6, 1))
+        >>> membershipState(shared, date(2014, 7, 1))
+        (False, datetime.date(2014, 6, 1), None)
+
+    Memberships without states are always in effect.
+
+        >>> membershipState({'tmp': ()}, date(2014, 2, 1))
+        (True, None, None)
+
+    """
+    history = shared.get('tmp', ())
+    valid_until = None
+    for state_date, (meaning, code) in history:
+        if state_date <= date:
+            return ACTIVE in meaning, state_date, valid_until
+        valid_until = state_date
+    return not history, None, valid_until
+
+
+def _updateClosure(closure, member, group, shared, date):
+    """Add or remove a membership, depending on whether it is in effect.
+
+    Memberships that are gone have no `shared` state.
+    """
+    int_ids = getUtility(IIntIds)
+    member_id = int_ids.queryId(removeSecurityProxy(member))
+    group_id = int_ids.queryId(removeSecurityProxy(group))
+    if member_id is None or group_id is None:
+        # The closure cannot follow this membership, so memberships are
+        # walked until the closure is rebuilt.
+        closure.complete = False
+        return
+    active = False
+    if shared is not None:
+        active, valid_from, valid_until = membershipState(shared, date)
+        closure.restrict(valid_from, valid_until)
+    if active:
+        closure.add(member_id, group_id)
+    else:
+        closure.remove(member_id, group_id)
+
+
+def populateMembershipClosure(app, closure, date):
+    """Rebuild the closure from membership links in the link catalog."""
+    closure.clear()
+    versioned = ICatalogs(app).get(LinkCatalog.key())
+    if versioned is None:
+        closure.complete = False
+        return
+    catalog = versioned.catalog
+    int_ids = getUtility(IIntIds)
+    rel_types = catalog['rel_type_hash'].documents_to_values
+    roles = catalog['role_hash'].documents_to_values
+    for lid in catalog.extent:
+        if (rel_types[lid][0] != hash(URIMembership) or
+            roles[lid][0] != hash(URIGroup)):
+            continue
+        link = int_ids.getObject(lid)
+        _updateClosure(closure, link.__parent__.__parent__, link.target,
+                       link.shared, date)
+
+
+def _currentClosure(date):
+    closure = getMembershipClosure()
+    if closure is not None and not closure.isCurrent(date):
+        populateMembershipClosure(
+            ISchoolToolApplication(None), closure, date)
+    return closure
+
+
+def updateClosureOnMembershipAdded(event):
+    """Update membership closure (IRelationshipAddedEvent subscriber)."""
+    if event.rel_type != URIMembership:
+        return
+    date = _today()
+    closure = _currentClosure(date)
+    if closure is not None:
+        _updateClosure(closure, event[URIMember], event[URIGroup],
+                       event.shared, date)
+
+
+def updateClosureOnMembershipRemoved(event):
+    """Update membership closure (IRelationshipRemovedEvent subscriber)."""
+    if event.rel_type != URIMembership:
+        return
+    date = _today()
+    closure = _currentClosure(date)
+    if closure is not None:
+        _updateClosure(closure, event[URIMember], event[URIGroup],
+                       None, date)
+
+
+def updateClosureOnMembershipStateChange(link, event):
+    """Update membership closure when the state of a membership changes.
+
+    Subscribed for IRelationshipLink and IObjectModifiedEvent.
+    """
+    if link.rel_type != URIMembership:
+        return
+    date = _today()
+    closure = _currentClosure(date)
+    if closure is None:
+        return
+    this = link.__parent__.__parent__
+    if link.role == URIGroup:
+        member, group = this, link.target
+    else:
+        member, group = link.target, this
+    _updateClosure(closure, member, group, link.shared, date)
+
+
+class MembershipClosureStartUp(StartUpBase):
+
+    def __call__(self):
+        closure = self.app.get(MEMBERSHIP_CLOSURE_KEY)
+        if closure is None:
+            closure = MembershipClosure()
+            populateMembershipClosure(self.app, closure, _today())
+            self.app[MEMBERSHIP_CLOSURE_KEY] = closure
+        elif not closure.isCurrent(_today()):
+            populateMembershipClosure(self.app, closure, _today())
+
+
 class GroupMemberCrowd(Crowd):
     """Crowd that contains all the members of the group.
 
@@ -308,6 +308,176 @@ def doctest_Calendar():
     """
 
 
+def doctest_Calendar_expand():
+    """Tests for Calendar.expand.
+
+        >>> from pytz import utc
+        >>> from schooltool.app.cal import Calendar, CalendarEvent
+        >>> from schooltool.calendar.recurrent import DailyRecurrenceRule
+
+        >>> cal = Calendar(None)
+        >>> def titles(first, last):
+        ...     return sorted([e.title for e in cal.expand(
+        ...         datetime(2005, 2, first, tzinfo=utc),
+        ...         datetime(2005, 2, last, tzinfo=utc))])
+
+        >>> cal.addEvent(CalendarEvent(
+        ...     datetime(2005, 2, 1, 10), timedelta(hours=1), 'Short',
+        ...     unique_id='short'))
+        >>> cal.addEvent(CalendarEvent(
+        ...     datetime(2005, 2, 5), timedelta(days=3), 'Long',
+        ...     unique_id='long'))
+        >>> cal.addEvent(CalendarEvent(
+        ...     datetime(2005, 1, 1, 9), timedelta(hours=1), 'Daily',
+        ...     recurrence=DailyRecurrenceRule(), unique_id='daily'))
+
+    Events are indexed by their start, recurring events are kept aside.
+
+        >>> [uid for dtstart, uid in cal._starts]
+        ['short', 'long']
+        >>> list(cal._recurring)
+        ['daily']
+
+    Only events that can overlap the period are expanded, including the
+    long ones that started before it.
+
+        >>> titles(1, 2)
+        ['Daily', 'Short']
+        >>> titles(6, 7)
+        ['Daily', 'Long']
+        >>> titles(9, 10)
+        ['Daily']
+
+    Events are reindexed when they are moved.
+
+        >>> short = cal.find('short')
+        >>> short.dtstart = datetime(2005, 2, 9, 10, tzinfo=utc)
+        >>> titles(1, 2)
+        ['Daily']
+        >>> titles(9, 10)
+        ['Daily', 'Short']
+
+        >>> short.recurrence = DailyRecurrenceRule()
+        >>> list(cal._recurring)
+        ['daily', 'short']
+        >>> titles(10, 11)
+        ['Daily', 'Short']
+
+    Removed events are unindexed.
+
+        >>> cal.removeEvent(cal.find('long'))
+        >>> titles(6, 7)
+        ['Daily']
+        >>> [uid for dtstart, uid in cal._starts]
+        []
+
+    """
+
+
+def doctest_calendarFeed():
+    """Tests for calendarFeed.
+
+        >>> import transaction
+        >>> from ZODB.DB import DB
+        >>> from ZODB.MappingStorage import MappingStorage
+        >>> from zope.publisher.browser import TestRequest
+        >>> from schooltool.app.cal import Calendar, CalendarEvent
+        >>> from schooltool.calendar import browser
+        >>> from schooltool.calendar.icalendar import iter_calendar_ical
+        >>> from schooltool.calendar.utils import utcnow
+
+        >>> from schooltool.common.cache import LRUCache
+        >>> old_cache = browser.feed_cache
+        >>> browser.feed_cache = LRUCache(size=10)
+        >>> def feed(request):
+        ...     return ''.join(browser.calendarFeed(cal, request,
+        ...                                         iter_calendar_ical))
+
+        >>> cal = Calendar(None)
+        >>> cal.addEvent(CalendarEvent(
+        ...     datetime(2005, 2, 1, 10), timedelta(hours=1), 'Lesson',
+        ...     unique_id='lesson'))
+        >>> db = DB(MappingStorage())
+        >>> connection = db.open()
+        >>> connection.root()['calendar'] = cal
+        >>> transaction.commit()
+
+    Feeds of stored calendars are cached and can be validated.
+
+        >>> request = TestRequest()
+        >>> 'SUMMARY:Lesson' in feed(request)
+        True
+        >>> etag = request.response.getHeader('ETag')
+        >>> etag
+        '"..."'
+        >>> last_modified = request.response.getHeader('Last-Modified')
+        >>> last_modified
+        '... GMT'
+        >>> sorted(browser.feed_cache.stats().items())
+        [('hits', 0), ('misses', 1), ('size', 1)]
+
+        >>> request = TestRequest()
+        >>> 'SUMMARY:Lesson' in feed(request)
+        True
+        >>> sorted(browser.feed_cache.stats().items())
+        [('hits', 1), ('misses', 1), ('size', 1)]
+
+    Clients that already have the feed get a 304 Not Modified.
+
+        >>> request = TestRequest(HTTP_IF_NONE_MATCH=etag)
+        >>> feed(request)
+        ''
+        >>> request.response.getStatus()
+        304
+
+        >>> request = TestRequest(HTTP_IF_MODIFIED_SINCE=last_modified)
+        >>> feed(request)
+        ''
+        >>> request.response.getStatus()
+        304
+
+    Any change to events changes the feed.
+
+        >>> cal.find('lesson').title = 'Exam'
+        >>> transaction.commit()
+        >>> request = TestRequest(HTTP_IF_NONE_MATCH=etag)
+        >>> 'SUMMARY:Exam' in feed(request)
+        True
+        >>> request.response.getHeader('ETag') == etag
+        False
+
+    Feeds of uncommitted changes are not cached.
+
+        >>> cal.find('lesson').title = 'Test'
+        >>> request = TestRequest()
+        >>> 'SUMMARY:Test' in feed(request)
+        True
+        >>> print request.response.getHeader('ETag')
+        None
+        >>> transaction.abort()
+
+    A feed can be limited to days around today.  Such feeds change every
+    day, so they only have an ETag.
+
+        >>> cal.addEvent(CalendarEvent(
+        ...     utcnow(), timedelta(hours=1), 'Today', unique_id='today'))
+        >>> transaction.commit()
+        >>> request = TestRequest(form={'past': '30', 'future': '365'})
+        >>> data = feed(request)
+        >>> 'SUMMARY:Today' in data, 'SUMMARY:Exam' in data
+        (True, False)
+        >>> request.response.getHeader('ETag')
+        '"..."'
+        >>> print request.response.getHeader('Last-Modified')
+        None
+
+        >>> connection.close()
+        >>> db.close()
+        >>> browser.feed_cache = old_cache
+
+    """
+
+
 def doctest_Calendar_addEvent_resource_booking():
     """Tests for Calendar.addEvent.
 
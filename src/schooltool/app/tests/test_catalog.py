@@ -569,6 +569,35 @@ def doctest_AttributeCatalog():
         >>> index_app(CatalogTriplets.get())
         catalog[u'b']: [(1, 'eins'), (2, 'zwei'), (3, 'drei')]
 
+    Attributes can also be indexed for substring searches.
+
+        >>> class CatalogTriplets(AttributeCatalog):
+        ...    version = 1
+        ...    interface = ITriplet
+        ...    attributes = ('a', 'b')
+        ...    substring_attributes = ('b', )
+
+        >>> factory = CatalogTriplets(app)
+        >>> factory()
+
+        >>> catalog = CatalogTriplets.get()
+        >>> index_app(catalog)
+        catalog[u'a']: [(1, 'one'), (2, 'two'), (3, 'three')]
+        catalog[u'b']: [(1, 'eins'), (2, 'zwei'), (3, 'drei')]
+
+        >>> list(catalog['b'].search('EI'))
+        [1, 2, 3]
+        >>> list(catalog['b'].search('wei'))
+        [2]
+
+        >>> print catalog.__parent__
+        <VersionedCatalog v.
+            u"substring:('b',),
+              attributes:('a', 'b'),
+              interface:schooltool.app.tests.test_catalog.ITriplet,
+              version:1">:
+        <zc.catalog.extentcatalog.Catalog object at ...>
+
     """
 
 
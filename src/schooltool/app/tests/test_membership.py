@@ -0,0 +1,349 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Unit tests for the membership closure in schooltool.app.membership.
+"""
+import unittest
+import doctest
+from datetime import date
+
+from zope.component import provideAdapter, provideUtility, getUtility
+from zope.interface import implements
+from zope.intid.interfaces import IIntIds
+from zope.app.testing import setup
+
+from schooltool.app.interfaces import ISchoolToolApplication
+from schooltool.app.interfaces import ICatalogs
+from schooltool.app import membership
+from schooltool.app.membership import MembershipClosure
+from schooltool.app.membership import MEMBERSHIP_CLOSURE_KEY
+from schooltool.app.membership import URIMembership, URIMember, URIGroup
+from schooltool.term.interfaces import IDateManager
+
+
+class ObjectStub(object):
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+
+class IntIdsStub(object):
+    implements(IIntIds)
+
+    def __init__(self):
+        self.objects = []
+
+    def register(self, obj):
+        self.objects.append(obj)
+        return len(self.objects)
+
+    def queryId(self, obj, default=None):
+        for n, other in enumerate(self.objects):
+            if other is obj:
+                return n + 1
+        return default
+
+    def getObject(self, id):
+        return self.objects[id - 1]
+
+
+class DateManagerStub(object):
+    implements(IDateManager)
+
+    today = date(2014, 2, 1)
+
+
+class MembershipEventStub(object):
+
+    def __init__(self, member, group, rel_type=URIMembership, states=()):
+        self.rel_type = rel_type
+        self.participants = {URIMember: member, URIGroup: group}
+        self.shared = {'tmp': states}
+
+    def __getitem__(self, role):
+        return self.participants[role]
+
+
+class LinkStub(object):
+
+    def __init__(self, this, role, target, rel_type=URIMembership,
+                 states=()):
+        self.__parent__ = ObjectStub('links of %s' % this)
+        self.__parent__.__parent__ = this
+        self.role = role
+        self.target = target
+        self.rel_type = rel_type
+        self.shared = {'tmp': states}
+
+
+def setUp(test):
+    setup.placelessSetUp()
+    app = test.globs['app'] = {}
+    provideAdapter(lambda ignored: app, (None, ), ISchoolToolApplication)
+    int_ids = test.globs['int_ids'] = IntIdsStub()
+    provideUtility(int_ids, IIntIds)
+    provideUtility(DateManagerStub(), IDateManager)
+    jonas, petras = test.globs['people'] = [
+        ObjectStub('jonas'), ObjectStub('petras')]
+    developers = test.globs['developers'] = ObjectStub('developers')
+    for obj in jonas, petras, developers:
+        int_ids.register(obj)
+    # Memberships in effect today.
+    groups = test.globs['groups'] = {}
+    def getRelatedObjects(obj, role):
+        print 'Walking', role.name, 'of', obj
+        if role == URIGroup:
+            return groups.get(obj, [])
+        return [member for member, member_groups in sorted(groups.items())
+                if obj in member_groups]
+    test.globs['old_getRelatedObjects'] = membership.getRelatedObjects
+    membership.getRelatedObjects = getRelatedObjects
+
+
+def tearDown(test):
+    membership.getRelatedObjects = test.globs['old_getRelatedObjects']
+    setup.placelessTearDown()
+
+
+def doctest_closure_subscribers():
+    """Membership events keep the closure current.
+
+        >>> from schooltool.app.membership import (
+        ...     updateClosureOnMembershipAdded,
+        ...     updateClosureOnMembershipRemoved,
+        ...     updateClosureOnMembershipStateChange)
+        >>> jonas, petras = people
+
+    Nothing happens without a closure.
+
+        >>> updateClosureOnMembershipAdded(
+        ...     MembershipEventStub(jonas, developers))
+
+        >>> closure = app[MEMBERSHIP_CLOSURE_KEY] = MembershipClosure()
+        >>> updateClosureOnMembershipAdded(
+        ...     MembershipEventStub(jonas, developers))
+        >>> updateClosureOnMembershipAdded(
+        ...     MembershipEventStub(petras, developers))
+        >>> list(closure.getMembers(int_ids.queryId(developers)))
+        [1, 2]
+
+        >>> updateClosureOnMembershipRemoved(
+        ...     MembershipEventStub(jonas, developers))
+        >>> list(closure.getMembers(int_ids.queryId(developers)))
+        [2]
+
+    Other relationships are ignored.
+
+        >>> updateClosureOnMembershipAdded(
+        ...     MembershipEventStub(jonas, developers, rel_type='other'))
+        >>> list(closure.getMembers(int_ids.queryId(developers)))
+        [2]
+
+    Only memberships in effect today are kept, and the closure is valid
+    until their state changes.
+
+        >>> updateClosureOnMembershipAdded(MembershipEventStub(
+        ...     jonas, developers,
+        ...     states=((date(2014, 6, 1), ('i', 'i')),
+        ...             (date(2014, 1, 1), ('a', 'a')))))
+        >>> list(closure.getMembers(int_ids.queryId(developers)))
+        [1, 2]
+        >>> closure.valid_from, closure.valid_until
+        (datetime.date(2014, 1, 1), datetime.date(2014, 6, 1))
+
+    State changes of membership links are followed, whichever half of
+    the link was modified.
+
+        >>> link = LinkStub(developers, URIMember, petras,
+        ...                 states=((date(2014, 1, 15), ('i', 'i')), ))
+        >>> updateClosureOnMembershipStateChange(link, None)
+        >>> list(closure.getMembers(int_ids.queryId(developers)))
+        [1]
+
+        >>> link = LinkStub(petras, URIGroup, developers,
+        ...                 states=((date(2014, 1, 20), ('a', 'a')), ))
+        >>> updateClosureOnMembershipStateChange(link, None)
+        >>> list(closure.getMembers(int_ids.queryId(developers)))
+        [1, 2]
+        >>> closure.valid_from, closure.valid_until
+        (datetime.date(2014, 1, 20), datetime.date(2014, 6, 1))
+
+        >>> link = LinkStub(petras, URIGroup, developers, rel_type='other')
+        >>> updateClosureOnMembershipStateChange(link, None)
+        >>> list(closure.getMembers(int_ids.queryId(developers)))
+        [1, 2]
+
+    Memberships of objects without int ids cannot be followed, so the
+    closure is not trusted until it is rebuilt.
+
+        >>> stranger = ObjectStub('stranger')
+        >>> updateClosureOnMembershipAdded(
+        ...     MembershipEventStub(stranger, developers))
+        >>> closure.isCurrent(date(2014, 2, 1))
+        False
+
+    """
+
+
+def doctest_isTransitiveMember_closure():
+    """A current closure answers without walking the memberships.
+
+        >>> from schooltool.app.membership import isTransitiveMember
+        >>> from schooltool.app.membership import getTransitiveMembers
+        >>> jonas, petras = people
+
+        >>> closure = app[MEMBERSHIP_CLOSURE_KEY] = MembershipClosure()
+        >>> closure.add(int_ids.queryId(petras), int_ids.queryId(developers))
+
+        >>> isTransitiveMember(jonas, developers)
+        False
+        >>> isTransitiveMember(petras, developers)
+        True
+        >>> getTransitiveMembers(developers)
+        [petras]
+
+    Objects without int ids are checked by walking the memberships.
+
+        >>> stranger = ObjectStub('stranger')
+        >>> isTransitiveMember(stranger, developers)
+        Walking Group of stranger
+        False
+
+    So is everything when the closure does not know the memberships in
+    effect today.
+
+        >>> groups[jonas] = [developers]
+        >>> closure.restrict(None, date(2014, 2, 1))
+
+        >>> isTransitiveMember(jonas, developers)
+        Walking Group of jonas
+        True
+        >>> getTransitiveMembers(developers)
+        Walking Member of developers
+        Walking Member of jonas
+        [jonas]
+
+    Or when there is no closure at all.
+
+        >>> del app[MEMBERSHIP_CLOSURE_KEY]
+        >>> getTransitiveMembers(developers)
+        Walking Member of developers
+        Walking Member of jonas
+        [jonas]
+
+    """
+
+
+def doctest_MembershipClosureStartUp():
+    """The closure is built from membership links in the link catalog.
+
+        >>> from schooltool.app.membership import MembershipClosureStartUp
+        >>> from schooltool.relationship.catalog import LinkCatalog
+        >>> jonas, petras = people
+
+        >>> class IndexStub(object):
+        ...     def __init__(self, values):
+        ...         self.documents_to_values = values
+
+        >>> class CatalogStub(dict):
+        ...     extent = ()
+
+        >>> class VersionedCatalogStub(object):
+        ...     def __init__(self, catalog):
+        ...         self.catalog = catalog
+
+    Link catalog has both halves of memberships and other links.  Petras
+    joins developers in March.
+
+        >>> links = [LinkStub(jonas, URIGroup, developers),
+        ...          LinkStub(developers, URIMember, jonas),
+        ...          LinkStub(petras, URIGroup, developers, rel_type='other'),
+        ...          LinkStub(petras, URIGroup, developers,
+        ...                   states=((date(2014, 3, 1), ('a', 'a')), ))]
+        >>> lids = [int_ids.register(link) for link in links]
+        >>> catalog = CatalogStub()
+        >>> catalog.extent = lids
+        >>> catalog['rel_type_hash'] = IndexStub(dict([
+        ...     (lids[0], (hash(URIMembership), )),
+        ...     (lids[1], (hash(URIMembership), )),
+        ...     (lids[2], (hash('other'), )),
+        ...     (lids[3], (hash(URIMembership), ))]))
+        >>> catalog['role_hash'] = IndexStub(dict([
+        ...     (lids[0], (hash(URIGroup), )),
+        ...     (lids[1], (hash(URIMember), )),
+        ...     (lids[2], (hash(URIGroup), )),
+        ...     (lids[3], (hash(URIGroup), ))]))
+
+        >>> catalogs = {LinkCatalog.key(): VersionedCatalogStub(catalog)}
+        >>> provideAdapter(lambda app: catalogs, (dict, ), ICatalogs)
+
+        >>> def members():
+        ...     return [int_ids.getObject(id)
+        ...             for id in closure.getMembers(int_ids.queryId(developers))]
+
+        >>> MembershipClosureStartUp(app)()
+        >>> closure = app[MEMBERSHIP_CLOSURE_KEY]
+        >>> members()
+        [jonas]
+        >>> closure.valid_from, closure.valid_until
+        (None, datetime.date(2014, 3, 1))
+
+    The closure is kept while it is current.
+
+        >>> closure.add(int_ids.queryId(jonas), int_ids.queryId(petras))
+        >>> MembershipClosureStartUp(app)()
+        >>> app[MEMBERSHIP_CLOSURE_KEY] is closure
+        True
+        >>> list(closure.getGroups(int_ids.queryId(jonas)))
+        [2, 3]
+
+    Once Petras joins, it is rebuilt.
+
+        >>> getUtility(IDateManager).today = date(2014, 3, 1)
+        >>> MembershipClosureStartUp(app)()
+        >>> members()
+        [jonas, petras]
+        >>> closure.valid_from, closure.valid_until
+        (datetime.date(2014, 3, 1), None)
+
+    Membership events rebuild a closure that is not current as well.
+
+        >>> from schooltool.app.membership import (
+        ...     updateClosureOnMembershipRemoved)
+        >>> closure.complete = False
+        >>> updateClosureOnMembershipRemoved(
+        ...     MembershipEventStub(jonas, developers))
+        >>> members()
+        [petras]
+        >>> closure.isCurrent(date(2014, 3, 1))
+        True
+
+    """
+
+
+def test_suite():
+    optionflags = doctest.NORMALIZE_WHITESPACE | doctest.ELLIPSIS
+    return doctest.DocTestSuite(optionflags=optionflags,
+                                setUp=setUp, tearDown=tearDown)
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
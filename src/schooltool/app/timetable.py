@@ -68,4 +68,6 @@ class EmergencyDayTimetableSubscriber(EventAdapterSubscriber):
                     timetable.exceptions[new_date] = meeting_exceptions
                     modified = True
                 if modified:
+                    # The term changes too, which shifts the day
+                    # templates of all later days, so resync everything.
                     zope.lifecycleevent.modified(timetable)
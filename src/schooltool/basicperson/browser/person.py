@@ -1136,6 +1136,7 @@ class BasicPersonTable(PersonTable):
             name='username',
             title=_(u'Username'),
             getter=lambda i, f: i.__name__,
+            value_from_index=True,
             subsort=True)
         return cols + [username]
 
@@ -1179,6 +1180,7 @@ class BasicPersonTableFormatter(PersonTableFormatter):
             name='username',
             title=_(u'Username'),
             getter=lambda i, f: i.__name__,
+            value_from_index=True,
             subsort=True)
         return cols + [username]
 
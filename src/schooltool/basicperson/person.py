@@ -109,6 +109,7 @@ class PersonFactoryUtility(object):
             cell_formatter=url_cell_formatter,
             title=_(u'First Name'),
             getter=lambda i, f: i.first_name,
+            value_from_index=True,
             subsort=True)
         last_name = IndexedLocaleAwareGetterColumn(
             index='last_name',
@@ -116,6 +117,7 @@ class PersonFactoryUtility(object):
             cell_formatter=url_cell_formatter,
             title=_(u'Last Name'),
             getter=lambda i, f: i.last_name,
+            value_from_index=True,
             subsort=True)
         result = []
         for column_name in self.columns_order:
@@ -164,6 +166,7 @@ class PersonCatalog(AttributeCatalog):
     version = '3 - updated title'
     interface = IBasicPerson
     attributes = ('__name__', 'title', 'first_name', 'last_name')
+    substring_attributes = ('title', )
 
     def setIndexes(self, catalog):
         super(PersonCatalog, self).setIndexes(catalog)
@@ -19,9 +19,14 @@
 SchoolTool calendaring objects.
 """
 import base64
+import datetime
 
-from persistent.dict import PersistentDict
+import pytz
+from BTrees.Length import Length
+from BTrees.OOBTree import OOBTree, OOTreeSet
 from persistent import Persistent
+from persistent.TimeStamp import TimeStamp
+from ZODB.utils import z64
 from zope.interface import implements, implementer
 from zope.schema import getFieldNames
 from zope.component import adapts, adapter
@@ -65,6 +70,26 @@ class CalendarEvent(SimpleCalendarEvent, Persistent, Contained):
         if interface is ICalendar:
             return self.__parent__
 
+    def __setattr__(self, name, value):
+        super(CalendarEvent, self).__setattr__(name, value)
+        if name.startswith('_'):
+            return
+        for calendar in self._calendars:
+            if name in Calendar.indexed_attrs:
+                update = getattr(calendar, 'reindexEvent', None)
+            else:
+                update = getattr(calendar, 'eventChanged', None)
+            if update is not None:
+                update(self)
+
+    @property
+    def _calendars(self):
+        """Calendars this event is stored in."""
+        if self.__parent__ is None:
+            return []
+        return ([self.__parent__] +
+                [ISchoolToolCalendar(resource) for resource in self.resources])
+
     def bookResource(self, resource):
         calendar = ISchoolToolCalendar(resource)
         if resource in self.resources:
@@ -91,7 +116,15 @@ class CalendarEvent(SimpleCalendarEvent, Persistent, Contained):
 
 
 class Calendar(Persistent, CalendarMixin):
-    """A persistent calendar."""
+    """A persistent calendar.
+
+    Events are indexed by their start, so that only events that can overlap
+    a period are expanded.  Recurring events are kept aside and always
+    expanded.
+
+    Changes to events are counted, so that expansions and exports can be
+    cached by ``cache_key``.
+    """
 
     # CalendarMixin is only used for the expand() method
 
@@ -101,9 +134,15 @@ class Calendar(Persistent, CalendarMixin):
 
     title = property(lambda self: self.__parent__.title)
 
+    indexed_attrs = ('dtstart', 'duration', 'recurrence', 'allday')
+
+    # Length counting changes of events, created on first change
+    _changes = None
+
     def __init__(self, owner):
-        self.events = PersistentDict()
+        self.events = OOBTree()
         self.__parent__ = owner
+        self.clearIndex()
 
     def __iter__(self):
         return self.events.itervalues()
@@ -111,6 +150,112 @@ class Calendar(Persistent, CalendarMixin):
     def __len__(self):
         return len(self.events)
 
+    def clearIndex(self):
+        # (dtstart, unique_id) of events that do not recur
+        self._starts = OOTreeSet()
+        # unique_ids of recurring events
+        self._recurring = OOTreeSet()
+        # unique_id -> indexed dtstart, None for recurring events
+        self._indexed = OOBTree()
+        # longest duration of an indexed event
+        self._max_duration = datetime.timedelta(0)
+
+    def _indexEvent(self, event):
+        uid = event.unique_id
+        if event.recurrence is not None:
+            self._recurring.insert(uid)
+            self._indexed[uid] = None
+            return
+        dtstart = event.dtstart
+        if dtstart.tzinfo is None:
+            dtstart = dtstart.replace(tzinfo=pytz.UTC)
+        dtstart = dtstart.astimezone(pytz.UTC)
+        self._starts.insert((dtstart, uid))
+        self._indexed[uid] = dtstart
+        duration = event.duration
+        if duration is not None and duration > self._max_duration:
+            self._max_duration = duration
+
+    def _unindexEvent(self, uid):
+        if uid not in self._indexed:
+            return
+        dtstart = self._indexed.pop(uid)
+        if dtstart is None:
+            self._recurring.remove(uid)
+        else:
+            self._starts.remove((dtstart, uid))
+
+    def reindexEvent(self, event):
+        uid = event.unique_id
+        if self.events.get(uid) is not event:
+            return
+        self._unindexEvent(uid)
+        self._indexEvent(event)
+        self._changed()
+
+    def eventChanged(self, event):
+        if self.events.get(event.unique_id) is event:
+            self._changed()
+
+    def _changed(self):
+        if self._changes is None:
+            self._changes = Length()
+        self._changes.change(1)
+
+    @property
+    def last_modified(self):
+        """Time of the last committed change to events, or None."""
+        if self._changes is None:
+            obj = self
+        else:
+            obj = self._changes
+        obj._p_activate()
+        if obj._p_serial == z64:
+            return None
+        return TimeStamp(obj._p_serial).timeTime()
+
+    @property
+    def cache_key(self):
+        """Key of the committed state of events of a stored calendar, or None.
+
+        Calendars changed in the current transaction have no key, so that
+        an aborted change can not be mistaken for a committed one.
+        """
+        if self._p_oid is None or self._p_jar is None:
+            return None
+        changes = self._changes
+        if changes is None:
+            count = 0
+        elif changes._p_oid is None or changes._p_changed:
+            return None
+        else:
+            count = changes()
+        return (self._p_jar.db().database_name, self._p_oid, count)
+
+    def reindex(self):
+        self.clearIndex()
+        for event in self.events.itervalues():
+            self._indexEvent(event)
+
+    def iterEventsStarting(self, first, last):
+        """Iterate non-recurring events starting between first and last."""
+        first = first.astimezone(pytz.UTC)
+        last = last.astimezone(pytz.UTC) + last.resolution
+        for dtstart, uid in self._starts.keys(min=(first, ), max=(last, )):
+            yield self.events[uid]
+
+    def expand(self, first, last):
+        """Expand only events that can overlap the period."""
+        assert first.tzname() is not None
+        assert last.tzname() is not None
+        for uid in self._recurring:
+            for recurrence in self.events[uid].expand(first, last):
+                yield recurrence
+        for event in self.iterEventsStarting(first - self._max_duration,
+                                             last):
+            for recurrence in event.expand(first, last):
+                yield recurrence
+
     def addEvent(self, event):
         assert ISchoolToolCalendarEvent.providedBy(event)
         if event.unique_id in self.events:
@@ -125,12 +270,16 @@ class Calendar(Persistent, CalendarMixin):
         elif self.__parent__ not in event.resources:
             raise ValueError("Event already belongs to a calendar")
         self.events[event.unique_id] = event
+        self._indexEvent(event)
+        self._changed()
 
     def removeEvent(self, event):
         if self.__parent__ in event.resources:
             event.unbookResource(self.__parent__)
         else:
             del self.events[event.unique_id]
+            self._unindexEvent(event.unique_id)
+            self._changed()
             parent_calendar = event.__parent__
             if self is parent_calendar:
                 for resource in event.resources:
@@ -36,7 +36,7 @@ CalendarICalendarView can export calendars in iCalendar format
     >>> view = CalendarICalendarView()
     >>> view.context = calendar
     >>> view.request = TestRequest()
-    >>> output = view.show()
+    >>> output = ''.join(view.show())
 
     >>> lines = output.splitlines(True)
     >>> from pprint import pprint
@@ -71,7 +71,7 @@ We can also render just the Free/Busy component of iCal
     >>> view = CalendarVfbView()
     >>> view.context = calendar
     >>> view.request = TestRequest()
-    >>> output = view.show()
+    >>> output = ''.join(view.show())
 
     >>> lines = output.splitlines(True)
     >>> from pprint import pprint
@@ -107,35 +107,186 @@ Register the VfbView as calendar.vfb
 
 """
 
-from schooltool.calendar.icalendar import convert_calendar_to_ical
-from schooltool.calendar.icalendar import convert_calendar_to_vfb
+import datetime
+import hashlib
+import tempfile
+
+import zope.datetime
+from pytz import utc
+from zope.publisher.http import DirectResult
+from zope.security.proxy import removeSecurityProxy
+
+from schooltool.calendar.icalendar import iter_calendar_ical
+from schooltool.calendar.icalendar import iter_calendar_vfb
+from schooltool.calendar.utils import utcnow
+from schooltool.common.cache import LRUCache
+
+
+def iterChunks(file, size=65536):
+    """Iterate over the contents of a file, closing it afterwards."""
+    try:
+        file.seek(0)
+        while True:
+            data = file.read(size)
+            if not data:
+                break
+            yield data
+    finally:
+        file.close()
+
+
+def spoolLines(lines, spool_size=1024*1024):
+    """Write lines to a temporary file, which is kept in memory if small.
+
+    Persistent objects can not be read while the response is being sent,
+    therefore lines are spooled rather than passed on as they are
+    generated.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=spool_size)
+    for line in lines:
+        spool.write(line)
+        spool.write("\r\n")
+    return spool
+
+
+def setICalendarHeaders(request, length):
+    request.response.setHeader('Content-Type',
+                               'text/calendar; charset=UTF-8')
+    request.response.setHeader('Content-Length', length)
+
+
+def icalendarResult(request, lines):
+    """Return a response body of iCalendar lines.
+
+    Lines are written to a temporary file one by one, so large calendars
+    are never kept in memory as a whole.
+    """
+    spool = spoolLines(lines)
+    if request is not None:
+        setICalendarHeaders(request, spool.tell())
+    return DirectResult(iterChunks(spool))
+
+
+# Rendered calendar feeds, shared between requests.  Keys are calendar
+# ``cache_key`` tuples extended with the feed type and window, so that any
+# change to the calendar makes old feeds unreachable.  Resize to 0 to
+# disable.
+feed_cache = LRUCache(size=50)
+
+# Larger feeds are streamed from disk every time.
+max_cached_feed_size = 1024*1024
+
+
+def iterEventsBetween(calendar, first, last):
+    """Iterate over events of a calendar that happen between first and last.
+
+    Recurring events are returned once, if any of their occurrences falls
+    into the period.
+    """
+    seen = set()
+    for occurrence in calendar.expand(first, last):
+        uid = occurrence.unique_id
+        if uid not in seen:
+            seen.add(uid)
+            yield calendar.find(uid)
+
+
+def getFeedWindow(request):
+    """Return the (first, last) period requested for a feed, or None.
+
+    The period is given as ``past`` and ``future`` numbers of days around
+    today.
+    """
+    if request is None:
+        return None
+    try:
+        past = int(request.get('past', ''))
+        future = int(request.get('future', ''))
+    except ValueError:
+        return None
+    today = utcnow().date()
+    first = today - datetime.timedelta(past)
+    last = today + datetime.timedelta(future + 1)
+    return (datetime.datetime.combine(first, datetime.time(tzinfo=utc)),
+            datetime.datetime.combine(last, datetime.time(tzinfo=utc)))
+
+
+def isNotModified(request, etag, last_modified):
+    """Check conditional request headers against the state of a feed."""
+    match = request.getHeader('If-None-Match')
+    if match is not None:
+        tags = [tag.strip() for tag in match.split(',')]
+        return etag in tags or '*' in tags
+    since = request.getHeader('If-Modified-Since')
+    if since and last_modified is not None:
+        try:
+            since = zope.datetime.time(since.split(';')[0])
+        except zope.datetime.DateTimeError:
+            return False
+        return long(last_modified) <= since
+    return False
+
+
+def calendarFeed(calendar, request, render):
+    """Return a feed of a calendar, rendered as lines by ``render``.
+
+    If the request asks for a window (see ``getFeedWindow``), only events
+    happening in that period are included.
+
+    Feeds of stored calendars have ETag and Last-Modified headers, answer
+    conditional requests with 304 Not Modified without looking at events,
+    and are kept in ``feed_cache`` until the calendar changes.
+    """
+    window = getFeedWindow(request)
+    if window is None:
+        events = calendar
+    else:
+        events = iterEventsBetween(calendar, *window)
+    unproxied = removeSecurityProxy(calendar)
+    key = getattr(unproxied, 'cache_key', None)
+    if request is None or key is None:
+        return icalendarResult(request, render(events))
+
+    key += (render.__name__, window)
+    etag = '"%s"' % hashlib.md5(repr(key)).hexdigest()
+    response = request.response
+    response.setHeader('ETag', etag)
+    last_modified = None
+    if window is None:
+        # Windowed feeds change with the date, so only the ETag is valid.
+        last_modified = unproxied.last_modified
+    if last_modified is not None:
+        response.setHeader('Last-Modified',
+                           zope.datetime.rfc1123_date(last_modified))
+    if isNotModified(request, etag, last_modified):
+        response.setStatus(304)
+        return ''
+
+    cache = feed_cache
+    data = cache.get(key)
+    if data is None:
+        spool = spoolLines(render(events))
+        size = spool.tell()
+        if not cache or size > max_cached_feed_size:
+            setICalendarHeaders(request, size)
+            return DirectResult(iterChunks(spool))
+        spool.seek(0)
+        data = spool.read()
+        spool.close()
+        cache.set(key, data)
+    setICalendarHeaders(request, len(data))
+    return data
 
 
 class CalendarICalendarView(object):
     """RFC 2445 (ICalendar) view for calendars."""
 
     def show(self):
-        data = "\r\n".join(convert_calendar_to_ical(self.context)) + "\r\n"
-        request = self.request
-        # XXX why check ?
-        if request is not None:
-            request.response.setHeader('Content-Type',
-                                       'text/calendar; charset=UTF-8')
-            request.response.setHeader('Content-Length', len(data))
-
-        return data
+        return calendarFeed(self.context, self.request, iter_calendar_ical)
 
 
 class CalendarVfbView(object):
     """RFC 2445 (ICalendar) Free/Busy view for calendars."""
 
     def show(self):
-        data = "\r\n".join(convert_calendar_to_vfb(self.context)) + "\r\n"
-        request = self.request
-        # XXX why check ?
-        if request is not None:
-            request.response.setHeader('Content-Type',
-                                       'text/calendar; charset=UTF-8')
-            request.response.setHeader('Content-Length', len(data))
-
-        return data
+        return calendarFeed(self.context, self.request, iter_calendar_vfb)
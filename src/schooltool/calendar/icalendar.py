@@ -227,17 +227,21 @@ def convert_calendar_to_vfb(calendar):
 
 
     """
-    header = ["BEGIN:VCALENDAR",
-              "VERSION:2.0",
-              "PRODID:-//SchoolTool.org/NONSGML SchoolTool//EN",
-              "METHOD:PUBLISH",
-              "BEGIN:VFREEBUSY"]
-    events = []
+    return list(iter_calendar_vfb(calendar))
+
+
+def iter_calendar_vfb(calendar):
+    """Iterate over lines of convert_calendar_to_vfb, one event at a time."""
+    yield "BEGIN:VCALENDAR"
+    yield "VERSION:2.0"
+    yield "PRODID:-//SchoolTool.org/NONSGML SchoolTool//EN"
+    yield "METHOD:PUBLISH"
+    yield "BEGIN:VFREEBUSY"
     for event in calendar:
-        events += convert_event_to_vfb(event)
-    footer = ["END:VFREEBUSY",
-              "END:VCALENDAR"]
-    return header + events + footer
+        for line in convert_event_to_vfb(event):
+            yield line
+    yield "END:VFREEBUSY"
+    yield "END:VCALENDAR"
 
 
 def convert_calendar_to_ical(calendar):
@@ -287,20 +291,30 @@ def convert_calendar_to_ical(calendar):
         END:VCALENDAR
 
     """
-    header = ["BEGIN:VCALENDAR",
-              "VERSION:2.0",
-              "PRODID:-//SchoolTool.org/NONSGML SchoolTool//EN"]
-    footer = ["END:VCALENDAR"]
-    events = []
+    return list(iter_calendar_ical(calendar))
+
+
+def iter_calendar_ical(calendar):
+    """Iterate over lines of convert_calendar_to_ical, one event at a time.
+
+    Use it to write large calendars without keeping all lines in memory.
+    """
+    yield "BEGIN:VCALENDAR"
+    yield "VERSION:2.0"
+    yield "PRODID:-//SchoolTool.org/NONSGML SchoolTool//EN"
+    empty = True
     for event in calendar:
-        events += convert_event_to_ical(event)
-    if not events:
+        empty = False
+        for line in convert_event_to_ical(event):
+            yield line
+    if empty:
         placeholder = SimpleCalendarEvent(datetime.datetime(1970, 1, 1),
                                           datetime.timedelta(0),
                                           "Empty calendar",
                                           unique_id=EMPTY_CALENDAR_PLACEHOLDER)
-        events += convert_event_to_ical(placeholder)
-    return header + events + footer
+        for line in convert_event_to_ical(placeholder):
+            yield line
+    yield "END:VCALENDAR"
 
 
 def ical_text(value):
@@ -414,38 +428,114 @@ def read_icalendar(icalendar_text, charset='UTF-8', fallback_tz=pytz.utc):
         icalendar_text = StringIO(icalendar_text)
 
     rows = RowParser.parse(icalendar_text, charset)
-    vccol = VCalendarCollection.parse(rows)
-
-    for calendar in vccol.vcalendars:
-        for vevent in calendar.events:
-            if vevent.uid == EMPTY_CALENDAR_PLACEHOLDER:
-                continue # Ignore empty calendar placeholder "event"
-
-            dtstart = vevent.dtstart
-            if not isinstance(dtstart, datetime.datetime):
-                dtstart = datetime.datetime.combine(dtstart,
-                                                    datetime.time(0))
-            # XXX regression test for events with a date as dtend
-            dtend = vevent.dtend
-            if not isinstance(dtend, datetime.datetime):
-                dtend = datetime.datetime.combine(dtend,
-                                                  datetime.time(0))
-
-            if dtstart.tzinfo is None:
-                dtstart_tz = calendar.timezones.get(vevent.dtstart_tzid, fallback_tz)
-                dtstart = dtstart_tz.localize(dtstart).astimezone(pytz.utc)
-            if dtend.tzinfo is None:
-                dtend_tz = calendar.timezones.get(vevent.dtend_tzid, fallback_tz)
-                dtend = dtend_tz.localize(dtend).astimezone(pytz.utc)
-            duration = dtend - dtstart
-
-            yield SimpleCalendarEvent(dtstart, duration,
-                                      vevent.summary or '',
-                                      location=vevent.location,
-                                      description=vevent.description,
-                                      unique_id=vevent.uid,
-                                      recurrence=vevent.rrule,
-                                      allday=vevent.all_day_event)
+
+    for vevent, timezones in iter_vevents(rows):
+        if vevent.uid == EMPTY_CALENDAR_PLACEHOLDER:
+            continue # Ignore empty calendar placeholder "event"
+
+        dtstart = vevent.dtstart
+        if not isinstance(dtstart, datetime.datetime):
+            dtstart = datetime.datetime.combine(dtstart,
+                                                datetime.time(0))
+        # XXX regression test for events with a date as dtend
+        dtend = vevent.dtend
+        if not isinstance(dtend, datetime.datetime):
+            dtend = datetime.datetime.combine(dtend,
+                                              datetime.time(0))
+
+        if dtstart.tzinfo is None:
+            dtstart_tz = timezones.get(vevent.dtstart_tzid, fallback_tz)
+            dtstart = dtstart_tz.localize(dtstart).astimezone(pytz.utc)
+        if dtend.tzinfo is None:
+            dtend_tz = timezones.get(vevent.dtend_tzid, fallback_tz)
+            dtend = dtend_tz.localize(dtend).astimezone(pytz.utc)
+        duration = dtend - dtstart
+
+        yield SimpleCalendarEvent(dtstart, duration,
+                                  vevent.summary or '',
+                                  location=vevent.location,
+                                  description=vevent.description,
+                                  unique_id=vevent.uid,
+                                  recurrence=vevent.rrule,
+                                  allday=vevent.all_day_event)
+
+
+def iter_vevents(rows):
+    """Parse VEVENTs of VCALENDAR components as soon as they end.
+
+    Yields (vevent, timezones) tuples, where timezones is a dict of
+    timezones defined in the VCALENDAR.  Only one component is kept in
+    memory at a time, except for events that refer to a timezone that is
+    defined later -- they are held back until the end of the VCALENDAR.
+
+    Raises ICalParseError on structural errors, like VCALENDAR.parse and
+    VCalendarCollection.parse do, though events before the error may
+    already have been yielded.
+    """
+    stack = []
+    block = []
+    seen_vcalendar = False
+    outside = False
+    timezones = {}
+    defined = set()
+    pending = []
+    for row in rows:
+        key, value, params = row
+        if key == "BEGIN":
+            stack.append(value)
+        elif not stack:
+            if key == "END":
+                raise ICalParseError("Mismatched BEGIN/END")
+            raise ICalParseError("Text outside VCALENDAR component")
+        if len(stack) == 1:
+            # VCALENDAR (or other top level block) properties are ignored
+            if key == "BEGIN":
+                if value == "VCALENDAR":
+                    seen_vcalendar = True
+                    timezones = {'UTC': pytz.utc}
+                    defined = set(timezones)
+                else:
+                    outside = True
+            elif key == "END":
+                if stack.pop() != value:
+                    raise ICalParseError("Mismatched BEGIN/END")
+                for vevent in pending:
+                    yield vevent, timezones
+                pending = []
+            continue
+        block.append(row)
+        if key != "END":
+            continue
+        if stack.pop() != value:
+            raise ICalParseError("Mismatched BEGIN/END")
+        if len(stack) > 1:
+            continue
+        if stack[0] == "VCALENDAR":
+            component = block[0][1]
+            if component == "VTIMEZONE":
+                vtimezone = VTimezone.parse(block)
+                tzid = vtimezone.tzid.upper()
+                defined.add(tzid)
+                tzinfo = vtimezone.getTzinfo()
+                if tzinfo is not None:
+                    timezones[tzid] = tzinfo
+            elif component == "VEVENT":
+                vevent = VEvent.parse(block)
+                if (vevent.dtstart_tzid in defined or
+                    vevent.dtstart_tzid is None) and (
+                    vevent.dtend_tzid in defined or
+                    vevent.dtend_tzid is None):
+                    yield vevent, timezones
+                else:
+                    pending.append(vevent)
+        block = []
+    if stack:
+        raise ICalParseError("Mismatched BEGIN/END")
+    if outside:
+        if seen_vcalendar:
+            raise ICalParseError("Text outside VCALENDAR component")
+        else:
+            raise ICalParseError('This is not iCalendar')
 
 
 #
@@ -19,9 +19,11 @@
 Recurrence rules.
 """
 
+import bisect
 import datetime
 import calendar
 
+from zope.cachedescriptors.property import Lazy
 from zope.interface import implements
 
 from schooltool.calendar.icalendar import ical_weekdays
@@ -30,6 +32,7 @@ from schooltool.calendar.interfaces import Unchanged
 from schooltool.calendar.interfaces import \
     IDailyRecurrenceRule, IWeeklyRecurrenceRule, IMonthlyRecurrenceRule, \
     IYearlyRecurrenceRule, IRecurrenceRule
+from schooltool.common.cache import LRUCache
 
 
 class RecurrenceRule(object):
@@ -109,30 +112,72 @@ class RecurrenceRule(object):
         """
         return hash(self._tupleForComparison())
 
+    @Lazy
+    def _sorted_exceptions(self):
+        return sorted(self.exceptions)
+
     def apply(self, event, startdate=None, enddate=None):
-        """Generator that generates dates of recurrences"""
+        """Iterate over dates of recurrences"""
         if enddate:
             assert isinstance(enddate, datetime.date), "enddate must be a date"
             assert not isinstance(enddate, datetime.datetime), \
                     "enddate must be a date, not a datetime"
-        if startdate is None:
-            startdate = event.dtstart.date()
-
-        count, cur = self._scroll(event, startdate)
-
-        while True:
+        start = event.dtstart.date()
+        if startdate is None or startdate < start:
+            startdate = start
+        if enddate is None or not occurrence_cache:
+            return self._apply(start, startdate, enddate)
+        key = (self, start, startdate, enddate)
+        dates = occurrence_cache.get(key)
+        if dates is None:
+            dates = tuple(self._apply(start, startdate, enddate))
+            occurrence_cache.set(key, dates)
+        return iter(dates)
+
+    def _apply(self, start, startdate, enddate):
+        """Generate dates of recurrences between startdate and enddate."""
+        exceptions = exceptionsBetween(self._sorted_exceptions, startdate,
+                                       enddate or self.until)
+        for count, cur in self._recurrences(start, startdate):
             if ((enddate and cur > enddate) or
                 (self.count is not None and count >= self.count) or
                 (self.until and cur > self.until)):
                 break
-            if cur not in self.exceptions and cur >= startdate:
+            if cur not in exceptions and cur >= startdate:
                 yield cur
+
+    def _recurrences(self, start, startdate):
+        """Generate (number, date) of recurrences.
+
+        Skips recurrences before startdate when that does not lose count
+        of them.
+        """
+        step = count = 0
+        if startdate > start and (self.count is None or
+                                  self._alwaysRecurs(start)):
+            step = count = self._firstStep(start, startdate)
+        while True:
+            cur = self._stepDate(start, step)
+            step += 1
+            if cur is None:
+                continue
+            yield count, cur
             count += 1
-            cur = self._nextRecurrence(cur)
 
-    def _nextRecurrence(self, date):
-        """Add the basic step of recurrence to the date."""
-        return date + self.interval * date.resolution
+    def _alwaysRecurs(self, start):
+        """Does every step of the recurrence fall on a valid date?"""
+        return True
+
+    def _firstStep(self, start, startdate):
+        """Return a step, all steps before which are before startdate."""
+        raise NotImplementedError
+
+    def _stepDate(self, start, step):
+        """Return the date of a given recurrence step.
+
+        None is returned if the date does not exist, e.g. February 30.
+        """
+        raise NotImplementedError
 
     def iCalRepresentation(self, dtstart):
         """See IRecurrenceRule"""
@@ -178,16 +223,11 @@ class DailyRecurrenceRule(RecurrenceRule):
 
     ical_freq = 'DAILY'
 
-    def _scroll(self, event, startdate):
-        """Given a startdate, finds a nearest event recurrence and its nr"""
-        if startdate >= event.dtstart.date():
-            days = (startdate - event.dtstart.date()).days
-        else:
-            days = 0
-        count = days / self.interval
-        cur = event.dtstart.date() + datetime.timedelta(count * self.interval)
-        return count, cur
+    def _firstStep(self, start, startdate):
+        return ((startdate - start).days + self.interval - 1) / self.interval
 
+    def _stepDate(self, start, step):
+        return start + datetime.timedelta(step * self.interval)
 
 
 class YearlyRecurrenceRule(RecurrenceRule):
@@ -199,31 +239,17 @@ class YearlyRecurrenceRule(RecurrenceRule):
 
     ical_freq = 'YEARLY'
 
-    def _nextRecurrence(self, date):
-        """Adds the basic step of recurrence to the date"""
-        delta = self.interval
-        while True:
-            try:
-                nextyear = date.year + delta
-                return date.replace(year=nextyear)
-            except ValueError:
-                # Jump over illegal leap days
-                delta += self.interval
-
-    def _scroll(self, event, startdate):
-        """Given a startdate, finds a nearest event recurrence and its nr"""
-        if startdate >= event.dtstart.date():
-            years = startdate.year - event.dtstart.date().year
-        else:
-            years = 0
-        count = years / self.interval
-        while True:
-            try:
-                newyear = event.dtstart.date().year + count * self.interval
-                cur = event.dtstart.date().replace(year=newyear)
-                return count, cur
-            except ValueError:
-                count -= self.interval
+    def _alwaysRecurs(self, start):
+        return (start.month, start.day) != (2, 29)
+
+    def _firstStep(self, start, startdate):
+        return (startdate.year - start.year) / self.interval
+
+    def _stepDate(self, start, step):
+        year = start.year + step * self.interval
+        if (start.month, start.day) == (2, 29) and not calendar.isleap(year):
+            return None
+        return start.replace(year=year)
 
     def _iCalArgs(self, dtstart):
         """Return iCalendar parameters specific to monthly reccurence."""
@@ -282,49 +308,25 @@ class WeeklyRecurrenceRule(RecurrenceRule):
         return (self.__class__.__name__, self.interval, self.count,
                 self.until, self.exceptions, self.weekdays)
 
-    def _scroll(self, event, startdate):
-        """Fast-forward to recurrences near startdate"""
-        start = event.dtstart.date()
-        if startdate >= start:
-            weeks = weekspan(start, startdate)
-        else:
-            weeks = 0
-        perweek = len(self.weekdays) + 1 # nr of recurrences per week
-        count = weeks / self.interval * perweek
-        if count > perweek:
-            count -= perweek # to get entries with weekday < that of start
-        offset = datetime.timedelta(7) * count / perweek * self.interval
-        return count, start + offset
-
-    def apply(self, event, startdate=None, enddate=None):
-        """Generate dates of recurrences."""
-        if enddate:
-            assert isinstance(enddate, datetime.date), "enddate must be a date"
-            assert not isinstance(enddate, datetime.datetime), \
-                    "enddate must be a date, not a datetime"
-        start = event.dtstart.date()
-        if startdate is None:
-            startdate = start
-        count, cur = self._scroll(event, startdate)
-        weekdays = set(self.weekdays)
-        weekdays.add(event.dtstart.weekday())
+    def _recurrences(self, start, startdate):
+        weekdays = sorted(set(self.weekdays + (start.weekday(), )))
+        monday = start - datetime.timedelta(start.weekday())
+        # nr of recurrences in the first week
+        first_week = len([day for day in weekdays if day >= start.weekday()])
+        week = count = 0
+        if startdate > start:
+            week = weekspan(start, startdate) / self.interval
+            if week > 0:
+                count = first_week + (week - 1) * len(weekdays)
         while True:
-            if ((enddate and cur > enddate) or
-                (self.count is not None and count >= self.count) or
-                (self.until and cur > self.until)):
-                break
-            # Check that this is the correct week and
-            # the desired weekday
-            if (weekspan(start, cur) % self.interval == 0 and
-                cur.weekday() in weekdays):
-                if cur not in self.exceptions and cur >= startdate:
-                    yield cur
+            offset = 7 * week * self.interval
+            for day in weekdays:
+                cur = monday + datetime.timedelta(offset + day)
+                if cur < start:
+                    continue
+                yield count, cur
                 count += 1
-            cur = self._nextRecurrence(cur)
-
-    def _nextRecurrence(self, date):
-        """Add the basic step of recurrence to the date."""
-        return date + date.resolution
+            week += 1
 
     def _iCalArgs(self, dtstart):
         """Return iCalendar parameters specific to weekly reccurence."""
@@ -387,106 +389,31 @@ class MonthlyRecurrenceRule(RecurrenceRule):
         return (self.__class__.__name__, self.interval, self.count,
                 self.until, self.exceptions, self.monthly)
 
-    def _scroll(self, event, startdate):
-        """Given a startdate, finds a nearest event recurrence and its nr"""
-        dstart = event.dtstart.date()
-        if startdate > event.dtstart.date():
-            months = (12 * (startdate.year - dstart.year) +
-                      startdate.month - dstart.month)
-        else:
-            months = 0
+    def _alwaysRecurs(self, start):
+        return self.monthly != 'monthday' or start.day <= 28
 
-        count = months / self.interval
-        while True:
-            try:
-                year, month = divmod(dstart.year * 12 + dstart.month +
-                                     count * self.interval - 1, 12)
-                month += 1 # 1..12
-                cur = event.dtstart.date().replace(year=year, month=month)
-                return count, cur
-            except ValueError:
-                count -= 1
-
-    def _nextRecurrence(self, date):
-        """Add basic step of recurrence to the date."""
-        year = date.year
-        month = date.month
-        while True:
-            year, month = divmod(year * 12 + month - 1 + self.interval, 12)
-            month += 1 # convert 0..11 to 1..12
-            try:
-                return date.replace(year=year, month=month)
-            except ValueError:
-                continue
+    def _firstStep(self, start, startdate):
+        months = (12 * (startdate.year - start.year) +
+                  startdate.month - start.month)
+        # the 5th weekday of a month may fall on the next month
+        return max(months / self.interval - 1, 0)
 
-    def apply(self, event, startdate=None, enddate=None):
-        if enddate:
-            assert isinstance(enddate, datetime.date), "enddate must be a date"
-            assert not isinstance(enddate, datetime.datetime), \
-                    "enddate must be a date, not a datetime"
+    def _stepDate(self, start, step):
+        year, month = divmod(start.year * 12 + start.month - 1 +
+                             step * self.interval, 12)
+        month += 1 # 1..12
         if self.monthly == 'monthday':
-            for date in  RecurrenceRule.apply(self, event, startdate, enddate):
-                yield date
-        elif self.monthly == 'weekday':
-            for date in self._applyWeekday(event, startdate, enddate):
-                yield date
-        elif self.monthly == 'lastweekday':
-            for date in self._applyLastWeekday(event, startdate, enddate):
-                yield date
-
-    def _applyWeekday(self, event, startdate=None, enddate=None):
-        """Generator that generates dates of recurrences."""
-        start = event.dtstart.date()
-        weekday = start.weekday()
-        # Which week of the month is it
-        index = (start.day - 1) / 7 + 1
-
-        if startdate is None:
-            startdate = start
-
-        count, cur = self._scroll(event, startdate)
-        year = cur.year
-        month = cur.month
-
-        while True:
-            cur = monthindex(year, month, index, weekday)
-            if ((enddate and cur > enddate) or
-                (self.count is not None and count >= self.count) or
-                (self.until and cur > self.until)):
-                break
-            if cur not in self.exceptions and cur >= startdate:
-                yield cur
-            count += 1
-            # Next month, please.
-            year, month = divmod(year * 12 + month + self.interval - 1, 12)
-            month += 1
-
-    def _applyLastWeekday(self, event, startdate=None, enddate=None):
-        """Generator that generates dates of recurrences."""
-        start = event.dtstart.date()
+            if start.day > calendar.monthrange(year, month)[1]:
+                return None
+            return start.replace(year=year, month=month)
         weekday = start.weekday()
-        daysinmonth = calendar.monthrange(start.year, start.month)[1]
-        index = (start.day - daysinmonth - 1) / 7
-
-        if startdate is None:
-            startdate = start
-
-        count, cur = self._scroll(event, startdate)
-        year = cur.year
-        month = cur.month
-
-        while True:
-            cur = monthindex(year, month, index, weekday)
-            if ((enddate and cur > enddate) or
-                (self.count is not None and count >= self.count) or
-                (self.until and cur > self.until)):
-                break
-            if cur not in self.exceptions and cur >= startdate:
-                yield cur
-            count += 1
-            # Next month, please.
-            year, month = divmod(year * 12 + month + self.interval - 1, 12)
-            month += 1
+        if self.monthly == 'weekday':
+            # Which week of the month is it
+            index = (start.day - 1) / 7 + 1
+        else:
+            daysinmonth = calendar.monthrange(start.year, start.month)[1]
+            index = (start.day - daysinmonth - 1) / 7
+        return monthindex(year, month, index, weekday)
 
     def _iCalArgs(self, dtstart):
         """Return iCalendar parameters specific to monthly reccurence."""
@@ -501,11 +428,44 @@ class MonthlyRecurrenceRule(RecurrenceRule):
             raise NotImplementedError(self.monthly)
 
 
+#
+# Occurrence cache
+#
+
+
+# Recurrence rules are immutable, so dates of their recurrences can be
+# cached by (rule, event start date, period).  Resize to 0 to disable.
+occurrence_cache = LRUCache(size=1000)
+
+
 #
 # Calendaring functions
 #
 
 
+def exceptionsBetween(exceptions, first, last=None):
+    """Return a set of exception dates between first and last.
+
+    Exceptions must be sorted.
+
+        >>> from datetime import date
+        >>> exceptions = [date(2005, 1, 1), date(2005, 2, 1), date(2005, 3, 1)]
+        >>> sorted(exceptionsBetween(exceptions, date(2005, 1, 2),
+        ...                          date(2005, 3, 1)))
+        [datetime.date(2005, 2, 1), datetime.date(2005, 3, 1)]
+        >>> sorted(exceptionsBetween(exceptions, date(2005, 2, 1)))
+        [datetime.date(2005, 2, 1), datetime.date(2005, 3, 1)]
+
+    """
+    lo = bisect.bisect_left(exceptions, first)
+    if last is None:
+        hi = len(exceptions)
+    else:
+        hi = bisect.bisect_right(exceptions, last)
+    return frozenset(exceptions[lo:hi])
+
+
+
 def weekspan(first, second):
     """Return the distance in weeks between dates.
 
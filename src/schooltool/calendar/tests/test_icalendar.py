@@ -873,6 +873,9 @@ class TestReadIcalendar(unittest.TestCase):
             ...
             ICalParseError: Text outside VCALENDAR component
 
+        Events are parsed as soon as their blocks end, so the first error
+        in the file is reported:
+
             >>> file = StringIO(dedent('''\
             ...             BEGIN:VCALENDAR
             ...             BEGIN:VEVENT
@@ -884,6 +887,20 @@ class TestReadIcalendar(unittest.TestCase):
             >>> list(read_icalendar(file))
             Traceback (most recent call last):
             ...
+            ICalParseError: VEVENT must have a UID property
+
+            >>> file = StringIO(dedent('''\
+            ...             BEGIN:VCALENDAR
+            ...             BEGIN:VEVENT
+            ...             UID:hello
+            ...             DTSTART;VALUE=DATE:20010203
+            ...             END:VEVENT
+            ...             END:VCALENDAR
+            ...             END:UNIVERSE
+            ...             '''))
+            >>> list(read_icalendar(file))
+            Traceback (most recent call last):
+            ...
             ICalParseError: Mismatched BEGIN/END
 
             >>> file = StringIO(dedent('''\
@@ -1379,6 +1396,65 @@ def doctest_VCalendar():
     """
 
 
+def doctest_iter_vevents():
+    """Test for iter_vevents.
+
+        >>> from schooltool.calendar.icalendar import iter_vevents, RowParser
+
+    Events are parsed as soon as their block ends, while rows are still
+    being read:
+
+        >>> def rows(lines):
+        ...     for row in RowParser.parse(lines):
+        ...         print 'read', row[0], row[1]
+        ...         yield row
+
+        >>> example_ical = dedent('''
+        ... BEGIN:VCALENDAR
+        ... BEGIN:VEVENT
+        ... UID:first
+        ... DTSTART:20050226T160000Z
+        ... END:VEVENT
+        ... BEGIN:VEVENT
+        ... UID:second
+        ... DTSTART;TZID=Europe/Berlin:20050226T160000
+        ... END:VEVENT
+        ... BEGIN:VTIMEZONE
+        ... TZID:Europe/Berlin
+        ... BEGIN:STANDARD
+        ... TZNAME:CET
+        ... END:STANDARD
+        ... END:VTIMEZONE
+        ... END:VCALENDAR
+        ... ''')
+        >>> for vevent, timezones in iter_vevents(
+        ...         rows(example_ical.splitlines())):
+        ...     print vevent.uid, sorted(timezones)
+        read BEGIN VCALENDAR
+        read BEGIN VEVENT
+        read UID first
+        read DTSTART 20050226T160000Z
+        read END VEVENT
+        first ['UTC']
+        read BEGIN VEVENT
+        read UID second
+        read DTSTART 20050226T160000
+        read END VEVENT
+        read BEGIN VTIMEZONE
+        read TZID Europe/Berlin
+        read BEGIN STANDARD
+        read TZNAME CET
+        read END STANDARD
+        read END VTIMEZONE
+        read END VCALENDAR
+        second ['EUROPE/BERLIN', 'UTC']
+
+    The second event refers to a timezone that is defined later, so it
+    was held back until the end of the calendar.
+
+    """
+
+
 def doctest_ical_reader_empty_summary():
     r"""Regression test for read_icalendar
 
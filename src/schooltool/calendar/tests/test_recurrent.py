@@ -143,6 +143,14 @@ class TestDailyRecurrenceRule(unittest.TestCase, RecurrenceRuleTestBase):
         result = list(rule.apply(ev, enddate=date(2004, 10, 20)))
         self.assertEqual(result, [date(2004, 10, d) for d in range(13, 16)])
 
+        # With exceptions out of order
+        rule = self.createRule(exceptions=[date(2004, 10, d)
+                                           for d in (20, 14, 17)])
+        result = list(rule.apply(ev, startdate=date(2004, 10, 15),
+                                 enddate=date(2004, 10, 20)))
+        self.assertEqual(result, [date(2004, 10, 15), date(2004, 10, 16),
+                                  date(2004, 10, 18), date(2004, 10, 19)])
+
         # With exceptions and count -- exceptions are excluded after
         # counting
         rule = self.createRule(exceptions=[date(2004, 10, d)
@@ -163,47 +171,6 @@ class TestDailyRecurrenceRule(unittest.TestCase, RecurrenceRuleTestBase):
                           date(3000, 1, 9), date(3000, 1, 12),
                           date(3000, 1, 15), date(3000, 1, 18)])
 
-    def test_scroll(self):
-        from schooltool.calendar.simple import SimpleCalendarEvent
-        rule = self.createRule()
-        ev = SimpleCalendarEvent(datetime(2004, 10, 13, 12, 0),
-                           timedelta(minutes=10),
-                           "reality check", unique_id='uid')
-
-        # if the start date is before the event,
-        # return the original event date.
-        self.assertEqual(rule._scroll(ev, date(2004, 1, 1)),
-                         (0, date(2004, 10, 13)))
-
-        # if the start date coincides with the event, date
-        self.assertEqual(rule._scroll(ev, date(2004, 10, 13)),
-                         (0, date(2004, 10, 13)))
-
-        # if the start date is later than the event date
-        self.assertEqual(rule._scroll(ev, date(2004, 10, 23)),
-                         (10, date(2004, 10, 23)))
-
-        rule = self.createRule(interval=3)
-
-        # if the start date is before the event,
-        # return the original event date.
-        self.assertEqual(rule._scroll(ev, date(2004, 1, 1)),
-                         (0, date(2004, 10, 13)))
-
-        # if the start date coincides with the event, date
-        self.assertEqual(rule._scroll(ev, date(2004, 10, 13)),
-                         (0, date(2004, 10, 13)))
-
-        # if the start date is later than the event date
-        self.assertEqual(rule._scroll(ev, date(2004, 10, 23)),
-                         (3, date(2004, 10, 22)))
-
-        self.assertEqual(rule._scroll(ev, date(2004, 10, 22)),
-                         (3, date(2004, 10, 22)))
-
-        self.assertEqual(rule._scroll(ev, date(2004, 10, 21)),
-                         (2, date(2004, 10, 19)))
-
 
 class TestYearlyRecurrenceRule(unittest.TestCase, RecurrenceRuleTestBase):
 
@@ -278,32 +245,6 @@ class TestYearlyRecurrenceRule(unittest.TestCase, RecurrenceRuleTestBase):
         self.assertEqual(result, [date(1996, 2, 29), date(2000, 2, 29),
                                   date(2004, 2, 29)])
 
-    def test_scroll(self):
-        from schooltool.calendar.simple import SimpleCalendarEvent
-        rule = self.createRule()
-        ev = SimpleCalendarEvent(datetime(1978, 5, 17, 12, 0),
-                           timedelta(minutes=10),
-                           "reality check", unique_id='uid')
-        self.assertEqual(rule._scroll(ev, date(1900, 3, 1)),
-                         (0, date(1978, 5, 17)))
-        self.assertEqual(rule._scroll(ev, date(2000, 3, 1)),
-                         (22, date(2000, 5, 17)))
-
-    def test_scroll_feb29(self):
-        from schooltool.calendar.simple import SimpleCalendarEvent
-        rule = self.createRule()
-        ev = SimpleCalendarEvent(datetime(1996, 2, 29, 12, 0),
-                           timedelta(minutes=10),
-                           "once in 4 years", unique_id='uid')
-        self.assertEqual(rule._scroll(ev, date(1900, 3, 1)),
-                         (0, date(1996, 2, 29)))
-        self.assertEqual(rule._scroll(ev, date(1999, 3, 1)),
-                         (0, date(1996, 2, 29)))
-        self.assertEqual(rule._scroll(ev, date(2000, 3, 1)),
-                         (4, date(2000, 2, 29)))
-        self.assertEqual(rule._scroll(ev, date(2004, 3, 1)),
-                         (8, date(2004, 2, 29)))
-
 
 class TestWeeklyRecurrenceRule(unittest.TestCase, RecurrenceRuleTestBase):
 
@@ -325,47 +266,6 @@ class TestWeeklyRecurrenceRule(unittest.TestCase, RecurrenceRuleTestBase):
         assert rule == rule.replace()
         assert rule != rule.replace(weekdays=(1,))
 
-    def test_scroll(self):
-        from schooltool.calendar.simple import SimpleCalendarEvent
-        rule = self.createRule()
-        ev = SimpleCalendarEvent(datetime(1978, 5, 17, 12, 0),
-                           timedelta(minutes=10),
-                           "reality check", unique_id='uid')
-
-        self.assertEqual(rule._scroll(ev, date(1978, 5, 25)),
-                         (1, date(1978, 5, 24)))
-        self.assertEqual(rule._scroll(ev, date(1978, 6, 2)),
-                         (1, date(1978, 5, 24)))
-
-        # tricky case!
-        # --  Tu We
-        # -- -- --
-        # Mo Tu We
-        # -- -- --
-        # Mo Tu We
-        # ...
-
-        rule = self.createRule(weekdays=(0, 3,), interval=2)
-
-        # We don't care that we get the closest event.  What we care
-        # about is that the sequence of events is correct:
-        goodresults = [(0, date(1978, 5, 17)),
-                       (1, date(1978, 5, 18)),
-                       (2, date(1978, 5, 29)),
-                       (3, date(1978, 5, 31)),
-                       (4, date(1978, 6, 1)),
-                       (5, date(1978, 6, 5)),
-                       (6, date(1978, 6, 7)),
-                       (7, date(1978, 6, 8))]
-
-        for delta in range(-10, 40):
-            d = date(1978, 5, 17) + date.resolution * delta
-            self.assert_(rule._scroll(ev, d) in goodresults, d)
-
-        # Still, it does not always return the zeroth result:
-        self.assertEqual(rule._scroll(ev, date(1978, 6, 29)),
-                         (6, date(1978, 6, 14)))
-
     def test_apply(self):
         from schooltool.calendar.simple import SimpleCalendarEvent
         rule = self.createRule()
@@ -426,6 +326,15 @@ class TestWeeklyRecurrenceRule(unittest.TestCase, RecurrenceRuleTestBase):
 
         self.assertEqual(result, expected)
 
+        # Counting from a start date far in the future
+        rule = self.createRule(weekdays=(4, ), count=2000)
+        result = list(rule.apply(ev, startdate=date(1997, 7, 7),
+                                 enddate=date(1997, 7, 13)))
+        self.assertEqual(result, [date(1997, 7, 9), date(1997, 7, 11)])
+        result = list(rule.apply(ev, startdate=date(1997, 7, 14),
+                                 enddate=date(1997, 7, 20)))
+        self.assertEqual(result, [])
+
     def test_iCalRepresentation_weekly(self):
         rule = self.createRule(weekdays=(0, 3, 6))
         dtstart = datetime(2005, 01, 01, 12, 0) # saturday
@@ -700,38 +609,6 @@ class TestMonthlyRecurrenceRule(unittest.TestCase, RecurrenceRuleTestBase):
         expected = [date(1978, 5, 17), date(1978, 9, 13)]
         self.assertEqual(result, expected)
 
-    def test_scroll(self):
-        from schooltool.calendar.simple import SimpleCalendarEvent
-        rule = self.createRule(interval=3)
-        ev = SimpleCalendarEvent(datetime(2004, 10, 13, 12, 0),
-                           timedelta(minutes=10),
-                           "reality check", unique_id='uid')
-
-        # start before event
-        self.assertEqual(rule._scroll(ev, date(2004, 1, 1)),
-                         (0, date(2004, 10, 13)))
-
-        # start on event date
-        self.assertEqual(rule._scroll(ev, date(2004, 10, 13)),
-                         (0, date(2004, 10, 13)))
-
-        # start after date
-        self.assertEqual(rule._scroll(ev, date(2005, 3, 14)),
-                         (1, date(2005, 1, 13)))
-
-        # If we ask for an illegal dates, we get less events
-        rule = self.createRule()
-        ev = SimpleCalendarEvent(datetime(2004, 1, 30, 12, 0),
-                           timedelta(minutes=10),
-                           "reality check", unique_id='uid')
-        self.assertEqual(rule._scroll(ev, date(2004, 1, 29)),
-                         (0, date(2004, 1, 30)))
-        self.assertEqual(rule._scroll(ev, date(2004, 2, 28)),
-                         (0, date(2004, 1, 30)))
-        # sequence nr 1 is taken by illegal date 2004-02-30
-        self.assertEqual(rule._scroll(ev, date(2004, 3, 1)),
-                         (2, date(2004, 3, 30)))
-
     def test_iCalRepresentation(self):
         # This method deliberately overrides the test in the base class.
 
@@ -822,9 +699,50 @@ def doctest_InfinitePastEventsBug():
     """
 
 
+def doctest_occurrence_cache():
+    """Recurrence dates in a period are cached.
+
+        >>> from schooltool.calendar import recurrent
+        >>> from schooltool.calendar.simple import SimpleCalendarEvent
+        >>> recurrent.occurrence_cache.resize(10)
+
+        >>> ev = SimpleCalendarEvent(datetime(2006, 1, 18, tzinfo=pytz.utc),
+        ...                          timedelta(hours=1), 'Sample event')
+        >>> rule = recurrent.WeeklyRecurrenceRule()
+        >>> list(rule.apply(ev, date(2006, 1, 1), date(2006, 1, 31)))
+        [datetime.date(2006, 1, 18), datetime.date(2006, 1, 25)]
+
+    Rules are immutable, so equal rules share the cached dates.
+
+        >>> list(rule.replace().apply(ev, date(2006, 1, 1), date(2006, 1, 31)))
+        [datetime.date(2006, 1, 18), datetime.date(2006, 1, 25)]
+        >>> sorted(recurrent.occurrence_cache.stats().items())
+        [('hits', 1), ('misses', 1), ('size', 1)]
+
+    Open ended periods are not cached.
+
+        >>> rule.apply(ev).next()
+        datetime.date(2006, 1, 18)
+        >>> recurrent.occurrence_cache.stats()['size']
+        1
+
+    The cache can be turned off.
+
+        >>> recurrent.occurrence_cache.resize(0)
+        >>> list(rule.apply(ev, date(2006, 1, 1), date(2006, 1, 31)))
+        [datetime.date(2006, 1, 18), datetime.date(2006, 1, 25)]
+        >>> recurrent.occurrence_cache.stats()['size']
+        0
+
+        >>> recurrent.occurrence_cache.resize(1000)
+
+    """
+
+
 def test_suite():
     suite = unittest.TestSuite()
     suite.addTest(doctest.DocTestSuite())
+    suite.addTest(doctest.DocTestSuite('schooltool.calendar.recurrent'))
     suite.addTest(unittest.makeSuite(TestDailyRecurrenceRule))
     suite.addTest(unittest.makeSuite(TestYearlyRecurrenceRule))
     suite.addTest(unittest.makeSuite(TestWeeklyRecurrenceRule))
@@ -0,0 +1,95 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Caches shared between requests.
+"""
+import threading
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """Thread-safe LRU cache shared between requests.
+
+        >>> cache = LRUCache(size=2)
+        >>> cache.set('a', (1, 2))
+        >>> cache.set('b', ())
+        >>> cache.get('a')
+        (1, 2)
+        >>> cache.set('c', (3, ))
+        >>> print cache.get('b')
+        None
+        >>> sorted(cache.stats().items())
+        [('hits', 1), ('misses', 1), ('size', 2)]
+
+    Resizing drops all entries.  A cache of size 0 is disabled.
+
+        >>> cache.resize(0)
+        >>> bool(cache)
+        False
+        >>> cache.set('a', (1, 2))
+        >>> print cache.get('a')
+        None
+        >>> sorted(cache.stats().items())
+        [('hits', 0), ('misses', 0), ('size', 0)]
+
+    """
+
+    def __init__(self, size=1000):
+        self.lock = threading.Lock()
+        self.resize(size)
+
+    def __nonzero__(self):
+        return self.size > 0
+
+    def resize(self, size):
+        """Change the size and drop all entries, disable if size is 0."""
+        with self.lock:
+            self.size = size
+            self.data = OrderedDict()
+            self.hits = 0
+            self.misses = 0
+
+    def clear(self):
+        self.resize(self.size)
+
+    def get(self, key):
+        if not self.size:
+            return None
+        with self.lock:
+            try:
+                value = self.data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return None
+            self.data[key] = value
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        if not self.size:
+            return
+        with self.lock:
+            self.data.pop(key, None)
+            self.data[key] = value
+            while len(self.data) > self.size:
+                self.data.popitem(last=False)
+
+    def stats(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self.data)}
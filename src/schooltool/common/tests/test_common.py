@@ -68,6 +68,8 @@ def test_suite():
     suite = unittest.TestSuite()
     suite.addTest(doctest.DocTestSuite('schooltool.common',
                                        optionflags=optionflags))
+    suite.addTest(doctest.DocTestSuite('schooltool.common.cache',
+                                       optionflags=optionflags))
     suite.addTest(doctest.DocTestSuite('schooltool.common.inlinept',
                                        optionflags=optionflags,
                                        setUp=lambda test: setUp()))
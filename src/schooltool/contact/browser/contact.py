@@ -638,18 +638,12 @@ class ContactFilterWidget(table.catalog.IndexedFilterWidget):
         catalog = self.catalog
 
         if 'SEARCH_FIRST_NAME' in self.request:
-            # XXX: applying normalized catalog queries would be nicer
-            fn_idx = catalog['first_name']
-            searchstr = self.request['SEARCH_FIRST_NAME'].lower()
-            items = [item for item in items
-                     if searchstr in fn_idx.documents_to_values[item['id']].lower()]
+            items = self.searchIndex(catalog['first_name'],
+                                     self.request['SEARCH_FIRST_NAME'], items)
 
         if 'SEARCH_LAST_NAME' in self.request:
-            # XXX: applying normalized catalog queries would be nicer
-            ln_idx = catalog['last_name']
-            searchstr = self.request['SEARCH_LAST_NAME'].lower()
-            items = [item for item in items
-                     if searchstr in ln_idx.documents_to_values[item['id']].lower()]
+            items = self.searchIndex(catalog['last_name'],
+                                     self.request['SEARCH_LAST_NAME'], items)
 
         return items
 
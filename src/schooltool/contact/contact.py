@@ -185,6 +185,7 @@ class ContactCatalog(AttributeCatalog):
     version = '4 - added text index'
     interface = IContact
     attributes = ('first_name', 'last_name', 'title')
+    substring_attributes = ('first_name', 'last_name', 'title')
 
     def setIndexes(self, catalog):
         super(ContactCatalog, self).setIndexes(catalog)
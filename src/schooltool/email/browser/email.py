@@ -556,6 +556,9 @@ class EmailContainerView(TableContainerView):
     def mailEnabled(self):
         return mail_enabled()
 
+    def deliveryStats(self):
+        return getUtility(IEmailUtility).deliveryStats()
+
     def serverStatus(self):
         result = {}
         if self.context.hostname:
@@ -572,11 +575,10 @@ class EmailContainerView(TableContainerView):
     def __call__(self):
         if 'RETRY' in self.request:
             utility = getUtility(IEmailUtility)
-            for key in self.listIdsForDeletion():
-                email = removeSecurityProxy(self.context[key])
-                success = utility.send(email)
-                if success:
-                    del self.context[key]
+            emails = [removeSecurityProxy(self.context[key])
+                      for key in self.listIdsForDeletion()]
+            if emails:
+                utility.sendLater(emails, self.request)
         return super(EmailContainerView, self).__call__()
 
 
@@ -614,6 +616,9 @@ class FlourishEmailContainerDetails(flourish.form.FormViewlet):
 
 class FlourishEmailQueueView(table.table.TableContainerView):
 
+    def deliveryStats(self):
+        return getUtility(IEmailUtility).deliveryStats()
+
     def getColumnsAfter(self):
         action = table.table.ImageInputColumn(
             'delete', name='action', title=_('Delete'),
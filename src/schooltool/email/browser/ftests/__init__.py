@@ -119,3 +119,17 @@ class StubEmailUtility(EmailUtility):
         if result:
             self.sent.append(email)
         return result
+
+    def sendMany(self, emails, rate=None):
+        emails = list(emails)
+        failed = EmailUtility.sendMany(self, emails, rate=rate)
+        self.sent.extend([email for email in emails if email not in failed])
+        return failed
+
+    def sendLater(self, emails, request=None):
+        # There is no task worker in functional tests, send right away.
+        emails = list(emails)
+        failed = self.sendMany(emails)
+        for email in emails:
+            if email not in failed and email.__parent__ is not None:
+                del email.__parent__[email.__name__]
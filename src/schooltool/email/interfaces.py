@@ -144,6 +144,34 @@ class IEmailUtility(Interface):
 
         """
 
+    def sendMany(emails, rate=None):
+        """Sends email messages through a single connection.
+
+        At most `rate` messages are sent per second if `rate` is given.
+
+        Returns the list of emails that were not sent; they are added
+        to the IEmailContainer like in `send`.
+
+        """
+
+    def sendLater(emails, request=None):
+        """Schedules the emails to be sent by a task worker.
+
+        Returns the scheduled remote task.
+
+        """
+
+    def deliveryStats():
+        """Returns statistics of background email delivery.
+
+        A dict with the number of emails waiting for a task worker
+        ('queued'), emails in the IEmailContainer ('failed'), total
+        counts of sent emails and failures ('delivered',
+        'delivery_failures') and the average throughput
+        ('messages_per_second').
+
+        """
+
     def enabled():
         """Checks if the email service is enabled.
 
@@ -23,16 +23,20 @@ Email functionality
 import email.Charset
 from email.MIMEText import MIMEText
 from datetime import datetime
+import math
 import pytz
 import smtplib
 import socket
+import time
 
+from BTrees.Length import Length
 from persistent import Persistent
 from persistent.dict import PersistentDict
+from persistent.list import PersistentList
 from zope.container.btree import BTreeContainer
 from zope.container.contained import Contained
 from zope.container.interfaces import INameChooser
-from zope.component import adapter
+from zope.component import adapter, getUtility
 from zope.interface import implements, implementer
 
 from schooltool.app.app import InitBase, StartUpBase
@@ -41,6 +45,8 @@ from schooltool.app.interfaces import ISchoolToolApplication
 from schooltool.common import SchoolToolMessage as _
 from schooltool.email.interfaces import IEmailContained, IEmailContainer
 from schooltool.email.interfaces import IEmailUtility
+from schooltool.task.interfaces import ITaskContainer
+from schooltool.task.tasks import RemoteTask
 
 
 email.Charset.add_charset('utf-8', email.Charset.SHORTEST, None, None)
@@ -58,6 +64,52 @@ status_messages = {
     70: _('The server (${info}) replied that the message data was malformed'),
     }
 
+# Failures that may go away by themselves, so delivery is retried.
+TRANSIENT_STATUS_CODES = (20, 30)
+
+# Delays (in seconds) before retrying failed background deliveries.
+DELIVERY_RETRY_SECONDS = (60, 5*60, 20*60, 60*60)
+
+
+class SMTPDeliveryError(Exception):
+    """Email could not be sent, with the status code to queue it with."""
+
+    def __init__(self, status_code, status_parameters):
+        Exception.__init__(self, status_code, status_parameters)
+        self.status_code = status_code
+        self.status_parameters = status_parameters
+
+
+def pipelined_sendmail(connection, from_address, to_addresses, message):
+    """Send a message like SMTP.sendmail does.
+
+    If the server supports PIPELINING, commands for the sender and all
+    recipients are sent before waiting for replies.
+    """
+    if not (isinstance(connection, smtplib.SMTP) and
+            connection.does_esmtp and connection.has_extn('pipelining')):
+        return connection.sendmail(from_address, to_addresses, message)
+    connection.putcmd('mail', 'FROM:%s' % smtplib.quoteaddr(from_address))
+    for address in to_addresses:
+        connection.putcmd('rcpt', 'TO:%s' % smtplib.quoteaddr(address))
+    code, response = connection.getreply()
+    replies = [connection.getreply() for address in to_addresses]
+    if code != 250:
+        connection.rset()
+        raise smtplib.SMTPSenderRefused(code, response, from_address)
+    refused = {}
+    for address, reply in zip(to_addresses, replies):
+        if reply[0] not in (250, 251):
+            refused[address] = reply
+    if len(refused) == len(to_addresses):
+        connection.rset()
+        raise smtplib.SMTPRecipientsRefused(refused)
+    code, response = connection.data(message)
+    if code != 250:
+        connection.rset()
+        raise smtplib.SMTPDataError(code, response)
+    return refused
+
 
 class Email(Persistent, Contained):
 
@@ -85,6 +137,20 @@ class EmailContainer(BTreeContainer):
     password = None
     tls = None
 
+    # Statistics of background delivery
+    delivered = None
+    delivery_failures = None
+    delivery_milliseconds = None
+
+    def recordDelivery(self, sent, failed, seconds):
+        if self.delivered is None:
+            self.delivered = Length()
+            self.delivery_failures = Length()
+            self.delivery_milliseconds = Length()
+        self.delivered.change(sent)
+        self.delivery_failures.change(failed)
+        self.delivery_milliseconds.change(int(math.ceil(seconds * 1000)))
+
 
 class EmailAppStartup(StartUpBase):
 
@@ -146,13 +212,15 @@ class EmailUtility(object):
         container = self.getEmailContainer()
         return container.enabled
 
-    def send(self, email):
-        self.container = self.getEmailContainer()
-        if not self.enabled():
-            self.queue(email, 10)
-            return False
-        server_info = '%s:%d' % (self.container.hostname,
-                                 self.container.port or 25)
+    @property
+    def server_info(self):
+        return '%s:%d' % (self.container.hostname, self.container.port or 25)
+
+    def connect(self):
+        """Return a connection to the SMTP server, logged in if needed.
+
+        Raises SMTPDeliveryError if that fails.
+        """
         try:
             connection = self.smtp_factory()
             if self.container.port:
@@ -174,54 +242,166 @@ class EmailUtility(object):
                     connection.login(self.container.username,
                                      self.container.password)
         except (socket.error,), e:
-            self.queue(email, 20, {'info': server_info})
-            return False
+            raise SMTPDeliveryError(20, {'info': self.server_info})
         except (smtplib.SMTPHeloError,), e:
-            self.queue(email, 30, {'info': server_info})
             connection.quit()
-            return False
+            raise SMTPDeliveryError(30, {'info': self.server_info})
         except (smtplib.SMTPException,), e:
-            self.queue(email, 40, {'info': server_info,
-                                   'username': self.container.username})
             connection.quit()
-            return False
+            raise SMTPDeliveryError(40, {'info': self.server_info,
+                                         'username': self.container.username})
+        return connection
+
+    def disconnect(self, connection):
+        """Close the connection, even if the server has dropped it."""
+        try:
+            connection.quit()
+        except (socket.error, smtplib.SMTPException):
+            pass
+
+    def deliver(self, connection, email):
+        """Send the email through an open connection.
+
+        Raises SMTPDeliveryError if it is not sent to all recipients.
+        """
+        server_info = self.server_info
         message = self.emailAsString(email)
-        result = {}
         try:
-            result = connection.sendmail(email.from_address,
-                                         email.to_addresses,
-                                         message)
+            result = pipelined_sendmail(connection,
+                                        email.from_address,
+                                        email.to_addresses,
+                                        message)
         except (smtplib.SMTPSenderRefused,), e:
-            self.queue(email, 50, {'info': server_info,
-                                   'from_address': e.sender})
-            connection.quit()
-            return False
+            raise SMTPDeliveryError(50, {'info': server_info,
+                                         'from_address': e.sender})
         except (smtplib.SMTPRecipientsRefused,), e:
             addresses = e.recipients.keys()
-            self.queue(email, 60, {'info': server_info,
-                                   'addresses': ', '.join(addresses)})
-            connection.quit()
-            return False
+            raise SMTPDeliveryError(60, {'info': server_info,
+                                         'addresses': ', '.join(addresses)})
         except (smtplib.SMTPHeloError,), e:
-            self.queue(email, 30, {'info': server_info})
-            connection.quit()
-            return False
+            raise SMTPDeliveryError(30, {'info': server_info})
         except (smtplib.SMTPDataError,), e:
-            self.queue(email, 70, {'info': server_info})
-            connection.quit()
-            return False
+            raise SMTPDeliveryError(70, {'info': server_info})
+        except (socket.error, smtplib.SMTPServerDisconnected), e:
+            raise SMTPDeliveryError(20, {'info': server_info})
         if result:
             addresses = [address for address in email.to_addresses
                          if address in result.keys()]
             email.to_addresses = addresses[:]
-            self.queue(email, 60, {'info': server_info,
-                                   'addresses': ', '.join(addresses)})
-            connection.quit()
+            raise SMTPDeliveryError(60, {'info': server_info,
+                                         'addresses': ', '.join(addresses)})
+
+    def send(self, email):
+        self.container = self.getEmailContainer()
+        if not self.enabled():
+            self.queue(email, 10)
+            return False
+        try:
+            connection = self.connect()
+        except SMTPDeliveryError, e:
+            self.queue(email, e.status_code, e.status_parameters)
+            return False
+        try:
+            self.deliver(connection, email)
+        except SMTPDeliveryError, e:
+            self.queue(email, e.status_code, e.status_parameters)
             return False
-        connection.quit()
+        finally:
+            self.disconnect(connection)
         return True
 
+    clock = staticmethod(time.time)
+    sleep = staticmethod(time.sleep)
+
+    def sendMany(self, emails, rate=None):
+        self.container = self.getEmailContainer()
+        emails = list(emails)
+        if not self.enabled():
+            for email in emails:
+                self.queue(email, 10)
+            return emails
+        failed = []
+        connection = None
+        next_time = None
+        for n, email in enumerate(emails):
+            if rate:
+                now = self.clock()
+                if next_time is not None and now < next_time:
+                    self.sleep(next_time - now)
+                    now = next_time
+                next_time = now + 1.0 / rate
+            try:
+                if connection is None:
+                    connection = self.connect()
+                self.deliver(connection, email)
+            except SMTPDeliveryError, e:
+                self.queue(email, e.status_code, e.status_parameters)
+                failed.append(email)
+                if e.status_code in TRANSIENT_STATUS_CODES:
+                    # The server is not reachable now, give up on the rest.
+                    for other in emails[n+1:]:
+                        self.queue(other, e.status_code, e.status_parameters)
+                        failed.append(other)
+                    break
+        if connection is not None:
+            self.disconnect(connection)
+        return failed
+
+    def sendLater(self, emails, request=None):
+        task = EmailDeliveryTask(emails)
+        task.schedule(request)
+        return task
+
+    def deliveryStats(self):
+        container = self.getEmailContainer()
+        app = ISchoolToolApplication(None)
+        queued = sum([len(task.emails)
+                      for task in ITaskContainer(app).values()
+                      if isinstance(task, EmailDeliveryTask)])
+        delivered = failures = rate = None
+        if container.delivered is not None:
+            delivered = container.delivered()
+            failures = container.delivery_failures()
+            milliseconds = container.delivery_milliseconds()
+            if milliseconds:
+                rate = delivered * 1000.0 / milliseconds
+        return {'queued': queued,
+                'failed': len(container),
+                'delivered': delivered,
+                'delivery_failures': failures,
+                'messages_per_second': rate}
+
 
 class SMTPEmailUtility(EmailUtility):
 
     smtp_factory = smtplib.SMTP
+
+
+class EmailDeliveryTask(RemoteTask):
+    """Sends emails in the background, retrying failed ones later."""
+
+    attempt = 0
+
+    def __init__(self, emails, attempt=0):
+        RemoteTask.__init__(self)
+        self.emails = PersistentList(emails)
+        self.attempt = attempt
+
+    def execute(self, request):
+        utility = getUtility(IEmailUtility)
+        rate = getattr(request.app.conf, 'SCHOOLTOOL_EMAIL_RATE', None)
+        started = time.time()
+        failed = utility.sendMany(self.emails, rate=rate)
+        seconds = time.time() - started
+        container = utility.getEmailContainer()
+        sent = [email for email in self.emails if email not in failed]
+        for email in sent:
+            if email.__parent__ is container:
+                del container[email.__name__]
+        container.recordDelivery(len(sent), len(failed), seconds)
+        retry = [email for email in failed
+                 if email.status_code in TRANSIENT_STATUS_CODES]
+        if retry and self.attempt < len(DELIVERY_RETRY_SECONDS):
+            task = EmailDeliveryTask(retry, attempt=self.attempt + 1)
+            task.schedule(None, countdown=DELIVERY_RETRY_SECONDS[self.attempt])
+        return len(sent)
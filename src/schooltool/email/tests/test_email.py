@@ -21,6 +21,8 @@ Unit tests for email functionality.
 """
 import unittest
 import doctest
+import SocketServer
+import threading
 
 from zope.interface import implements
 from zope.interface.verify import verifyObject
@@ -32,6 +34,79 @@ from schooltool.app.interfaces import ISchoolToolApplication
 from schooltool.email.interfaces import IEmailContainer
 
 
+class StubSMTPHandler(SocketServer.StreamRequestHandler):
+
+    def reply(self, line):
+        self.wfile.write(line + '\r\n')
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply('220 localhost stub')
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.strip()
+            verb = command[:4].upper()
+            server.commands.append(verb)
+            if verb == 'EHLO':
+                self.reply('250-localhost')
+                self.reply('250 PIPELINING')
+            elif verb == 'MAIL':
+                sender, recipients = command[10:].strip('<>'), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                address = command[8:].strip('<>')
+                if address.startswith('bad'):
+                    self.reply('550 No such user')
+                elif address.startswith('drop'):
+                    return
+                else:
+                    recipients.append(address)
+                    self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 Go ahead')
+                data = []
+                line = self.rfile.readline()
+                while line.strip() != '.':
+                    data.append(line)
+                    line = self.rfile.readline()
+                server.messages.append((sender, recipients, ''.join(data)))
+                self.reply('250 OK')
+            elif verb == 'RSET':
+                sender, recipients = None, []
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Not implemented')
+
+
+class StubSMTPServer(SocketServer.ThreadingTCPServer):
+    """A local SMTP server that remembers the messages it receives."""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        SocketServer.ThreadingTCPServer.__init__(
+            self, ('127.0.0.1', 0), StubSMTPHandler)
+        self.port = self.server_address[1]
+        self.connections = 0
+        self.commands = []
+        self.messages = []
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
 def doctest_EmailContainer(self):
     """Tests for toplevel container for Emails.
 
@@ -238,6 +313,238 @@ def doctest_EmailUtility():
     """
 
 
+def doctest_EmailUtility_sendMany():
+    """Tests for EmailUtility.sendMany.
+
+        >>> from schooltool.email.mail import EmailContainer
+
+        >>> server = StubSMTPServer()
+        >>> container = EmailContainer()
+        >>> container.enabled = True
+        >>> container.hostname = '127.0.0.1'
+        >>> container.port = server.port
+
+        >>> class AppStub(object):
+        ...     implements(ISchoolToolApplication)
+        >>> provideAdapter(lambda ignored: AppStub(),
+        ...                adapts=(None, ), provides=ISchoolToolApplication)
+        >>> provideAdapter(lambda app: container,
+        ...                adapts=(ISchoolToolApplication, ),
+        ...                provides=IEmailContainer)
+
+        >>> from schooltool.email.mail import Email, SMTPEmailUtility
+        >>> util = SMTPEmailUtility()
+
+        >>> emails = [Email('from@test', ['to%d@test' % n], 'Body %d' % n)
+        ...           for n in range(3)]
+        >>> bad = Email('from@test', ['bad@test', 'to3@test'], 'Body 3')
+        >>> worse = Email('from@test', ['bad@test'], 'Body 4')
+
+    All emails go through one connection.  The server supports
+    pipelining, so recipients are sent without waiting for replies.
+
+        >>> util.sendMany(emails + [bad, worse]) == [bad, worse]
+        True
+
+        >>> server.connections
+        1
+        >>> server.commands
+        ['EHLO', 'MAIL', 'RCPT', 'DATA', 'MAIL', 'RCPT', 'DATA',
+         'MAIL', 'RCPT', 'DATA', 'MAIL', 'RCPT', 'RCPT', 'DATA',
+         'MAIL', 'RCPT', 'RSET', 'QUIT']
+        >>> for sender, recipients, data in server.messages:
+        ...     print sender, recipients, data.splitlines()[-1]
+        from@test ['to0@test'] Body 0
+        from@test ['to1@test'] Body 1
+        from@test ['to2@test'] Body 2
+        from@test ['to3@test'] Body 3
+
+    Emails that were not sent (even to some of the recipients) are queued.
+
+        >>> sorted(container.keys())
+        [u'Email', u'Email-2']
+        >>> bad.status_code, bad.to_addresses
+        (60, ['bad@test'])
+        >>> worse.status_code, worse.status_parameters['addresses']
+        (60, 'bad@test')
+
+    Emails can be throttled to a number of messages per second.
+
+        >>> now = [0.0]
+        >>> def sleep(seconds):
+        ...     print 'sleep %.2f' % seconds
+        ...     now[0] += seconds
+        >>> util.clock = lambda: now[0]
+        >>> util.sleep = sleep
+
+        >>> util.sendMany(emails, rate=4)
+        sleep 0.25
+        sleep 0.25
+        []
+
+    When the server cannot be reached, the remaining emails are queued
+    without trying to connect for each of them.
+
+        >>> server.stop()
+        >>> failed = util.sendMany(emails)
+        >>> failed == emails
+        True
+        >>> [email.status_code for email in emails]
+        [20, 20, 20]
+        >>> len(container)
+        5
+
+    """
+
+
+def doctest_EmailDeliveryTask():
+    """Tests for EmailDeliveryTask.
+
+        >>> from schooltool.email.interfaces import IEmailUtility
+        >>> from schooltool.email.mail import Email, EmailContainer
+        >>> from schooltool.email.mail import SMTPEmailUtility
+        >>> from schooltool.email.mail import EmailDeliveryTask
+        >>> from schooltool.task.interfaces import ITaskContainer
+        >>> from zope.component import provideUtility
+
+        >>> server = StubSMTPServer()
+        >>> container = EmailContainer()
+        >>> container.enabled = True
+        >>> container.hostname = '127.0.0.1'
+        >>> container.port = server.port
+        >>> tasks = {}
+
+        >>> class AppStub(object):
+        ...     implements(ISchoolToolApplication)
+        >>> provideAdapter(lambda ignored: AppStub(),
+        ...                adapts=(None, ), provides=ISchoolToolApplication)
+        >>> provideAdapter(lambda app: container,
+        ...                adapts=(ISchoolToolApplication, ),
+        ...                provides=IEmailContainer)
+        >>> provideAdapter(lambda app: tasks,
+        ...                adapts=(ISchoolToolApplication, ),
+        ...                provides=ITaskContainer)
+
+        >>> util = SMTPEmailUtility()
+        >>> provideUtility(util, IEmailUtility)
+
+        >>> class ConfStub(object):
+        ...     SCHOOLTOOL_EMAIL_RATE = None
+        >>> class CeleryAppStub(object):
+        ...     conf = ConfStub()
+        >>> class CeleryTaskStub(object):
+        ...     app = CeleryAppStub()
+        >>> request = CeleryTaskStub()
+
+        >>> scheduled = []
+        >>> def schedule(self, request, **options):
+        ...     print 'schedule', self.emails, options
+        ...     scheduled.append(self)
+        >>> old_schedule = EmailDeliveryTask.schedule
+        >>> EmailDeliveryTask.schedule = schedule
+
+    The task sends its emails in one go.  Emails that were waiting in
+    the email container leave it when they are sent.
+
+        >>> good = Email('from@test', ['to@test'], 'Hello')
+        >>> bad = Email('from@test', ['bad@test'], 'Hello')
+        >>> container[u'Email'] = good
+
+        >>> task = EmailDeliveryTask([good, bad])
+        >>> len(task.emails)
+        2
+
+        >>> sorted(util.deliveryStats().items())
+        [('delivered', None), ('delivery_failures', None), ('failed', 1),
+         ('messages_per_second', None), ('queued', 0)]
+
+        >>> tasks['task'] = task
+        >>> util.deliveryStats()['queued']
+        2
+
+        >>> task.execute(request)
+        1
+        >>> del tasks['task']
+
+    Recipients that were refused are not retried.
+
+        >>> list(container.values()) == [bad]
+        True
+
+        >>> stats = util.deliveryStats()
+        >>> stats['delivered'], stats['delivery_failures'], stats['failed']
+        (1, 1, 1)
+        >>> stats['messages_per_second'] > 0
+        True
+
+    When the server is down, emails are retried later, waiting longer
+    after each attempt.
+
+        >>> server.stop()
+        >>> good = Email('from@test', ['to@test'], 'Hello')
+        >>> EmailDeliveryTask([good]).execute(request)
+        schedule [<schooltool.email.mail.Email ...>] {'countdown': 60}
+        0
+
+        >>> retry = scheduled[-1]
+        >>> retry.attempt
+        1
+        >>> retry.execute(request)
+        schedule [<schooltool.email.mail.Email ...>] {'countdown': 300}
+        0
+
+        >>> retry.attempt = 4
+        >>> retry.execute(request)
+        0
+
+        >>> good.status_code
+        20
+
+        >>> EmailDeliveryTask.schedule = old_schedule
+
+    """
+
+
+def doctest_EmailUtility_send_disconnect():
+    """Tests for EmailUtility.send when the server drops the connection.
+
+        >>> from schooltool.email.mail import Email, EmailContainer
+        >>> from schooltool.email.mail import SMTPEmailUtility
+
+        >>> server = StubSMTPServer()
+        >>> container = EmailContainer()
+        >>> container.enabled = True
+        >>> container.hostname = '127.0.0.1'
+        >>> container.port = server.port
+
+        >>> class AppStub(object):
+        ...     implements(ISchoolToolApplication)
+        >>> provideAdapter(lambda ignored: AppStub(),
+        ...                adapts=(None, ), provides=ISchoolToolApplication)
+        >>> provideAdapter(lambda app: container,
+        ...                adapts=(ISchoolToolApplication, ),
+        ...                provides=IEmailContainer)
+
+        >>> util = SMTPEmailUtility()
+        >>> util.send(Email('from@test', ['to@test'], 'Hello'))
+        True
+
+    The server hangs up in the middle of the conversation.  The email
+    is queued and closing the dead connection does not fail.
+
+        >>> email = Email('from@test', ['drop@test'], 'Hello')
+        >>> util.send(email)
+        False
+        >>> email.status_code
+        20
+        >>> list(container.values()) == [email]
+        True
+
+        >>> server.stop()
+
+    """
+
+
 def setUp(test=None):
     setup.placefulSetUp()
     provideAdapter(NameChooser, adapts=(IEmailContainer, ))
@@ -18,11 +18,19 @@
 """
 SchoolTool XLS export views.
 """
+import os
+import sys
 import xlwt
+import cPickle
 import datetime
+import traceback
 from operator import attrgetter
 from StringIO import StringIO
 
+import transaction
+from zope.app.publication.zopepublication import ZopePublication
+from zope.cachedescriptors.property import Lazy
+from zope.component.hooks import setSite
 from zope.interface import implements
 from zope.security.proxy import removeSecurityProxy
 
@@ -32,7 +40,6 @@ from schooltool.basicperson.interfaces import IDemographics, IBasicPerson
 from schooltool.basicperson.interfaces import IDemographicsFields
 from schooltool.common import SchoolToolMessage as _
 from schooltool.group.interfaces import IGroupContainer
-from schooltool.app.interfaces import ISchoolToolApplication
 from schooltool.app.interfaces import IAsset
 from schooltool.schoolyear.interfaces import ISchoolYear
 from schooltool.common import format_time_range
@@ -54,6 +61,10 @@ from schooltool.report.report import AbstractReportTask
 from schooltool.report.report import NoReportException
 from schooltool.report.report import ReportMessage
 from schooltool.report.report import OnPDFReportScheduled
+from schooltool.report.report import RemoteReportRequest
+from schooltool.task.celery import open_schooltool_db
+from schooltool.task.celery import reopen_schooltool_db
+from schooltool.task.celery import schooltool_worker_option
 from schooltool.timetable.interfaces import ITimetableContainer
 from schooltool.timetable.interfaces import IScheduleContainer
 from schooltool.timetable.interfaces import IHaveTimetables
@@ -292,10 +303,190 @@ class ContactRelationship(object):
         self.relationship = relationship
 
 
+class SheetRecorder(object):
+    """Records cells written to a worksheet, to replay them into a workbook."""
+
+    def __init__(self, name):
+        self.name = name
+        self.cells = []
+
+    def write(self, row, col, data, style):
+        self.cells.append((row, row, col, col, data, style))
+
+    def write_merge(self, r1, r2, c1, c2, data, style):
+        self.cells.append((r1, r2, c1, c2, data, style))
+
+    def replay(self, wb):
+        ws = wb.add_sheet(self.name)
+        for r1, r2, c1, c2, data, style in self.cells:
+            if (r1, c1) == (r2, c2):
+                ws.write(r1, c1, data, style)
+            else:
+                ws.write_merge(r1, r2, c1, c2, data, style)
+        return ws
+
+
+class RecordingWorkbook(object):
+    """A workbook that records sheets instead of writing them."""
+
+    def __init__(self):
+        self.sheets = []
+
+    def add_sheet(self, name):
+        sheet = SheetRecorder(name)
+        self.sheets.append(sheet)
+        return sheet
+
+
+class ForkedProcessError(Exception):
+    """A forked process did not return a result."""
+
+
+class ForkedProcess(object):
+    """Calls a function in a forked child process.
+
+    The result is pickled back through a pipe.  Report workers run in
+    daemonic processes, which multiprocessing does not allow to have
+    children, so the child is forked directly.
+    """
+
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+        self.pid = None
+        self.fd = None
+
+    def start(self):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if not pid:
+            os.close(read_fd)
+            status = 1
+            try:
+                try:
+                    result = self.func(*self.args)
+                    output = os.fdopen(write_fd, 'wb')
+                    cPickle.dump(result, output, cPickle.HIGHEST_PROTOCOL)
+                    output.close()
+                    status = 0
+                except:
+                    traceback.print_exc()
+                    sys.stderr.flush()
+            finally:
+                os._exit(status)
+        os.close(write_fd)
+        self.pid = pid
+        self.fd = read_fd
+
+    def result(self):
+        """Wait for the child and return the result of the call."""
+        input = os.fdopen(self.fd, 'rb')
+        try:
+            data = input.read()
+        finally:
+            input.close()
+        pid, status = os.waitpid(self.pid, 0)
+        if status or not data:
+            raise ForkedProcessError(self.func.__name__, self.args, status)
+        return cPickle.loads(data)
+
+
+class ExportLookups(object):
+    """Memoized lookups shared by all sheets of an export."""
+
+    def __init__(self, app):
+        self.app = app
+        self._school_year_ids = {}
+        self._course_level_ids = {}
+        self._membership_states = {}
+
+    @Lazy
+    def demographics_fields(self):
+        return list(IDemographicsFields(self.app).values())
+
+    def school_year_id(self, container):
+        try:
+            return self._school_year_ids[container]
+        except KeyError:
+            result = ISchoolYear(container).__name__
+            self._school_year_ids[container] = result
+            return result
+
+    def course_level_ids(self, course):
+        try:
+            return self._course_level_ids[course]
+        except KeyError:
+            result = ', '.join([l.__name__ for l in course.levels])
+            self._course_level_ids[course] = result
+            return result
+
+    def membership_states(self, relationship):
+        """Targets and their states, sorted by target name."""
+        key = (relationship.this, hash(relationship.rel_type),
+               hash(relationship.my_role), hash(relationship.other_role))
+        try:
+            return self._membership_states[key]
+        except KeyError:
+            states = [(info.target.__name__, info.target, list(info.state))
+                      for info in relationship.all().relationships]
+            result = [(target, state)
+                      for name, target, state in sorted(states)]
+            self._membership_states[key] = result
+            return result
+
+
+def export_sheet_in_process(name):
+    """Export a sheet in a child process, using its own database connection.
+
+    The transaction is doomed, so the connection is read-only.
+    """
+    connection = reopen_schooltool_db().open()
+    try:
+        transaction.get().doom()
+        app = connection.root()[ZopePublication.root_name]
+        setSite(app)
+        exporter = MegaExporter(app, RemoteReportRequest())
+        exporter.addImporters(exporter.task_progress)
+        wb = RecordingWorkbook()
+        getattr(exporter, name)(wb)
+        return wb.sheets
+    finally:
+        transaction.abort()
+        setSite(None)
+        connection.close()
+
+
 class MegaExporter(SchoolTimetableExportView):
 
     overall_line_id = 'overall'
 
+    sheet_exporters = (
+        'export_school_years',
+        'export_terms',
+        'export_school_timetables',
+        'export_resources',
+        'export_levels',
+        'export_persons',
+        'export_contacts',
+        'export_courses',
+        'export_sections',
+        'export_sections_enrollment',
+        'export_section_timetables',
+        'export_groups',
+        )
+
+    @Lazy
+    def export_processes(self):
+        """Number of sheets exported at the same time in child processes.
+
+        Sheets are exported one after another in this process if it is 1.
+        """
+        return schooltool_worker_option('SCHOOLTOOL_EXPORT_PROCESSES', 1)
+
+    @Lazy
+    def lookups(self):
+        return ExportLookups(removeSecurityProxy(self.context))
+
     def print_table(self, table, ws, row=0, col=0):
         for y, cells in enumerate(table):
             self.print_row(cells, ws, row=(row+y), col=col)
@@ -460,9 +651,7 @@ class MegaExporter(SchoolTimetableExportView):
                 return demographics[attribute]
             return getter
 
-        app = ISchoolToolApplication(None)
-        demographics_fields = IDemographicsFields(app)
-        for field in demographics_fields.values():
+        for field in self.lookups.demographics_fields:
             title = field.title
             format = Text
             if isinstance(field, DateFieldDescription):
@@ -588,16 +777,16 @@ class MegaExporter(SchoolTimetableExportView):
         self.finish('export_levels')
 
     def format_courses(self):
-        def get_course_level(course):
-            return ', '.join([l.__name__ for l in course.levels])
-        fields = [('School Year', Text, lambda c: ISchoolYear(c).__name__),
+        lookups = self.lookups
+        fields = [('School Year', Text,
+                   lambda c: lookups.school_year_id(c.__parent__)),
                   ('ID', Text, attrgetter('__name__')),
                   ('Title', Text, attrgetter('title')),
                   ('Description', Text, attrgetter('description')),
                   ('Local ID', Text, attrgetter('course_id')),
                   ('Government ID', Text, attrgetter('government_id')),
                   ('Credits', Text, attrgetter('credits')),
-                  ('Grade Level ID', Text, get_course_level)]
+                  ('Grade Level ID', Text, lookups.course_level_ids)]
 
         school_years = ISchoolYearContainer(self.context).values()
         items = []
@@ -686,14 +875,12 @@ class MegaExporter(SchoolTimetableExportView):
         self.finish('export_sections')
 
     def format_membership_block(self, relationship, headers):
-        items = sorted(relationship.all(),
-                       key=lambda item: item.__name__)
+        items = self.lookups.membership_states(relationship)
         if not items:
             return []
         table = [headers]
-        for item in items:
+        for item, state in items:
             cells = [Text(item.__name__), Text('')]
-            state = relationship.state(item)
             for x, (date, meaning, code) in enumerate(state):
                 cells.append(Date(date))
                 cells.append(Text(code))
@@ -826,7 +1013,8 @@ class MegaExporter(SchoolTimetableExportView):
     def format_group(self, group, ws, offset):
         fields = [lambda i: ("Group Title", i.title, None),
                   lambda i: ("ID", i.__name__, None),
-                  lambda i: ("School Year", ISchoolYear(i.__parent__).__name__, None),
+                  lambda i: ("School Year",
+                             self.lookups.school_year_id(i.__parent__), None),
                   lambda i: ("Description", i.description, None)]
 
         offset = self.listFields(group, fields, ws, offset)
@@ -894,6 +1082,42 @@ class MegaExporter(SchoolTimetableExportView):
         super(MegaExporter, self).update()
         self.addImporters(self.task_progress)
 
+    def export_sheets_in_processes(self):
+        if open_schooltool_db() is None:
+            return None
+        for name in self.sheet_exporters:
+            self.task_progress.force(name, active=True)
+        recorded = {}
+        pending = list(self.sheet_exporters)
+        running = []
+        while pending or running:
+            while pending and len(running) < self.export_processes:
+                process = ForkedProcess(export_sheet_in_process,
+                                        pending.pop(0))
+                process.start()
+                running.append(process)
+            process = running.pop(0)
+            name = process.args[0]
+            try:
+                recorded[name] = process.result()
+            except ForkedProcessError:
+                wb = RecordingWorkbook()
+                getattr(self, name)(wb)
+                recorded[name] = wb.sheets
+            self.finish(name)
+        return recorded
+
+    def export_sheets(self, wb):
+        if self.export_processes > 1:
+            recorded = self.export_sheets_in_processes()
+            if recorded is not None:
+                for name in self.sheet_exporters:
+                    for sheet in recorded[name]:
+                        sheet.replay(wb)
+                return
+        for name in self.sheet_exporters:
+            getattr(self, name)(wb)
+
     def render(self, workbook):
         datafile = StringIO()
         workbook.save(datafile)
@@ -907,18 +1131,7 @@ class MegaExporter(SchoolTimetableExportView):
         self.addImporters(self.task_progress)
 
         wb = xlwt.Workbook()
-        self.export_school_years(wb)
-        self.export_terms(wb)
-        self.export_school_timetables(wb)
-        self.export_resources(wb)
-        self.export_levels(wb)
-        self.export_persons(wb)
-        self.export_contacts(wb)
-        self.export_courses(wb)
-        self.export_sections(wb)
-        self.export_sections_enrollment(wb)
-        self.export_section_timetables(wb)
-        self.export_groups(wb)
+        self.export_sheets(wb)
         self.task_progress.title = _("Export complete")
         self.task_progress.force('overall', progress=1.0)
         data = self.render(wb)
@@ -20,6 +20,7 @@ SchoolTool simple import views.
 """
 import xlrd
 import datetime
+import time
 import urllib
 import transaction
 from decimal import Decimal, InvalidOperation
@@ -83,6 +84,7 @@ from schooltool.task.state import TaskWriteState, TaskReadState
 from schooltool.task.tasks import get_message_by_id, query_message
 from schooltool.task.tasks import TaskScheduledNotification
 from schooltool.task.progress import TaskProgress
+from schooltool.task.browser.task import TaskProgressDialog
 from schooltool.report.interfaces import IReportTask
 from schooltool.report.report import AbstractReportTask
 from schooltool.report.report import NoReportException
@@ -170,13 +172,16 @@ class ImporterBase(object):
     title = _("Import")
 
     def __init__(self, context, request,
-                 progress_callback=None):
+                 progress_callback=None, row_callback=None):
         self.context, self.request = context, request
         self.errors = []
         self.progress_callback = progress_callback
+        self.row_callback = row_callback
 
     def progress(self, *args):
         progress = normalized_progress(*args)
+        if self.row_callback is not None:
+            self.row_callback()
         if self.progress_callback is not None:
             self.progress_callback(progress)
 
@@ -1382,6 +1387,8 @@ class SectionImporter(ImporterBase):
         persons = self.context['persons']
         if self.getCellValue(sh, row, 0, '') == 'Students':
             row += 1
+            new_members = []
+            new_students = []
             for row in range(row, sh.nrows):
                 if self.isEmptyRow(sh, row):
                     break
@@ -1393,16 +1400,22 @@ class SectionImporter(ImporterBase):
                 if username not in persons:
                     self.error(row, 0, ERROR_INVALID_PERSON_ID)
                     continue
-                member = persons[username]
-
-                if member not in section.members:
-                    section.members.add(removeSecurityProxy(member))
-                if member not in students.members:
-                    students.members.add(removeSecurityProxy(member))
+                member = removeSecurityProxy(persons[username])
+
+                if (member not in section.members and
+                    member not in new_members):
+                    new_members.append(member)
+                if (member not in students.members and
+                    member not in new_students):
+                    new_students.append(member)
+            section.members.addMany(new_members)
+            students.members.addMany(new_students)
             row += 1
 
         if self.getCellValue(sh, row, 0, '') == 'Instructors':
             row += 1
+            new_instructors = []
+            new_teachers = []
             for row in range(row, sh.nrows):
                 if self.isEmptyRow(sh, row):
                     break
@@ -1414,12 +1427,16 @@ class SectionImporter(ImporterBase):
                 if username not in persons:
                     self.error(row, 0, ERROR_INVALID_PERSON_ID)
                     continue
-                instructor = persons[username]
-
-                if instructor not in section.instructors:
-                    section.instructors.add(removeSecurityProxy(instructor))
-                if instructor not in teachers.members:
-                    teachers.members.add(removeSecurityProxy(instructor))
+                instructor = removeSecurityProxy(persons[username])
+
+                if (instructor not in section.instructors and
+                    instructor not in new_instructors):
+                    new_instructors.append(instructor)
+                if (instructor not in teachers.members and
+                    instructor not in new_teachers):
+                    new_teachers.append(instructor)
+            section.instructors.addMany(new_instructors)
+            teachers.members.addMany(new_teachers)
             row += 1
 
         if self.getCellValue(sh, row, 0, '') == 'School Timetable':
@@ -2224,6 +2241,16 @@ class FlourishRemoteMegaImporter(flourish.page.Page):
             (message, self.request, self), name='long')
         return content
 
+    @property
+    def batch_size(self):
+        try:
+            batch_size = int(self.request.get('batch_size') or 0)
+        except (TypeError, ValueError):
+            return None
+        if batch_size <= 0:
+            return None
+        return batch_size
+
     def scheduleImport(self):
         xls_upload = self.request.get('xls_file', '')
         if not xls_upload:
@@ -2232,6 +2259,7 @@ class FlourishRemoteMegaImporter(flourish.page.Page):
 
         app = ISchoolToolApplication(None)
         task = ImportTask(RemoteMegaImporter, app)
+        task.batch_size = self.batch_size
         task.request_params.update(self.form_params)
         task.schedule(self.request)
         message = query_message(task)
@@ -2293,30 +2321,59 @@ class OldeImportProgress(Timer):
         self.task_status.set_progress(self.value)
 
 
-class RemoteMegaImporter(MegaImporter):
+class ImportBatches(object):
+    """Counts imported rows and flushes them every `size` rows."""
 
-    message_title = _('import spreadsheet')
+    def __init__(self, size=None, flush=None):
+        self.size = size
+        self.flush = flush
+        self.rows = 0
+        self.pending = 0
+        self.started = time.time()
 
-    def update(self):
-        remote_task = self.request.task
+    def __call__(self):
+        self.rows += 1
+        self.pending += 1
+        if (self.size and self.flush is not None and
+            self.pending >= self.size):
+            self.flush()
+            self.pending = 0
 
-        total_importers = len(self.importers)
-        importers = self.importers
+    @property
+    def rate(self):
+        elapsed = time.time() - self.started
+        if elapsed <= 0:
+            return None
+        return self.rows / elapsed
 
-        progress = ImportProgress(self.importers, self.request.task_id)
 
+class RemoteMegaImporter(MegaImporter):
+
+    message_title = _('import spreadsheet')
+
+    def openWorkbook(self):
+        remote_task = self.request.task
         xls = remote_task.xls_file.open()
-        wb = xlrd.open_workbook(file_contents=xls.read())
+        # Sheets are parsed when an importer asks for them and unloaded
+        # after it is done, so only a few sheets are in memory at a time.
+        wb = xlrd.open_workbook(file_contents=xls.read(), on_demand=True)
         xls.close()
+        return wb
 
-        if wb is None:
-            progress.finish('overall')
-            return progress.lines
+    def unloadSheets(self, wb):
+        for name in wb.sheet_names():
+            if wb.sheet_loaded(name):
+                wb.unload_sheet(name)
 
-        progress('overall', active=True)
-        savepoint = transaction.savepoint(optimistic=True)
-        for importer_n, importer in enumerate(importers):
+    def runImporters(self, wb, progress, batch_size=None, flush=None,
+                     first=0, checkpoint=None, phase=(0, 1)):
+        total_importers = len(self.importers)
+        phase_n, total_phases = phase
+        for importer_n, importer in enumerate(self.importers):
             importer_lid = str(importer_n)
+            if importer_n < first:
+                progress(importer_lid, progress=1.0, active=False)
+                continue
             for lid in progress.lines:
                 if lid == importer_lid:
                     progress(lid, active=True, progress=0.0)
@@ -2325,25 +2382,83 @@ class RemoteMegaImporter(MegaImporter):
                 else:
                     progress(lid, active=False)
 
+            rows = ImportBatches(batch_size, flush)
+
             def import_progress(value):
-                progress(importer_lid, progress=value, active=True)
+                progress(importer_lid, progress=value, active=True,
+                         rows=rows.rows, rate=rows.rate)
                 progress('overall', progress=normalized_progress(
+                    phase_n, total_phases,
                     importer_n, total_importers, value, 1.0), active=True)
 
             imp = importer(
                 self.context, self.request,
-                progress_callback=import_progress)
+                progress_callback=import_progress,
+                row_callback=rows)
             imp.import_data(wb)
+            self.unloadSheets(wb)
 
             for error in imp.errors:
                 progress.error(importer_lid, error)
                 progress.error('overall', error)
                 self.errors.append(error)
 
+            progress(importer_lid, rows=rows.rows, rate=rows.rate)
             progress.finish(importer_lid)
-
-        if progress['overall']['errors']:
+            if checkpoint is not None and not imp.errors:
+                checkpoint(importer_n)
+
+    def importInBatches(self, wb, progress, remote_task):
+        """Validate the whole workbook, then import it committing in batches.
+
+        The validation pass keeps memory bounded by spilling changes to
+        savepoints every batch of rows, and rolls them all back.  The
+        commit pass commits every batch of rows and records the next
+        importer to run in the task, so that a retried task resumes from
+        there.  Importers update existing objects, so re-running the
+        interrupted importer is safe.
+        """
+        batch_size = remote_task.batch_size
+        if remote_task.checkpoint is None:
+            savepoint = transaction.savepoint(optimistic=True)
+            self.runImporters(
+                wb, progress, batch_size=batch_size,
+                flush=lambda: transaction.savepoint(optimistic=True),
+                phase=(0, 2))
             savepoint.rollback()
+            if progress['overall']['errors']:
+                return
+            remote_task.checkpoint = 0
+            transaction.commit()
+
+        def checkpoint(importer_n):
+            remote_task.checkpoint = importer_n + 1
+            transaction.commit()
+
+        self.runImporters(
+            wb, progress, batch_size=batch_size, flush=transaction.commit,
+            first=remote_task.checkpoint, checkpoint=checkpoint,
+            phase=(1, 2))
+
+    def update(self):
+        remote_task = self.request.task
+
+        progress = ImportProgress(self.importers, self.request.task_id)
+
+        wb = self.openWorkbook()
+
+        if wb is None:
+            progress.finish('overall')
+            return progress.lines
+
+        progress('overall', active=True)
+        if getattr(remote_task, 'batch_size', None):
+            self.importInBatches(wb, progress, remote_task)
+        else:
+            savepoint = transaction.savepoint(optimistic=True)
+            self.runImporters(wb, progress)
+            if progress['overall']['errors']:
+                savepoint.rollback()
 
         progress.finish('overall')
         return progress.lines
@@ -2384,6 +2499,8 @@ class ImportTask(AbstractReportTask):
 
     xls_file = None
     errors = None
+    batch_size = None
+    checkpoint = None
 
     def update(self, request):
         file_upload = request['xls_file']
@@ -2514,6 +2631,35 @@ class ImportProgressContent(flourish.page.Content, ImportProgressPage):
     pass
 
 
+def format_import_rate(rate):
+    if rate is None:
+        return None
+    return '%.1f' % rate
+
+
+class ImportTaskProgressDialog(TaskProgressDialog):
+
+    @property
+    def imported(self):
+        """Rows imported and rows per second of every importer."""
+        if not self.completed:
+            return []
+        lines = self.task.result
+        if not isinstance(lines, dict):
+            return []
+        result = []
+        for lid in sorted([lid for lid in lines if lid != 'overall'], key=int):
+            line = lines[lid]
+            if line.get('rows') is None:
+                continue
+            result.append({
+                'title': line['title'],
+                'rows': line['rows'],
+                'rate': format_import_rate(line.get('rate')),
+                })
+        return result
+
+
 class DownloadFile(BrowserView):
 
     attribute = None
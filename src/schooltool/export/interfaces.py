@@ -57,3 +57,13 @@ class IImporterTask(IRemoteTask):
     xls_file = zope.schema.Object(
         title=_("XLS File"),
         schema=IImportFile)
+
+    batch_size = zope.schema.Int(
+        title=u"Batch size",
+        description=u"Commit the import every this many rows.",
+        required=False)
+
+    checkpoint = zope.schema.Int(
+        title=u"Checkpoint",
+        description=u"Index of the next importer to commit.",
+        required=False)
@@ -37,6 +37,17 @@ ST.export = $.extend(ST.export, {importer: function() {
         wait_to_poll(progress_id, task_id);
     }
 
+    function update_progress_rows(part, row, info) {
+        if (info.rows === undefined) {
+            return;
+        }
+        var rows = $(part).find('div[name="rows-template"]').children().clone();
+        rows.find('span[name="rows"]').text(info.rows);
+        rows.find('span[name="rate"]').text(
+            info.rate ? info.rate.toFixed(1) : '-');
+        row.find('td[name="rows"]').empty().append(rows);
+    }
+
     function update_progress_table(progress_id, part, progress) {
         var tbody = $(part).find('table tbody');
         for (var counter in progress.info) {
@@ -44,12 +55,13 @@ ST.export = $.extend(ST.export, {importer: function() {
             var row = tbody.find('tr[name="'+counter+'"]');
             if (row.length == 0) {
                 part.find('table tbody:last').append($(
-                    '<tr name="'+counter+'"><td name="title"></td><td width="80%"><div name="progress"></div></td></tr>'));
+                    '<tr name="'+counter+'"><td name="title"></td><td width="60%"><div name="progress"></div></td><td name="rows"></td></tr>'));
                 row = tbody.find('tr[name="'+counter+'"]');
             }
             var counter_value = progress.info[counter].progress * 100;
             row.find('td[name="title"]').html(progress.info[counter].title);
                 row.find('div[name="progress"]').progressbar({value:counter_value});
+            update_progress_rows(part, row, progress.info[counter]);
 
             if (progress.info[counter].active) {
                 row.show();
@@ -18,9 +18,12 @@
 """
 Tests for SchoolTool XLS export views.
 """
+import os
+import sys
 import unittest
 import doctest
 from datetime import date, time
+from StringIO import StringIO
 
 from schooltool.basicperson.interfaces import IDemographics
 from schooltool.basicperson.person import BasicPerson
@@ -460,6 +463,117 @@ def doctest_MegaExporter_holidays():
     """
 
 
+def doctest_RecordingWorkbook():
+    """Sheets exported in other processes are recorded and replayed.
+
+        >>> from schooltool.export.export import RecordingWorkbook
+        >>> app = ISchoolToolApplication(None)
+        >>> setUpSchool(app)
+        >>> exporter = MegaExporter(app, None)
+
+        >>> recording = RecordingWorkbook()
+        >>> exporter.export_contacts(recording)
+        >>> [sheet.name for sheet in recording.sheets]
+        ['Contact Persons', 'Contact Relationships']
+
+        >>> class WorkbookStub(object):
+        ...     def add_sheet(self, name):
+        ...         print 'Sheet', name
+        ...         return WorkSheetStub()
+
+        >>> ws = recording.sheets[1].replay(WorkbookStub())
+        Sheet Contact Relationships
+        >>> print ws.format()
+        +-----------+-------------+--------------+---+
+        | Person ID | Contact ID  | Relationship |   |
+        | pete      | pete_parent | 2005-02-01   | p |
+        | pete      | teacher     | 2005-02-01   | p |
+        +-----------+-------------+--------------+---+
+
+    """
+
+
+def exportInChild(name):
+    if name == 'broken':
+        raise ValueError(name)
+    return [name, os.getpid()]
+
+
+def doctest_ForkedProcess():
+    """Sheets are exported in forked child processes.
+
+        >>> from schooltool.export.export import ForkedProcess
+
+        >>> process = ForkedProcess(exportInChild, 'export_terms')
+        >>> process.start()
+        >>> name, pid = process.result()
+        >>> name
+        'export_terms'
+        >>> pid == process.pid != os.getpid()
+        True
+
+    Failures in the child are reported to the parent.
+
+        >>> process = ForkedProcess(exportInChild, 'broken')
+        >>> old_stderr = sys.stderr
+        >>> sys.stderr = StringIO()
+        >>> process.start()
+        >>> process.result()
+        Traceback (most recent call last):
+          ...
+        ForkedProcessError: ('exportInChild', ('broken',), 256)
+        >>> sys.stderr = old_stderr
+
+    """
+
+
+def doctest_ExportLookups_membership_states():
+    """Relationship states are looked up once per export.
+
+        >>> from schooltool.export.export import ExportLookups
+
+        >>> class TargetStub(object):
+        ...     def __init__(self, name):
+        ...         self.__name__ = name
+        ...     def __repr__(self):
+        ...         return self.__name__
+
+        >>> class InfoStub(object):
+        ...     def __init__(self, name, state):
+        ...         self.target = TargetStub(name)
+        ...         self.state = state
+
+        >>> class RelationshipStub(object):
+        ...     rel_type = 'example:Membership'
+        ...     my_role = 'example:Group'
+        ...     other_role = 'example:Member'
+        ...     def __init__(self, this, infos):
+        ...         self.this = this
+        ...         self.relationships = infos
+        ...     def all(self):
+        ...         print 'Looking up', self.this
+        ...         return self
+
+        >>> lookups = ExportLookups(None)
+        >>> members = [InfoStub('jon', [(date(2005, 2, 1), 'a', 'a')]),
+        ...            InfoStub('ann', [(date(2005, 2, 1), 'a', 'a'),
+        ...                             (date(2005, 3, 1), 'i', 'i')])]
+        >>> lookups.membership_states(RelationshipStub('section', members))
+        Looking up section
+        [(ann, [(datetime.date(2005, 2, 1), 'a', 'a'),
+                (datetime.date(2005, 3, 1), 'i', 'i')]),
+         (jon, [(datetime.date(2005, 2, 1), 'a', 'a')])]
+
+        >>> lookups.membership_states(RelationshipStub('section', members))
+        [(ann, ...), (jon, ...)]
+
+        >>> lookups.membership_states(RelationshipStub('group', []))
+        Looking up group
+        []
+
+    """
+
+
 def doctest_MegaExporter_merge_ranges():
     """
 
@@ -494,6 +608,235 @@ def doctest_MegaExporter_merge_ranges():
     """
 
 
+class SheetImporterStub(object):
+    """An importer that reports a number of rows, failing if asked to."""
+
+    rows = 3
+    fail = False
+
+    def __init__(self, context, request,
+                 progress_callback=None, row_callback=None):
+        self.errors = []
+        self.row_callback = row_callback
+
+    def import_data(self, wb):
+        for n in range(self.rows):
+            print 'import', self.title, n
+            self.row_callback()
+        if self.fail:
+            self.errors.append('%s is bad' % self.title)
+
+
+class ProgressStub(object):
+
+    def __init__(self, importers):
+        self.lines = dict([(str(n), {'errors': []})
+                           for n in range(len(importers))])
+        self.lines['overall'] = {'errors': []}
+
+    def __call__(self, line_id, **kw):
+        self.lines[line_id].update(kw)
+
+    def __getitem__(self, line_id):
+        return self.lines[line_id]
+
+    def error(self, line_id, error):
+        self.lines[line_id]['errors'].append(error)
+
+    def finish(self, line_id):
+        pass
+
+
+class WorkbookStub(object):
+
+    def sheet_names(self):
+        return []
+
+
+def doctest_ImportBatches():
+    """Tests for ImportBatches.
+
+        >>> from schooltool.export.importer import ImportBatches
+
+        >>> def flush():
+        ...     print 'flush'
+
+    Rows are flushed every `size` rows.
+
+        >>> rows = ImportBatches(2, flush)
+        >>> for n in range(5):
+        ...     rows()
+        flush
+        flush
+        >>> rows.rows, rows.pending
+        (5, 1)
+        >>> rows.rate > 0
+        True
+
+    Without a size, rows are only counted.
+
+        >>> rows = ImportBatches()
+        >>> for n in range(5):
+        ...     rows()
+        >>> rows.rows, rows.pending
+        (5, 5)
+
+    """
+
+
+def doctest_RemoteMegaImporter_runImporters():
+    """Tests for RemoteMegaImporter.runImporters with small batches.
+
+        >>> from schooltool.export.importer import RemoteMegaImporter
+
+        >>> class Persons(SheetImporterStub):
+        ...     title = 'Persons'
+        >>> class Groups(SheetImporterStub):
+        ...     title = 'Groups'
+        ...     rows = 2
+
+        >>> class ImporterForTest(RemoteMegaImporter):
+        ...     importers = [Persons, Groups]
+
+        >>> def flush():
+        ...     print 'flush'
+        >>> def checkpoint(importer_n):
+        ...     print 'checkpoint', importer_n
+
+    Every importer flushes its own rows and is checkpointed when done.
+
+        >>> importer = ImporterForTest(None, None)
+        >>> progress = ProgressStub(importer.importers)
+        >>> importer.runImporters(WorkbookStub(), progress, batch_size=2,
+        ...                       flush=flush, checkpoint=checkpoint)
+        import Persons 0
+        import Persons 1
+        flush
+        import Persons 2
+        checkpoint 0
+        import Groups 0
+        import Groups 1
+        flush
+        checkpoint 1
+
+        >>> progress['0']['rows'], progress['1']['rows']
+        (3, 2)
+
+    A resumed import skips the importers before the checkpoint.
+
+        >>> importer.runImporters(WorkbookStub(), progress, batch_size=2,
+        ...                       flush=flush, first=1, checkpoint=checkpoint)
+        import Groups 0
+        import Groups 1
+        flush
+        checkpoint 1
+
+    Importers with errors are not checkpointed.
+
+        >>> Groups.fail = True
+        >>> importer.runImporters(WorkbookStub(), progress,
+        ...                       first=1, checkpoint=checkpoint)
+        import Groups 0
+        import Groups 1
+        >>> importer.errors
+        ['Groups is bad']
+
+    """
+
+
+def doctest_RemoteMegaImporter_importInBatches():
+    """Tests for RemoteMegaImporter.importInBatches.
+
+        >>> from schooltool.export.importer import RemoteMegaImporter
+
+        >>> class Persons(SheetImporterStub):
+        ...     title = 'Persons'
+        ...     rows = 2
+        >>> class Groups(SheetImporterStub):
+        ...     title = 'Groups'
+        ...     rows = 1
+
+        >>> class ImporterForTest(RemoteMegaImporter):
+        ...     importers = [Persons, Groups]
+
+        >>> class TaskStub(object):
+        ...     batch_size = 1
+        ...     checkpoint = None
+
+    The workbook is checked first and then imported for real; the task
+    remembers where to resume from.
+
+        >>> importer = ImporterForTest(None, None)
+        >>> task = TaskStub()
+        >>> importer.importInBatches(
+        ...     WorkbookStub(), ProgressStub(importer.importers), task)
+        import Persons 0
+        import Persons 1
+        import Groups 0
+        import Persons 0
+        import Persons 1
+        import Groups 0
+        >>> task.checkpoint
+        2
+
+    A retried task continues after the last finished importer.
+
+        >>> task.checkpoint = 1
+        >>> importer.importInBatches(
+        ...     WorkbookStub(), ProgressStub(importer.importers), task)
+        import Groups 0
+
+    If checking finds errors, nothing is imported.
+
+        >>> Groups.fail = True
+        >>> task = TaskStub()
+        >>> progress = ProgressStub(importer.importers)
+        >>> importer.importInBatches(WorkbookStub(), progress, task)
+        import Persons 0
+        import Persons 1
+        import Groups 0
+        >>> progress['overall']['errors']
+        ['Groups is bad']
+        >>> print task.checkpoint
+        None
+
+    """
+
+
+def doctest_ImportTaskProgressDialog_imported():
+    """Tests for ImportTaskProgressDialog.imported.
+
+        >>> from schooltool.export.importer import ImportTaskProgressDialog
+
+        >>> class TaskStub(object):
+        ...     result = {
+        ...         'overall': {'title': 'Overall', 'progress': 1.0},
+        ...         '10': {'title': 'Sections', 'rows': 0, 'rate': None},
+        ...         '2': {'title': 'Groups', 'rows': 30, 'rate': 12.345},
+        ...         '0': {'title': 'Persons', 'progress': 1.0},
+        ...         }
+
+        >>> class DialogForTest(ImportTaskProgressDialog):
+        ...     completed = False
+        ...     task = TaskStub()
+
+    Nothing is shown until the import is completed.
+
+        >>> dialog = DialogForTest(None, None)
+        >>> dialog.imported
+        []
+
+    Then every importer that counted rows is listed in order.
+
+        >>> dialog.completed = True
+        >>> for line in dialog.imported:
+        ...     print line['title'], line['rows'], line['rate']
+        Groups 30 12.3
+        Sections 0 None
+
+    """
+
+
 def test_suite():
     optionflags = (doctest.ELLIPSIS |
                    doctest.NORMALIZE_WHITESPACE |
@@ -0,0 +1,58 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Upgrade SchoolTool to generation 44.
+
+Store calendar events in BTrees indexed by event start.
+"""
+from BTrees.OOBTree import OOBTree
+from zope.app.generations.utility import getRootFolder, findObjectsProviding
+from zope.annotation.interfaces import IAnnotatable, IAnnotations
+from zope.component.hooks import getSite, setSite
+
+from schooltool.generations import linkcatalogs
+
+CALENDAR_KEY = 'schooltool.app.calendar.Calendar'
+SCHEDULE_CALENDAR_KEY = 'schooltool.timetable.app.ScheduleCalendar'
+
+
+def evolveCalendar(calendar):
+    if isinstance(calendar.events, OOBTree):
+        return
+    calendar.events = OOBTree(calendar.events)
+    calendar.reindex()
+
+
+def evolve(context):
+    linkcatalogs.ensureEvolved(context)
+    root = getRootFolder(context)
+
+    old_site = getSite()
+    app = root
+    setSite(app)
+
+    for candidate in findObjectsProviding(app, IAnnotatable):
+        annotations = IAnnotations(candidate, None)
+        if annotations is None:
+            continue
+        for key in (CALENDAR_KEY, SCHEDULE_CALENDAR_KEY):
+            calendar = annotations.get(key)
+            if calendar is not None:
+                evolveCalendar(calendar)
+
+    setSite(old_site)
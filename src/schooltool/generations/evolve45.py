@@ -0,0 +1,56 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Upgrade SchoolTool to generation 45.
+
+Store schooldays of terms in bitmaps.
+"""
+from zope.app.generations.utility import getRootFolder
+from zope.component.hooks import getSite, setSite
+
+from schooltool.schoolyear.interfaces import ISchoolYearContainer
+
+
+def evolveTerm(term):
+    term._p_activate()
+    schooldays = term.__dict__.get('_schooldays')
+    if schooldays is None:
+        return
+    del term._schooldays
+    origin = term.first
+    if schooldays:
+        origin = min(origin, min(schooldays))
+    term._schoolday_origin = origin
+    term._schoolday_bits = ''
+    term._changeSchooldays(
+        [(date - origin).days for date in schooldays], True)
+
+
+def evolve(context):
+    root = getRootFolder(context)
+
+    old_site = getSite()
+    app = root
+    setSite(app)
+
+    schoolyears = ISchoolYearContainer(app)
+    for schoolyear in schoolyears.values():
+        for term in schoolyear.values():
+            evolveTerm(term)
+
+    setSite(old_site)
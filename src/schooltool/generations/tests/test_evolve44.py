@@ -0,0 +1,73 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Unit tests for schooltool.generations.evolve44
+"""
+import unittest
+import doctest
+from datetime import datetime, timedelta
+
+from persistent.dict import PersistentDict
+from pytz import utc
+
+
+def doctest_evolveCalendar():
+    """Test evolution of calendars to generation 44.
+
+    Old calendars kept their events in a PersistentDict and had no index.
+
+        >>> from schooltool.app.cal import Calendar, CalendarEvent
+        >>> calendar = Calendar(None)
+        >>> event = CalendarEvent(datetime(2005, 2, 1, 10), timedelta(hours=1),
+        ...                       'Event', unique_id='e1')
+        >>> event.__parent__ = calendar
+        >>> calendar.events = PersistentDict({'e1': event})
+        >>> for name in ('_starts', '_recurring', '_indexed', '_max_duration'):
+        ...     delattr(calendar, name)
+
+        >>> from schooltool.generations.evolve44 import evolveCalendar
+        >>> evolveCalendar(calendar)
+
+        >>> calendar.events
+        <BTrees.OOBTree.OOBTree object at ...>
+        >>> list(calendar) == [event]
+        True
+        >>> [e.title for e in calendar.expand(
+        ...     datetime(2005, 2, 1, tzinfo=utc),
+        ...     datetime(2005, 2, 2, tzinfo=utc))]
+        ['Event']
+
+    Evolved calendars are left alone.
+
+        >>> events = calendar.events
+        >>> evolveCalendar(calendar)
+        >>> calendar.events is events
+        True
+
+    """
+
+
+def test_suite():
+    optionflags = (doctest.ELLIPSIS |
+                   doctest.NORMALIZE_WHITESPACE |
+                   doctest.REPORT_ONLY_FIRST_FAILURE)
+    return doctest.DocTestSuite(optionflags=optionflags)
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
@@ -0,0 +1,125 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Unit tests for schooltool.generations.evolve45
+"""
+import unittest
+import doctest
+from datetime import date
+
+
+def doctest_evolveTerm():
+    """Test evolution of terms to generation 45.
+
+    Old terms kept their schooldays in a set.
+
+        >>> from schooltool.term.term import Term
+        >>> term = Term('Autumn', date(2005, 9, 1), date(2005, 9, 30))
+        >>> term.__dict__['_schooldays'] = set([
+        ...     date(2005, 9, 1), date(2005, 9, 2), date(2005, 9, 30)])
+        >>> for name in ('_schoolday_origin', '_schoolday_bits'):
+        ...     delattr(term, name)
+
+        >>> from schooltool.generations.evolve45 import evolveTerm
+        >>> evolveTerm(term)
+
+        >>> '_schooldays' in term.__dict__
+        False
+        >>> list(term.iterSchooldays())
+        [datetime.date(2005, 9, 1), datetime.date(2005, 9, 2),
+         datetime.date(2005, 9, 30)]
+        >>> term.isSchoolday(date(2005, 9, 3))
+        False
+        >>> len(term._schoolday_bits)
+        4
+
+    Schooldays outside the term are kept, like they were in the set.
+
+        >>> term = Term('Winter', date(2006, 1, 10), date(2006, 1, 20))
+        >>> term.__dict__['_schooldays'] = set([
+        ...     date(2006, 1, 5), date(2006, 1, 12)])
+        >>> evolveTerm(term)
+        >>> list(term.iterSchooldays())
+        [datetime.date(2006, 1, 12)]
+        >>> term.first = date(2006, 1, 1)
+        >>> list(term.iterSchooldays())
+        [datetime.date(2006, 1, 5), datetime.date(2006, 1, 12)]
+
+    Evolved terms are left alone.
+
+        >>> bits = term._schoolday_bits
+        >>> evolveTerm(term)
+        >>> term._schoolday_bits is bits
+        True
+
+    """
+
+
+def doctest_evolveTerm_stored():
+    """Test evolution of terms loaded from the database.
+
+    Terms are ghosts when the generation starts.
+
+        >>> import transaction
+        >>> from ZODB.DB import DB
+        >>> from ZODB.MappingStorage import MappingStorage
+        >>> from schooltool.term.term import Term
+
+        >>> db = DB(MappingStorage())
+        >>> connection = db.open()
+        >>> term = Term('Autumn', date(2005, 9, 1), date(2005, 9, 30))
+        >>> term.__dict__['_schooldays'] = set([
+        ...     date(2005, 9, 1), date(2005, 9, 30)])
+        >>> for name in ('_schoolday_origin', '_schoolday_bits'):
+        ...     delattr(term, name)
+        >>> connection.root()['term'] = term
+        >>> transaction.commit()
+        >>> connection.close()
+
+        >>> connection = db.open()
+        >>> term = connection.root()['term']
+        >>> term._p_changed is None
+        True
+
+        >>> from schooltool.generations.evolve45 import evolveTerm
+        >>> evolveTerm(term)
+        >>> transaction.commit()
+        >>> connection.close()
+
+        >>> connection = db.open()
+        >>> term = connection.root()['term']
+        >>> '_schooldays' in term.__dict__
+        False
+        >>> list(term.iterSchooldays())
+        [datetime.date(2005, 9, 1), datetime.date(2005, 9, 30)]
+
+        >>> connection.close()
+        >>> db.close()
+
+    """
+
+
+def test_suite():
+    optionflags = (doctest.ELLIPSIS |
+                   doctest.NORMALIZE_WHITESPACE |
+                   doctest.REPORT_ONLY_FIRST_FAILURE)
+    return doctest.DocTestSuite(optionflags=optionflags)
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
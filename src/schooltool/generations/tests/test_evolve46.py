@@ -0,0 +1,66 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Unit tests for schooltool.generations.evolve46
+"""
+import unittest
+import doctest
+from datetime import date
+
+
+def doctest_evolveExceptions():
+    """Test evolution of meeting exceptions to generation 46.
+
+    Old schedule containers kept exceptions in a PersistentDict.
+
+        >>> from persistent.dict import PersistentDict
+        >>> from persistent.list import PersistentList
+        >>> from schooltool.timetable.schedule import ScheduleContainer
+        >>> container = ScheduleContainer()
+        >>> container.exceptions = PersistentDict()
+        >>> container.exceptions[date(2011, 10, 30)] = PersistentList()
+        >>> container.exceptions[date(2011, 10, 29)] = PersistentList(['m'])
+
+        >>> from schooltool.generations.evolve46 import evolveExceptions
+        >>> evolveExceptions(container)
+
+        >>> container.exceptions
+        <BTrees.OOBTree.OOBTree object at ...>
+        >>> list(container.exceptions.items())
+        [(datetime.date(2011, 10, 29), ['m']),
+         (datetime.date(2011, 10, 30), [])]
+
+    Evolved exceptions are left alone.
+
+        >>> exceptions = container.exceptions
+        >>> evolveExceptions(container)
+        >>> container.exceptions is exceptions
+        True
+
+    """
+
+
+def test_suite():
+    optionflags = (doctest.ELLIPSIS |
+                   doctest.NORMALIZE_WHITESPACE |
+                   doctest.REPORT_ONLY_FIRST_FAILURE)
+    return doctest.DocTestSuite(optionflags=optionflags)
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
@@ -1,7 +1,12 @@
+from bisect import bisect_right
+
 from persistent import Persistent
 from zope.container.contained import Contained
 
 import zope.catalog.interfaces
+from BTrees import IFBTree
+from BTrees.IOBTree import IOBTree
+from BTrees.OIBTree import OIBTree
 from BTrees.OOBTree import OOBTree
 from zope.interface import implements
 from zope.container.btree import BTreeContainer
@@ -12,6 +17,9 @@ from zope.lifecycleevent import ObjectAddedEvent
 from zope.keyreference.interfaces import IKeyReference
 from zope.security.proxy import removeSecurityProxy
 from schooltool.relationship.interfaces import IRelationshipLink
+from schooltool.relationship.relationship import LinkTargetKeyReference
+from schooltool.relationship.temporal import ACTIVE, ACTIVE_CODE
+from schooltool.relationship.temporal import TemporalURIObject
 from schooltool.app.interfaces import ISchoolToolApplication
 from schooltool.app.catalog import AttributeCatalog
 from schooltool.app.app import StartUpBase
@@ -43,6 +51,18 @@ def hash_this_rel_type(link):
     return hash(link.rel_type), hash(link_this_keyref(link))
 
 
+def hash_this_rel_type_role(link):
+    return (hash(link_this_keyref(link)), hash(link.rel_type), hash(link.role))
+
+
+def link_target_intid(link):
+    return getUtility(IIntIds).queryId(LinkTargetKeyReference(link))
+
+
+def link_target_hash(link):
+    return hash(LinkTargetKeyReference(link))
+
+
 def cache_rel_type(link):
     app = ISchoolToolApplication(None)
     uris = app['schooltool.relationship.uri']
@@ -87,6 +107,17 @@ class SharedIndex(Persistent, Contained):
         for key, value in link.shared.items():
             self.data[self.uids[docid], key] = value
 
+    def index_docs(self, docs):
+        """Index (docid, link) pairs, storing each shared state once."""
+        indexed = set()
+        for docid, link in docs:
+            uid = self.uids[docid] = get_link_shared_uid(link)
+            if uid in indexed:
+                continue
+            indexed.add(uid)
+            for key, value in link.shared.items():
+                self.data[uid, key] = value
+
     def unindex_doc(self, docid):
         if docid not in self.uids:
             return
@@ -106,6 +137,274 @@ class SharedIndex(Persistent, Contained):
         raise NotImplemented('querying this index is not supported')
 
 
+class LinkIndex(Persistent, Contained):
+    """Materialized index of links by (this, rel_type, role).
+
+    Keeps link ids, target int ids and link counts for every key, so
+    that bound relationship properties can answer len(), truthiness
+    and int_ids without walking and filtering the links.
+
+    Targets that have no int id yet are remembered by the hash their
+    pending_converter gives, and indexed by indexTargetId() once they
+    get one.
+    """
+    implements(zope.catalog.interfaces.ICatalogIndex)
+
+    def __init__(self, converter=None, target_converter=None,
+                 pending_converter=None):
+        assert converter is not None
+        assert target_converter is not None
+        Persistent.__init__(self)
+        Contained.__init__(self)
+        self.value_factory = converter
+        self.target_factory = target_converter
+        self.pending_factory = pending_converter
+        self.clear()
+
+    def _addTargetId(self, docid, target_id, link):
+        if target_id is not None:
+            self.target_ids[docid] = target_id
+            return True
+        if self.pending_factory is not None:
+            target_hash = self.pending_factory(link)
+            self.pending_hashes[docid] = target_hash
+            if target_hash not in self.pending:
+                self.pending[target_hash] = IFBTree.TreeSet()
+            self.pending[target_hash].insert(docid)
+        return False
+
+    def index_doc(self, docid, link):
+        key = self.value_factory(link)
+        if self.keys.get(docid) == key:
+            return
+        self.unindex_doc(docid)
+        target_id = self.target_factory(link)
+        self.keys[docid] = key
+        if key not in self.lids:
+            self.lids[key] = IFBTree.TreeSet()
+            self.targets[key] = IFBTree.TreeSet()
+            self.counts[key] = 0
+        self.lids[key].insert(docid)
+        self.counts[key] += 1
+        if self._addTargetId(docid, target_id, link):
+            self.targets[key].insert(target_id)
+
+    def index_docs(self, docs):
+        """Index (docid, link) pairs, updating every key once."""
+        added = {}
+        for docid, link in docs:
+            key = self.value_factory(link)
+            if self.keys.get(docid) == key:
+                continue
+            self.unindex_doc(docid)
+            self.keys[docid] = key
+            added.setdefault(key, []).append(
+                (docid, self.target_factory(link), link))
+        for key, entries in added.items():
+            if key not in self.lids:
+                self.lids[key] = IFBTree.TreeSet()
+                self.targets[key] = IFBTree.TreeSet()
+                self.counts[key] = 0
+            self.lids[key].update([entry[0] for entry in entries])
+            self.counts[key] += len(entries)
+            target_ids = []
+            for docid, target_id, link in entries:
+                if self._addTargetId(docid, target_id, link):
+                    target_ids.append(target_id)
+            self.targets[key].update(target_ids)
+
+    def unindex_doc(self, docid):
+        key = self.keys.get(docid)
+        if key is None:
+            return
+        del self.keys[docid]
+        self.lids[key].remove(docid)
+        self.counts[key] -= 1
+        target_id = self.target_ids.get(docid)
+        if target_id is not None:
+            del self.target_ids[docid]
+            self.targets[key].remove(target_id)
+        target_hash = self.pending_hashes.get(docid)
+        if target_hash is not None:
+            del self.pending_hashes[docid]
+            self.pending[target_hash].remove(docid)
+            if not self.pending[target_hash]:
+                del self.pending[target_hash]
+        if not self.counts[key]:
+            del self.lids[key]
+            del self.targets[key]
+            del self.counts[key]
+
+    def clear(self):
+        self.keys = IOBTree()
+        self.target_ids = IOBTree()
+        self.lids = OOBTree()
+        self.targets = OOBTree()
+        self.counts = OIBTree()
+        self.pending_hashes = IOBTree()
+        self.pending = OOBTree()
+
+    def count(self, key):
+        return self.counts.get(key, 0)
+
+    def getLinkIds(self, key):
+        return self.lids.get(key, IFBTree.TreeSet())
+
+    def getTargetIds(self, key):
+        """Return a copy of target int ids, safe to modify."""
+        return IFBTree.TreeSet(self.targets.get(key, ()))
+
+    def indexTargetId(self, target_hash, target_id):
+        """Index links to a target that just got its int id."""
+        docids = self.pending.pop(target_hash, None)
+        if docids is None:
+            return
+        for docid in docids:
+            del self.pending_hashes[docid]
+            self.target_ids[docid] = target_id
+            self.targets[self.keys[docid]].insert(target_id)
+
+    def apply(self, query):
+        raise NotImplemented('querying this index is not supported')
+
+
+class TemporalStateIndex(Persistent, Contained):
+    """Index of temporal link state histories.
+
+    Both halves of a relationship share their state, so histories are
+    stored by shared uid.  Each history is kept as ascending tuples of
+    dates and (meaning, code) pairs, so the state on a date is found by
+    bisection instead of a scan.
+    """
+    implements(zope.catalog.interfaces.ICatalogIndex)
+
+    default_state = ACTIVE, ACTIVE_CODE
+
+    def __init__(self):
+        Persistent.__init__(self)
+        Contained.__init__(self)
+        self.clear()
+
+    def _index_uid(self, docid, link):
+        if not isinstance(link.rel_type, TemporalURIObject):
+            self.unindex_doc(docid)
+            return None
+        uid = get_link_shared_uid(link)
+        if self.uids.get(docid) != uid:
+            self.unindex_doc(docid)
+            self.uids[docid] = uid
+            if uid not in self.docids:
+                self.docids[uid] = IFBTree.TreeSet()
+            self.docids[uid].insert(docid)
+        return uid
+
+    def _index_history(self, uid, link):
+        data = link.shared.get('tmp', ())
+        history = sorted(data)
+        history = (tuple([date for date, state in history]),
+                   tuple([state for date, state in history]))
+        if self.histories.get(uid) != history:
+            self.histories[uid] = history
+
+    def index_doc(self, docid, link):
+        uid = self._index_uid(docid, link)
+        if uid is not None:
+            self._index_history(uid, link)
+
+    def index_docs(self, docs):
+        """Index (docid, link) pairs, storing each shared history once."""
+        links = {}
+        for docid, link in docs:
+            uid = self._index_uid(docid, link)
+            if uid is not None:
+                links[uid] = link
+        for uid, link in links.items():
+            self._index_history(uid, link)
+
+    def unindex_doc(self, docid):
+        uid = self.uids.get(docid)
+        if uid is None:
+            return
+        del self.uids[docid]
+        self.docids[uid].remove(docid)
+        if not self.docids[uid]:
+            del self.docids[uid]
+            del self.histories[uid]
+
+    def clear(self):
+        self.uids = IOBTree()
+        self.docids = OOBTree()
+        self.histories = OOBTree()
+
+    def get(self, docid, date=None, default=None):
+        """Return the (meaning, code) state of a link on date.
+
+        Mimics TemporalStateAccessor: links without history are active,
+        links not yet started on the date have no state (None) and
+        date None stands for the latest state.
+        """
+        uid = self.uids.get(docid)
+        if uid is None:
+            return default
+        dates, states = self.histories[uid]
+        if not dates:
+            return self.default_state
+        if date is None:
+            return states[-1]
+        idx = bisect_right(dates, date)
+        if not idx:
+            return None
+        return states[idx-1]
+
+    def query(self, docids, date=None, states=(), meanings=()):
+        """Return ids of links that have given states on date.
+
+        Follows TemporalStateAccessor.has.
+
+        This is not an indexed date query: every link in `docids` is
+        looked up, so the cost grows with the number of links (for example
+        the members of a group), with a bisection of each history.  Global
+        per-state postings would not make it cheaper, as intersecting them
+        with `docids` touches every link too.  Histories are loaded from
+        the index rather than from the links, and whether a state matches
+        is worked out once for every distinct state.
+        """
+        result = IFBTree.TreeSet()
+        matches = {}
+        def match(state):
+            if state not in matches:
+                meaning, code = state
+                matches[state] = (
+                    (not states or code in states) and
+                    (not meanings or
+                     bool([val for val in meanings if val in meaning])))
+            return matches[state]
+        uids = self.uids
+        histories = self.histories
+        for docid in docids:
+            uid = uids.get(docid)
+            if uid is None:
+                continue
+            dates, history = histories[uid]
+            if not dates:
+                if self.default_state[0] not in meanings:
+                    continue
+                state = self.default_state
+            elif date is None:
+                state = history[-1]
+            else:
+                idx = bisect_right(dates, date)
+                if not idx:
+                    continue
+                state = history[idx-1]
+            if match(state):
+                result.insert(docid)
+        return result
+
+    def apply(self, query):
+        raise NotImplemented('querying this index is not supported')
+
+
 class URICache(BTreeContainer):
 
     def cache(self, uri):
@@ -126,7 +425,7 @@ class URICacheStartUp(StartUpBase):
 
 class LinkCatalog(AttributeCatalog):
 
-    version = '1.1 - uri cache'
+    version = '1.4 - pending link targets'
     interface = IRelationshipLink
     attributes = ()
 
@@ -137,12 +436,19 @@ class LinkCatalog(AttributeCatalog):
         catalog['rel_type_hash'] = ConvertingIndex(converter=hash_this_rel_type)
         catalog['target'] = ConvertingIndex(converter=hash_this_target)
         catalog['shared'] = SharedIndex()
+        catalog['this_rel_type_role'] = LinkIndex(
+            converter=hash_this_rel_type_role,
+            target_converter=link_target_intid,
+            pending_converter=link_target_hash)
+        catalog['temporal_state'] = TemporalStateIndex()
 
 
 getLinkCatalog = LinkCatalog.get
 
 
 def indexLinks(event):
+    if event.batch is not None:
+        return # indexed with the whole batch
     iids = getUtility(IIntIds)
     for link in event.getLinks():
         link = removeSecurityProxy(link)
@@ -150,3 +456,46 @@ def indexLinks(event):
         lid = iids.getId(link)
         getLinkCatalog().index_doc(lid, link)
         link.__parent__._lids.add(lid)
+
+
+def indexLinkTargets(event):
+    """Index links to an object once it gets an int id."""
+    keyref = IKeyReference(event.object, None)
+    if keyref is None:
+        return
+    try:
+        catalog = getLinkCatalog()
+    except (KeyError, TypeError):
+        return # no application, or its catalogs are not set up yet
+    target_id = getUtility(IIntIds).queryId(event.object)
+    if target_id is not None:
+        catalog['this_rel_type_role'].indexTargetId(hash(keyref), target_id)
+
+
+def indexLinkBatch(event):
+    """Index all links of a RelationshipsAddedEvent in one pass.
+
+    Indexes that know how get all links at once through index_docs().
+    """
+    iids = getUtility(IIntIds)
+    catalog = getLinkCatalog()
+    docs = []
+    for link in event.getLinks():
+        link = removeSecurityProxy(link)
+        addIntIdSubscriber(link, ObjectAddedEvent(link))
+        lid = iids.getId(link)
+        try:
+            catalog.extent.add(lid, link)
+        except ValueError:
+            catalog.unindex_doc(lid)
+            continue
+        docs.append((lid, link))
+    for index in catalog.values():
+        index_docs = getattr(index, 'index_docs', None)
+        if index_docs is not None:
+            index_docs(docs)
+        else:
+            for lid, link in docs:
+                index.index_doc(lid, link)
+    for lid, link in docs:
+        link.__parent__._lids.add(lid)
@@ -150,6 +150,8 @@ class IRelationshipEvent(Interface):
     participant2 = Attribute("""One of the participants.""")
     role2 = Attribute("""Role of `participant2`.""")
     extra_info = Attribute("""Extra info, as passed to relate().""")
+    batch = Attribute(
+        """The IRelationshipsEvent this event is part of, or None.""")
 
     def __getitem__(role):
         """Return the participant with a given role.
@@ -190,6 +192,25 @@ class IRelationshipRemovedEvent(IRelationshipEvent):
     """A relationship has been broken."""
 
 
+class IRelationshipsEvent(Interface):
+    """Many relationships of the same type changed at once.
+
+    Subscribers that handle the whole batch here can ignore the
+    individual relationship events that have `batch` set.
+    """
+
+    rel_type = Attribute("""Relationship type.""")
+    events = Attribute("""Individual relationship events of the batch.""")
+
+
+class IRelationshipsAddedEvent(IRelationshipsEvent):
+    """Relationships have been established by relate_many()."""
+
+
+class IRelationshipsRemovedEvent(IRelationshipsEvent):
+    """Relationships have been broken by unrelate_many()."""
+
+
 class InvalidRelationship(Exception):
     """Invalid relationship."""
 
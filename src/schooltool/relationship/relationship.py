@@ -49,6 +49,8 @@ from schooltool.relationship.interfaces import IBeforeRelationshipEvent
 from schooltool.relationship.interfaces import IRelationshipAddedEvent
 from schooltool.relationship.interfaces import IBeforeRemovingRelationshipEvent
 from schooltool.relationship.interfaces import IRelationshipRemovedEvent
+from schooltool.relationship.interfaces import IRelationshipsAddedEvent
+from schooltool.relationship.interfaces import IRelationshipsRemovedEvent
 from schooltool.relationship.interfaces import DuplicateRelationship
 from schooltool.relationship.interfaces import NoSuchRelationship
 from schooltool.relationship.interfaces import IRelationshipSchema
@@ -69,6 +71,8 @@ class SharedState(object):
     def __setitem__(self, key, value):
         link = getUtility(IIntIds).getObject(self.lid)
         link.shared[key] = value
+        for index in ('shared', 'temporal_state'):
+            self.catalog[index].index_doc(self.lid, link)
         notify(ObjectModifiedEvent(link))
 
 
@@ -92,10 +96,105 @@ def relate(rel_type, (a, role_of_a), (b, role_of_b), extra_info=None):
     IRelationshipLinks(a).add(link_a)
     link_b = Link(role_of_b, a, role_of_a, rel_type, shared)
     IRelationshipLinks(b).add(link_b)
-    zope.event.notify(RelationshipAddedEvent(rel_type,
-                                             (a, role_of_a),
-                                             (b, role_of_b),
-                                             shared))
+    event = RelationshipAddedEvent(rel_type,
+                                   (a, role_of_a),
+                                   (b, role_of_b),
+                                   shared)
+    event.links = link_a, link_b
+    zope.event.notify(event)
+
+
+def _linkKey(target, role, rel_type):
+    return (id(target), hash(role), hash(rel_type))
+
+
+def relate_many(rel_type, relationships, extra_info=None, shared=None):
+    """Establish many relationships of the same type.
+
+    `relationships` is a sequence of ((a, role_of_a), (b, role_of_b)).
+    All relationships are checked before any of them is established,
+    and BeforeRelationshipEvents are sent before any link is added.
+    Items of `shared` are copied into the shared state of every
+    relationship up front, so that links are indexed only once.
+
+    Subscribers first get a single RelationshipsAddedEvent for the whole
+    batch, then the usual RelationshipAddedEvent for each relationship,
+    with `batch` set.
+
+    Returns the (link_a, link_b) pairs of the new relationships.
+    """
+    relationships = list(relationships)
+    existing = {}
+    pending = {}
+    for (a, role_of_a), (b, role_of_b) in relationships:
+        keys = existing.get(id(a))
+        if keys is None:
+            keys = existing[id(a)] = set(
+                [(id(link.target), link.role_hash, link.rel_type_hash)
+                 for link in IRelationshipLinks(a)])
+            keys.update(pending.pop(id(a), ()))
+        key = _linkKey(b, role_of_b, rel_type)
+        if key in keys:
+            raise DuplicateRelationship
+        keys.add(key)
+        reverse_key = _linkKey(a, role_of_a, rel_type)
+        if id(b) in existing:
+            existing[id(b)].add(reverse_key)
+        else:
+            pending.setdefault(id(b), set()).add(reverse_key)
+
+    shared_states = []
+    for (a, role_of_a), (b, role_of_b) in relationships:
+        state = OOBTree()
+        if shared is not None:
+            state.update(shared)
+        state['X'] = extra_info
+        zope.event.notify(BeforeRelationshipEvent(rel_type,
+                                                  (a, role_of_a),
+                                                  (b, role_of_b),
+                                                  state))
+        shared_states.append(state)
+
+    uri_cache = getURICache()
+    uri_cache.cache(rel_type)
+    roles = {}
+    for (a, role_of_a), (b, role_of_b) in relationships:
+        roles[hash(role_of_a)] = role_of_a
+        roles[hash(role_of_b)] = role_of_b
+    for role in roles.values():
+        uri_cache.cache(role)
+
+    new_links = {}
+    events = []
+    for ((a, role_of_a), (b, role_of_b)), state in zip(relationships,
+                                                        shared_states):
+        link_a = Link(role_of_a, b, role_of_b, rel_type, state)
+        new_links.setdefault(id(a), (a, []))[1].append(link_a)
+        link_b = Link(role_of_b, a, role_of_a, rel_type, state)
+        new_links.setdefault(id(b), (b, []))[1].append(link_b)
+        event = RelationshipAddedEvent(rel_type,
+                                       (a, role_of_a),
+                                       (b, role_of_b),
+                                       state)
+        event.links = link_a, link_b
+        events.append(event)
+
+    for obj, links in new_links.values():
+        linkset = IRelationshipLinks(obj)
+        add_links = getattr(linkset, 'addLinks', None)
+        if add_links is not None:
+            add_links(links)
+        else:
+            for link in links:
+                linkset.add(link)
+
+    batch = RelationshipsAddedEvent(rel_type, events)
+    for event in events:
+        event.batch = batch
+    zope.event.notify(batch)
+    for event in events:
+        zope.event.notify(event)
+    return [event.links for event in events]
 
 
 def duplicate(link, obj):
@@ -152,6 +251,67 @@ def unrelate(rel_type, (a, role_of_a), (b, role_of_b)):
                                                extra_info))
 
 
+def unrelate_many(rel_type, relationships):
+    """Break many relationships of the same type.
+
+    `relationships` is a sequence of ((a, role_of_a), (b, role_of_b)).
+    All relationships are looked up before any of them is broken.
+
+    Subscribers first get a single RelationshipsRemovedEvent for the whole
+    batch, then the usual RelationshipRemovedEvent for each relationship,
+    with `batch` set.
+    """
+    relationships = list(relationships)
+    linksets = {}
+
+    def find(obj, my_role, target, role):
+        if id(obj) not in linksets:
+            links = {}
+            for link in IRelationshipLinks(obj):
+                key = (link.my_role_hash, id(link.target),
+                       link.role_hash, link.rel_type_hash)
+                links[key] = link
+            linksets[id(obj)] = links
+        key = (hash(my_role), ) + _linkKey(target, role, rel_type)
+        return linksets[id(obj)].pop(key, None)
+
+    found = []
+    for (a, role_of_a), (b, role_of_b) in relationships:
+        link_a_to_b = find(a, role_of_a, b, role_of_b)
+        if link_a_to_b is None:
+            raise NoSuchRelationship
+        # If the other half is missing, our data structures are out of
+        # sync.
+        link_b_to_a = find(b, role_of_b, a, role_of_a)
+        if link_b_to_a is None:
+            raise ValueError(role_of_b, a, role_of_a, rel_type)
+        found.append((link_a_to_b, link_b_to_a))
+
+    for ((a, role_of_a), (b, role_of_b)), (link_a_to_b, link_b_to_a) in zip(
+        relationships, found):
+        zope.event.notify(BeforeRemovingRelationshipEvent(
+            rel_type, (a, role_of_a), (b, role_of_b),
+            link_a_to_b.extra_info))
+
+    events = []
+    for ((a, role_of_a), (b, role_of_b)), (link_a_to_b, link_b_to_a) in zip(
+        relationships, found):
+        extra_info = link_a_to_b.extra_info
+        IRelationshipLinks(a).remove(link_a_to_b)
+        IRelationshipLinks(b).remove(link_b_to_a)
+        events.append(RelationshipRemovedEvent(rel_type,
+                                               (a, role_of_a),
+                                               (b, role_of_b),
+                                               extra_info))
+
+    batch = RelationshipsRemovedEvent(rel_type, events)
+    for event in events:
+        event.batch = batch
+    zope.event.notify(batch)
+    for event in events:
+        zope.event.notify(event)
+
+
 def unrelateAll(obj):
     """Break all relationships of `obj`.
 
@@ -188,6 +348,9 @@ class RelationshipEvent(object):
 
     """
 
+    batch = None
+    links = None
+
     def __init__(self, rel_type, (a, role_of_a), (b, role_of_b), shared):
         self.rel_type = rel_type
         self.participant1 = a
@@ -209,6 +372,8 @@ class RelationshipEvent(object):
         raise KeyError(role)
 
     def getLinks(self):
+        if self.links is not None:
+            return self.links
         links_1 = IRelationshipLinks(self.participant1)
         links_2 = IRelationshipLinks(self.participant2)
         try:
@@ -320,6 +485,32 @@ class RelationshipRemovedEvent(RelationshipEvent):
     implements(IRelationshipRemovedEvent)
 
 
+class RelationshipsEvent(object):
+    """Base class for events about many relationships."""
+
+    def __init__(self, rel_type, events):
+        self.rel_type = rel_type
+        self.events = events
+
+    def getLinks(self):
+        links = []
+        for event in self.events:
+            links.extend(event.getLinks())
+        return links
+
+
+class RelationshipsAddedEvent(RelationshipsEvent):
+    """Relationships have been established by relate_many()."""
+
+    implements(IRelationshipsAddedEvent)
+
+
+class RelationshipsRemovedEvent(RelationshipsEvent):
+    """Relationships have been broken by unrelate_many()."""
+
+    implements(IRelationshipsRemovedEvent)
+
+
 def getRelatedObjects(obj, role, rel_type=None, catalog=None):
     """Return all objects related to `obj` with a given role."""
     return IRelationshipLinks(obj).getTargetsByRole(role, rel_type, catalog=catalog)
@@ -580,22 +771,20 @@ class BoundRelationshipProperty(object):
         self.my_role = my_role
         self.other_role = other_role
 
+    @property
+    def _index_key(self):
+        return (hash_persistent(self.this),
+                hash(self.rel_type), hash(self.other_role))
+
+    @property
+    def _index(self):
+        return getLinkCatalog()['this_rel_type_role']
+
     def __nonzero__(self):
-        linkset = IRelationshipLinks(self.this)
-        iterator = iter(linkset.iterLinksByRole(self.other_role, self.rel_type))
-        try:
-            iterator.next()
-        except StopIteration:
-            return False
-        else:
-            return True
+        return bool(self._index.count(self._index_key))
 
     def __len__(self):
-        count = 0
-        linkset = IRelationshipLinks(self.this)
-        for i in linkset.iterLinksByRole(self.other_role, self.rel_type):
-            count += 1
-        return count
+        return self._index.count(self._index_key)
 
     def __iter__(self):
         return iter(iterRelatedObjects(self.this, self.other_role,
@@ -603,10 +792,7 @@ class BoundRelationshipProperty(object):
 
     @property
     def int_ids(self):
-        int_ids = getUtility(IIntIds)
-        linkset = IRelationshipLinks(self.this)
-        for link in linkset.iterLinksByRole(self.other_role, self.rel_type):
-            yield int_ids.getId(LinkTargetKeyReference(link))
+        return self._index.getTargetIds(self._index_key)
 
     def __contains__(self, other):
         if other is None:
@@ -1034,6 +1220,21 @@ class LinkSet(Persistent, Contained):
         link.__parent__ = self
         notify(ObjectAddedEvent(link, self._links, link.__name__))
 
+    def addLinks(self, links):
+        """Add many links, naming them like successive add() calls would."""
+        used = set(self._links.keys())
+        i = 1
+        for link in links:
+            if link.__parent__ == self:
+                raise ValueError("You are adding same link twice.")
+            while "%s" % i in used:
+                i += 1
+            link.__name__ = "%s" % i
+            used.add(link.__name__)
+            self._links[link.__name__] = link
+            link.__parent__ = self
+            notify(ObjectAddedEvent(link, self._links, link.__name__))
+
     def remove(self, link):
         if link is self._links.get(link.__name__):
             link_name = link.__name__
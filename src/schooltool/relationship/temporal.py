@@ -19,16 +19,20 @@
 import datetime
 
 from persistent import Persistent
-from zope.component import queryUtility
+from zope.component import getUtility, queryUtility
 from zope.container.contained import Contained
 from zope.event import notify
 from zope.interface import implementer
 from zope.interface import Interface
+from zope.intid.interfaces import IIntIds
 
 from schooltool.term.interfaces import IDateManager
 from schooltool.relationship.interfaces import IRelationshipLinks
 from schooltool.relationship.relationship import BoundRelationshipProperty
+from schooltool.relationship.relationship import CLink, getLinkCatalog
+from schooltool.relationship.relationship import LinkTargetKeyReference
 from schooltool.relationship.relationship import relate, unrelate
+from schooltool.relationship.relationship import relate_many
 from schooltool.relationship.relationship import RelationshipInfo
 from schooltool.relationship.uri import URIObject
 
@@ -219,27 +223,36 @@ class BoundTemporalRelationshipProperty(BoundRelationshipProperty):
                 return True
         return False
 
+    def _filtered_link_ids(self):
+        catalog = getLinkCatalog()
+        lids = catalog['this_rel_type_role'].getLinkIds(self._index_key)
+        if self._filter == self._filter_nothing:
+            return lids
+        return catalog['temporal_state'].query(
+            lids, date=self.filter_date, states=self.filter_codes,
+            meanings=self.filter_meanings)
+
     def _iter_filtered_links(self):
-        links = IRelationshipLinks(self.this).getCachedLinksByRole(self.other_role)
-        for link in links:
-            if self._filter(link):
-                yield link
+        catalog = getLinkCatalog()
+        for lid in self._filtered_link_ids():
+            yield CLink(catalog, lid)
 
     def __nonzero__(self):
-        for link in self._iter_filtered_links():
-            return True
-        return False
+        return bool(self._filtered_link_ids())
 
     def __len__(self):
-        n = 0
-        for link in self._iter_filtered_links():
-            n += 1
-        return n
+        return len(self._filtered_link_ids())
 
     def __iter__(self):
         for link in self._iter_filtered_links():
-            if self._filter(link):
-                yield link.target
+            yield link.target
+
+    @property
+    def int_ids(self):
+        int_ids = getUtility(IIntIds)
+        linkset = IRelationshipLinks(self.this)
+        for link in linkset.iterLinksByRole(self.other_role, self.rel_type):
+            yield int_ids.getId(LinkTargetKeyReference(link))
 
     @property
     def relationships(self):
@@ -288,6 +301,38 @@ class BoundTemporalRelationshipProperty(BoundRelationshipProperty):
         notify(LinkStateModifiedEvent(
                 link, self.this, other, self.filter_date, meaning, code))
 
+    def relateMany(self, others, meaning=ACTIVE, code=ACTIVE_CODE):
+        """Set the state of many relationships on the filtered date.
+
+        Missing relationships are established with relate_many(), already
+        carrying the new state.
+        """
+        links = IRelationshipLinks(self.this)
+        changed = []
+        new = []
+        for other in others:
+            try:
+                link = links.find(
+                    self.my_role, other, self.other_role, self.rel_type)
+            except ValueError:
+                new.append(other)
+                continue
+            link.state.set(self.filter_date, meaning=meaning, code=code)
+            changed.append((link, other))
+        if new:
+            state = TemporalStateAccessor({})
+            state.set(self.filter_date, meaning=meaning, code=code)
+            created = relate_many(
+                self.rel_type,
+                [((self.this, self.my_role), (other, self.other_role))
+                 for other in new],
+                shared=state.state)
+            changed.extend([(link, other)
+                            for (link, other_link), other in zip(created, new)])
+        for link, other in changed:
+            notify(LinkStateModifiedEvent(
+                    link, self.this, other, self.filter_date, meaning, code))
+
     def unrelate(self, other):
         """Delete state on filtered date or unrelate completely if
         no states left or filtered date is .all()
@@ -317,6 +362,12 @@ class BoundTemporalRelationshipProperty(BoundRelationshipProperty):
     def remove(self, other, code=INACTIVE_CODE):
         self.relate(other, meaning=INACTIVE, code=code)
 
+    def addMany(self, others, code=ACTIVE_CODE):
+        self.relateMany(others, meaning=ACTIVE, code=code)
+
+    def removeMany(self, others, code=INACTIVE_CODE):
+        self.relateMany(others, meaning=INACTIVE, code=code)
+
     def state(self, other):
         links = IRelationshipLinks(self.this)
         try:
@@ -365,3 +416,11 @@ def shareTemporalState(event):
         return
     if 'tmp' not in event.shared:
         event.shared['tmp'] = ()
+
+
+def shareTemporalStates(event):
+    if not isinstance(event.rel_type, TemporalURIObject):
+        return
+    for relationship_event in event.events:
+        if 'tmp' not in relationship_event.shared:
+            relationship_event.shared['tmp'] = ()
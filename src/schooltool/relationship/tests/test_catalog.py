@@ -0,0 +1,315 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2013 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Unit tests for schooltool.relationship.catalog
+"""
+
+import unittest
+import doctest
+
+
+def doctest_LinkIndex():
+    """Tests for LinkIndex
+
+        >>> from schooltool.relationship.catalog import LinkIndex
+
+    The index is built from two converters: one for the key, the other
+    for the target int id.
+
+        >>> class LinkStub(object):
+        ...     def __init__(self, key, target):
+        ...         self.key = key
+        ...         self.target = target
+
+        >>> index = LinkIndex(converter=lambda link: link.key,
+        ...                   target_converter=lambda link: link.target)
+
+        >>> index.count('k1')
+        0
+        >>> list(index.getTargetIds('k1'))
+        []
+
+        >>> index.index_doc(1, LinkStub('k1', 100))
+        >>> index.index_doc(2, LinkStub('k1', 200))
+        >>> index.index_doc(3, LinkStub('k2', 100))
+
+        >>> index.count('k1'), index.count('k2')
+        (2, 1)
+        >>> list(index.getLinkIds('k1'))
+        [1, 2]
+        >>> list(index.getTargetIds('k1'))
+        [100, 200]
+
+    Reindexing a link does not count it twice.
+
+        >>> index.index_doc(1, LinkStub('k1', 100))
+        >>> index.count('k1')
+        2
+
+    Links are dropped on unindexing, and empty keys go away.
+
+        >>> index.unindex_doc(2)
+        >>> index.unindex_doc(2)
+        >>> index.count('k1')
+        1
+        >>> list(index.getTargetIds('k1'))
+        [100]
+
+        >>> index.unindex_doc(1)
+        >>> 'k1' in index.counts, 'k1' in index.targets
+        (False, False)
+
+    Links of a batch are indexed with one update per key.
+
+        >>> index.index_docs([(4, LinkStub('k1', 100)),
+        ...                   (5, LinkStub('k1', None)),
+        ...                   (6, LinkStub('k3', 300)),
+        ...                   (3, LinkStub('k2', 100))])
+        >>> index.count('k1'), index.count('k2'), index.count('k3')
+        (2, 1, 1)
+        >>> list(index.getLinkIds('k1'))
+        [4, 5]
+        >>> list(index.getTargetIds('k1'))
+        [100]
+
+        >>> index.clear()
+        >>> index.count('k2')
+        0
+
+    Target ids are copies, changing them does not change the index.
+
+        >>> index.index_doc(1, LinkStub('k1', 100))
+        >>> ids = index.getTargetIds('k1')
+        >>> ids.insert(200)
+        1
+        >>> list(index.getTargetIds('k1'))
+        [100]
+
+    """
+
+
+def doctest_LinkIndex_pending_targets():
+    """Tests for LinkIndex targets without int ids
+
+        >>> from schooltool.relationship.catalog import LinkIndex
+
+        >>> class LinkStub(object):
+        ...     def __init__(self, key, target, target_hash):
+        ...         self.key = key
+        ...         self.target = target
+        ...         self.target_hash = target_hash
+
+        >>> index = LinkIndex(converter=lambda link: link.key,
+        ...                   target_converter=lambda link: link.target,
+        ...                   pending_converter=lambda link: link.target_hash)
+
+    Links to targets without an int id are counted, but have no target
+    ids until the target gets one.
+
+        >>> index.index_doc(1, LinkStub('k1', None, 'h1'))
+        >>> index.index_docs([(2, LinkStub('k2', None, 'h1')),
+        ...                   (3, LinkStub('k2', None, 'h2'))])
+        >>> index.count('k1'), index.count('k2')
+        (1, 2)
+        >>> list(index.getTargetIds('k1')), list(index.getTargetIds('k2'))
+        ([], [])
+
+        >>> index.indexTargetId('h1', 100)
+        >>> list(index.getTargetIds('k1')), list(index.getTargetIds('k2'))
+        ([100], [100])
+
+    Targets are indexed only once.
+
+        >>> index.indexTargetId('h1', 200)
+        >>> list(index.getTargetIds('k1'))
+        [100]
+
+    Unindexed links are forgotten.
+
+        >>> index.unindex_doc(3)
+        >>> 'h2' in index.pending
+        False
+        >>> index.indexTargetId('h2', 300)
+        >>> list(index.getTargetIds('k2'))
+        [100]
+
+        >>> index.unindex_doc(2)
+        >>> list(index.getTargetIds('k2'))
+        []
+
+    """
+
+
+def doctest_TemporalStateIndex():
+    """Tests for TemporalStateIndex
+
+        >>> from datetime import date
+        >>> from schooltool.relationship import catalog
+        >>> from schooltool.relationship.temporal import TemporalURIObject
+
+    Both halves of a relationship share the state history, so it is
+    indexed by the shared uid.
+
+        >>> class LinkStub(object):
+        ...     rel_type = TemporalURIObject('example:Membership')
+        ...     def __init__(self, uid, tmp):
+        ...         self.uid = uid
+        ...         self.shared = {'tmp': tmp}
+
+        >>> old_get_uid = catalog.get_link_shared_uid
+        >>> catalog.get_link_shared_uid = lambda link: link.uid
+
+        >>> index = catalog.TemporalStateIndex()
+        >>> history = ((date(2014, 3, 1), ('i', 'w')),
+        ...            (date(2014, 1, 1), ('a', 'a')))
+        >>> index.index_doc(1, LinkStub('ab', history))
+        >>> index.index_doc(2, LinkStub('ab', history))
+        >>> index.index_doc(3, LinkStub('ac', ()))
+
+    States are looked up on a date, before the first state there is none,
+    and links without history are active.
+
+        >>> print index.get(1, date(2013, 12, 31))
+        None
+        >>> index.get(2, date(2014, 2, 1))
+        ('a', 'a')
+        >>> index.get(1, date(2014, 3, 1))
+        ('i', 'w')
+        >>> index.get(1)
+        ('i', 'w')
+        >>> index.get(3, date(2014, 2, 1))
+        ('a', 'a')
+
+    Querying returns link ids matching meanings and codes.
+
+        >>> list(index.query([1, 2, 3], date(2014, 2, 1), meanings=('a',)))
+        [1, 2, 3]
+        >>> list(index.query([1, 3], date(2014, 4, 1), meanings=('a',)))
+        [3]
+        >>> list(index.query([1, 2, 3], date(2014, 4, 1), states=('w',)))
+        [1, 2]
+        >>> list(index.query([1, 2, 3], None, meanings=('i',)))
+        [1, 2]
+
+    Reindexing one half updates the shared history.
+
+        >>> index.index_doc(1, LinkStub('ab', history[1:]))
+        >>> index.get(2, date(2014, 4, 1))
+        ('a', 'a')
+
+        >>> index.unindex_doc(1)
+        >>> index.unindex_doc(2)
+        >>> 'ab' in index.histories
+        False
+
+    Both halves of new relationships can be indexed at once.
+
+        >>> index.index_docs([(4, LinkStub('ad', history)),
+        ...                   (5, LinkStub('ad', history))])
+        >>> list(index.docids['ad'])
+        [4, 5]
+        >>> index.get(5, date(2014, 4, 1))
+        ('i', 'w')
+
+        >>> catalog.get_link_shared_uid = old_get_uid
+
+    """
+
+
+def doctest_TemporalStateIndex_state_changes():
+    """Temporal state index follows state changes of links.
+
+        >>> from schooltool.relationship.tests import setUp, tearDown
+        >>> setUp()
+
+        >>> from datetime import date
+        >>> from BTrees.OOBTree import OOBTree
+        >>> from zope.component import provideUtility
+        >>> from zope.intid.interfaces import IIntIds
+        >>> from schooltool.relationship import catalog, relationship
+        >>> from schooltool.relationship.temporal import TemporalURIObject
+
+        >>> class IntIdsStub(object):
+        ...     def __init__(self, objects):
+        ...         self.objects = objects
+        ...     def getId(self, obj):
+        ...         for lid, other in self.objects.items():
+        ...             if other is obj:
+        ...                 return lid
+        ...     def getObject(self, lid):
+        ...         return self.objects[lid]
+
+    Relate a group and a member.
+
+        >>> rel_type = TemporalURIObject('example:Membership')
+        >>> shared = OOBTree()
+        >>> shared['tmp'] = ()
+        >>> links = {
+        ...     1: relationship.Link('example:Group', 'member',
+        ...                          'example:Member', rel_type, shared),
+        ...     2: relationship.Link('example:Member', 'group',
+        ...                          'example:Group', rel_type, shared)}
+        >>> provideUtility(IntIdsStub(links), IIntIds)
+
+        >>> link_catalog = {'shared': catalog.SharedIndex(),
+        ...                 'temporal_state': catalog.TemporalStateIndex()}
+        >>> old_get_catalog = relationship.getLinkCatalog
+        >>> relationship.getLinkCatalog = lambda: link_catalog
+        >>> old_get_uid = catalog.get_link_shared_uid
+        >>> catalog.get_link_shared_uid = lambda link: 'shared-uid'
+
+        >>> for lid, link in links.items():
+        ...     for index in link_catalog.values():
+        ...         index.index_doc(lid, link)
+        >>> links[1].state.set(date(2014, 1, 1))
+
+        >>> index = link_catalog['temporal_state']
+        >>> list(index.query([1, 2], date(2014, 2, 1), meanings=('a',)))
+        [1, 2]
+
+    Removing the member is seen by both halves.
+
+        >>> links[2].state.set(date(2014, 3, 1), meaning='i', code='i')
+        >>> list(index.query([1, 2], date(2014, 4, 1), meanings=('a',)))
+        []
+        >>> list(index.query([1, 2], date(2014, 2, 1), meanings=('a',)))
+        [1, 2]
+        >>> index.get(1, date(2014, 4, 1))
+        ('i', 'i')
+
+    So is deleting the state.
+
+        >>> del links[1].state[date(2014, 3, 1)]
+        >>> list(index.query([1, 2], date(2014, 4, 1), meanings=('a',)))
+        [1, 2]
+
+        >>> relationship.getLinkCatalog = old_get_catalog
+        >>> catalog.get_link_shared_uid = old_get_uid
+        >>> tearDown()
+
+    """
+
+
+def test_suite():
+    optionflags = doctest.NORMALIZE_WHITESPACE | doctest.ELLIPSIS
+    return unittest.TestSuite([
+                doctest.DocTestSuite(optionflags=optionflags),
+           ])
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
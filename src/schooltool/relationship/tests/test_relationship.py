@@ -64,6 +64,162 @@ def doctest_relate():
     """
 
 
+def doctest_relate_many():
+    """Tests for relate_many and unrelate_many
+
+        >>> from schooltool.relationship.tests import setUp, tearDown
+        >>> from schooltool.relationship.tests import SomeObject
+        >>> from schooltool.relationship import relationship
+        >>> from schooltool.relationship.interfaces import IRelationshipLinks
+        >>> setUp()
+
+        >>> class URICacheStub(object):
+        ...     def cache(self, uri):
+        ...         pass
+        >>> old_getURICache = relationship.getURICache
+        >>> relationship.getURICache = URICacheStub
+
+    Link sets keep int ids of links, normally added when links are
+    cataloged.
+
+        >>> from zope.component import provideUtility, getUtility
+        >>> from zope.intid.interfaces import IIntIds
+        >>> class IntIdsStub(object):
+        ...     def __init__(self):
+        ...         self.ids = {}
+        ...     def getId(self, obj):
+        ...         return self.ids.setdefault(id(obj), len(self.ids) + 1)
+        >>> provideUtility(IntIdsStub(), IIntIds)
+
+        >>> from zope.component import provideHandler
+        >>> from schooltool.relationship.interfaces import (
+        ...     IRelationshipsAddedEvent)
+        >>> def addLinkIds(event):
+        ...     for link in event.getLinks():
+        ...         link.__parent__._lids.add(getUtility(IIntIds).getId(link))
+        >>> provideHandler(addLinkIds, [IRelationshipsAddedEvent])
+
+    Let's log relationship events.
+
+        >>> import zope.event
+        >>> def logEvent(event):
+        ...     name = event.__class__.__name__
+        ...     if getattr(event, 'events', None) is not None:
+        ...         print name, len(event.events)
+        ...     else:
+        ...         print name, event.participant1, event.participant2,
+        ...         print event.batch is not None
+        >>> zope.event.subscribers.append(logEvent)
+
+        >>> member = URIStub('example:Member')
+        >>> group = URIStub('example:Group')
+        >>> students = SomeObject('students')
+        >>> a, b = SomeObject('a'), SomeObject('b')
+
+    All relationships are checked first, then all links are added, and
+    subscribers get an event for the whole batch before events for each
+    relationship.
+
+        >>> new_links = relationship.relate_many(
+        ...     'example:Membership',
+        ...     [((a, member), (students, group)),
+        ...      ((b, member), (students, group))])
+        BeforeRelationshipEvent a students False
+        BeforeRelationshipEvent b students False
+        RelationshipsAddedEvent 2
+        RelationshipAddedEvent a students True
+        RelationshipAddedEvent b students True
+
+        >>> sorted([link.target for link in IRelationshipLinks(students)])
+        [a, b]
+        >>> [link.__name__ for link in IRelationshipLinks(students)]
+        ['1', '2']
+
+    The new links are returned, both halves sharing their state.
+
+        >>> [(link_a.target, link_b.target) for link_a, link_b in new_links]
+        [(students, a), (students, b)]
+        >>> new_links[0][0].shared is new_links[0][1].shared
+        True
+
+    Nothing is related if any of the relationships already exists, even
+    within the same batch.
+
+        >>> c = SomeObject('c')
+        >>> relationship.relate_many(
+        ...     'example:Membership',
+        ...     [((c, member), (students, group)),
+        ...      ((b, member), (students, group))])
+        Traceback (most recent call last):
+          ...
+        DuplicateRelationship
+
+        >>> relationship.relate_many(
+        ...     'example:Membership',
+        ...     [((c, member), (students, group)),
+        ...      ((students, group), (c, member))])
+        Traceback (most recent call last):
+          ...
+        DuplicateRelationship
+
+        >>> len(list(IRelationshipLinks(c)))
+        0
+
+    Relationships are broken in bulk as well.
+
+        >>> relationship.unrelate_many(
+        ...     'example:Membership',
+        ...     [((students, group), (a, member)),
+        ...      ((students, group), (b, member))])
+        BeforeRemovingRelationshipEvent students a False
+        BeforeRemovingRelationshipEvent students b False
+        RelationshipsRemovedEvent 2
+        RelationshipRemovedEvent students a True
+        RelationshipRemovedEvent students b True
+
+        >>> list(IRelationshipLinks(students))
+        []
+
+        >>> relationship.unrelate_many(
+        ...     'example:Membership', [((students, group), (a, member))])
+        Traceback (most recent call last):
+          ...
+        NoSuchRelationship
+
+    Initial shared state is copied into every new relationship before
+    any event is sent, so that links get indexed with it.
+
+        >>> def logShared(event):
+        ...     if hasattr(event, 'shared'):
+        ...         print sorted(event.shared.items())
+        >>> zope.event.subscribers.insert(0, logShared)
+
+        >>> new_links = relationship.relate_many(
+        ...     'example:Membership',
+        ...     [((a, member), (students, group)),
+        ...      ((b, member), (students, group))],
+        ...     shared={'tmp': 'state'})
+        [('X', None), ('tmp', 'state')]
+        BeforeRelationshipEvent a students False
+        [('X', None), ('tmp', 'state')]
+        BeforeRelationshipEvent b students False
+        RelationshipsAddedEvent 2
+        [('X', None), ('tmp', 'state')]
+        RelationshipAddedEvent a students True
+        [('X', None), ('tmp', 'state')]
+        RelationshipAddedEvent b students True
+
+        >>> new_links[0][0].shared is new_links[1][0].shared
+        False
+
+        >>> zope.event.subscribers.remove(logShared)
+        >>> zope.event.subscribers.remove(logEvent)
+        >>> relationship.getURICache = old_getURICache
+        >>> tearDown()
+
+    """
+
+
 def doctest_LinkSet_getTargetsByRole():
     """Tests for getTargetsByRole
 
@@ -537,8 +537,11 @@ class ReportTask(AbstractReportTask):
 
     def renderReport(self, renderer, stream, *args, **kw):
         renderer.update()
-        rml = renderer.render()
         filename = renderer.filename
+        if flourish.interfaces.IPDFPage.providedBy(renderer):
+            stream.write(renderer.renderToPDF(filename=filename))
+            return
+        rml = renderer.render()
         pdf = rml2pdf.parseString(rml, filename=filename or None)
         stream.write(pdf.getvalue())
 
@@ -58,10 +58,13 @@ class BookingCalendarViewBase(CalendarViewBase):
         `start_dt` and `end_dt` (datetime objects) are bounds (half-open) for
         the result.
         """
-        for calendar, color1, color2 in self.getCalendars():
-            for event in calendar.expand(start_dt, end_dt):
-                yield EventForDisplay(event, self.request, color1, color2,
-                                      calendar, self.timezone)
+        merged = self.mergeCalendars(start_dt, end_dt)
+        for event, (calendar, color1, color2) in merged:
+            yield EventForDisplay(event, self.request, color1, color2,
+                                  calendar, self.timezone)
+
+    def skipEvent(self, event, calendar):
+        return False
 
     def canAddEvents(self):
         """No one can add events to a booking calendar."""
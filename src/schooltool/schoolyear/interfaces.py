@@ -60,6 +60,13 @@ class ISchoolYearContainer(IContainer, ILocation):
     def getActiveSchoolYear():
         """Return the active schoolyear."""
 
+    def getDateIndex():
+        """Return school years and terms sorted for lookup by date.
+
+        The index is cached until school years or terms are added,
+        removed or change their dates.
+        """
+
 
 class ISubscriber(Interface):
     """An event handler implements this"""
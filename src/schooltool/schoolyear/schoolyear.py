@@ -18,6 +18,7 @@
 """
 School year implementation
 """
+import bisect
 import datetime
 
 from zope.proxy import sameProxiedObjects
@@ -62,11 +63,68 @@ class SchoolYearAfterChangeEvent(object):
         self.new_dates = new_dates
 
 
+class SchoolYearDateIndex(object):
+    """School years and their terms sorted by date.
+
+    School years do not overlap, neither do terms, so an interval can be
+    found by bisecting the list of first dates.
+    """
+
+    def __init__(self, schoolyears):
+        self.schoolyears = sorted(schoolyears, key=lambda s: s.first)
+        self.firsts = [schoolyear.first for schoolyear in self.schoolyears]
+        self.terms = {}
+        for schoolyear in self.schoolyears:
+            terms = sorted(schoolyear.values(), key=lambda t: t.first)
+            self.terms[schoolyear.__name__] = (
+                [term.first for term in terms], terms)
+
+    def _find(self, firsts, items, date):
+        n = bisect.bisect_right(firsts, date) - 1
+        found = None
+        if n >= 0 and date <= items[n].last:
+            found = items[n]
+        return n, found
+
+    def getSchoolYear(self, date):
+        n, schoolyear = self._find(self.firsts, self.schoolyears, date)
+        return schoolyear
+
+    def getLastSchoolYear(self, date):
+        n, schoolyear = self._find(self.firsts, self.schoolyears, date)
+        if n >= 0:
+            return self.schoolyears[n]
+        if self.schoolyears:
+            return self.schoolyears[0]
+        return None
+
+    def getTerm(self, schoolyear, date):
+        firsts, terms = self.terms.get(schoolyear.__name__, ([], []))
+        n, term = self._find(firsts, terms, date)
+        return term
+
+    def getNextTerm(self, schoolyear, date):
+        firsts, terms = self.terms.get(schoolyear.__name__, ([], []))
+        n, term = self._find(firsts, terms, date)
+        if term is not None:
+            return term
+        if n + 1 < len(terms):
+            return terms[n + 1]
+        if n >= 0:
+            return terms[n]
+        return None
+
+
 class SchoolYearContainer(BTreeContainer):
     implements(ISchoolYearContainer)
 
     _active_id = None
 
+    # Bumped when school year or term dates change, so that other
+    # connections drop their date indexes too.
+    _date_index_version = 0
+    _v_date_index = None
+
     def _set_active_id(self, new_id):
         if new_id is not None and new_id not in self:
             raise ValueError("School Year %r does not exist" % new_id)
@@ -81,8 +139,19 @@ class SchoolYearContainer(BTreeContainer):
                                  " it is the last school year available!")
             else:
                 self._set_active_id(None)
+        self.invalidateDateIndex()
         BTreeContainer.__delitem__(self, schoolyear_id)
 
+    def getDateIndex(self):
+        index = self._v_date_index
+        if index is None:
+            index = self._v_date_index = SchoolYearDateIndex(self.values())
+        return index
+
+    def invalidateDateIndex(self):
+        self._date_index_version += 1
+        self._v_date_index = None
+
     def validateForOverlap(self, schoolyear):
         overlapping_schoolyears = []
         for other_schoolyear in self.values():
@@ -94,6 +163,7 @@ class SchoolYearContainer(BTreeContainer):
 
     def __setitem__(self, key, schoolyear):
         self.validateForOverlap(schoolyear)
+        self.invalidateDateIndex()
         BTreeContainer.__setitem__(self, key, schoolyear)
         if self.active_id is None:
             self._set_active_id(key)
@@ -105,7 +175,7 @@ class SchoolYearContainer(BTreeContainer):
 
     @property
     def sorted_schoolyears(self):
-        return sorted(self.values(), key=lambda s: s.last)
+        return list(self.getDateIndex().schoolyears)
 
     def activateNextSchoolYear(self, year_id=None):
         if year_id is None:
@@ -115,27 +185,11 @@ class SchoolYearContainer(BTreeContainer):
         self._set_active_id(year_id)
 
     def getLastSchoolYearForDate(self, date):
-        before, after = [], []
-        for year in self.sorted_schoolyears:
-            if date in IDateRange(year):
-                return year
-            if date > year.last:
-                before.append((year.last, year))
-            if date < year.first:
-                after.append((year.first, year))
-        if before:
-            return max(before)[1]
-        if after:
-            return min(after)[1]
-        return None
+        return self.getDateIndex().getLastSchoolYear(date)
 
     def getSchoolYearForToday(self):
         dtm = queryUtility(IDateManager)
-        today = dtm.today
-        for year in self.sorted_schoolyears:
-            if today in IDateRange(year):
-                return year
-        return None
+        return self.getDateIndex().getSchoolYear(dtm.today)
 
     def getNextSchoolYear(self):
         if self.getActiveSchoolYear() is None:
@@ -211,8 +265,17 @@ class SchoolYear(BTreeContainer):
             raise ValueError("Term can't start before the school year starts!")
         if term.last > self.last:
             raise ValueError("Term can't end after the school year ends!")
+        self.invalidateDateIndex()
         BTreeContainer.__setitem__(self, key, term)
 
+    def __delitem__(self, key):
+        self.invalidateDateIndex()
+        BTreeContainer.__delitem__(self, key)
+
+    def invalidateDateIndex(self):
+        if ISchoolYearContainer.providedBy(self.__parent__):
+            self.__parent__.invalidateDateIndex()
+
 
 class SchoolYearDateRangeAdapter(DateRange):
     adapts(ISchoolYear)
@@ -274,6 +337,14 @@ class SchoolYearOverlapValidationSubscriber(EventAdapterSubscriber):
             validateScholYearsForOverlap(syc, dr, self.event.schoolyear)
 
 
+class SchoolYearDateIndexSubscriber(EventAdapterSubscriber):
+    adapts(SchoolYearAfterChangeEvent)
+    implements(ISubscriber)
+
+    def __call__(self):
+        self.event.schoolyear.invalidateDateIndex()
+
+
 def validateScholYearForOverflow(dr, schoolyear):
     overflowing_terms = []
     for term in schoolyear.values():
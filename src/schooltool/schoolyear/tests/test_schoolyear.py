@@ -364,6 +364,78 @@ def doctest_SchoolYear_terms_must_be_fully_contained():
     """
 
 
+def doctest_SchoolYearContainer_date_index():
+    """Test for looking up school years and terms by date
+
+        >>> syc = ISchoolYearContainer(ISchoolToolApplication(None))
+        >>> sy1 = syc['2005'] = SchoolYear("2005", date(2005, 9, 1),
+        ...                                date(2006, 6, 30))
+        >>> sy2 = syc['2006'] = SchoolYear("2006", date(2006, 9, 1),
+        ...                                date(2007, 6, 30))
+        >>> fall = sy1['fall'] = Term("Fall", date(2005, 9, 1),
+        ...                           date(2005, 12, 31))
+        >>> spring = sy1['spring'] = Term("Spring", date(2006, 2, 1),
+        ...                               date(2006, 6, 30))
+
+    School years and terms are sorted in an index, which is kept until
+    something changes.
+
+        >>> index = syc.getDateIndex()
+        >>> [sy.title for sy in index.schoolyears]
+        ['2005', '2006']
+        >>> syc.getDateIndex() is index
+        True
+
+        >>> print index.getSchoolYear(date(2006, 7, 15))
+        None
+        >>> index.getSchoolYear(date(2006, 9, 1)).title
+        '2006'
+        >>> index.getTerm(sy1, date(2006, 1, 15)) is None
+        True
+        >>> index.getNextTerm(sy1, date(2006, 1, 15)).title
+        'Spring'
+        >>> index.getNextTerm(sy1, date(2006, 8, 1)).title
+        'Spring'
+        >>> print index.getNextTerm(sy2, date(2006, 8, 1))
+        None
+
+    Between school years, the one that ended last is picked.
+
+        >>> syc.getLastSchoolYearForDate(date(2006, 7, 15)).title
+        '2005'
+        >>> syc.getLastSchoolYearForDate(date(2004, 7, 15)).title
+        '2005'
+
+    Changing the dates of school years and terms rebuilds the index.
+
+        >>> fall.last = date(2006, 1, 20)
+        >>> syc.getDateIndex() is index
+        False
+        >>> syc.getDateIndex().getTerm(sy1, date(2006, 1, 15)).title
+        'Fall'
+
+        >>> sy1.last = date(2006, 7, 31)
+        >>> syc.getLastSchoolYearForDate(date(2006, 7, 15)).title
+        '2005'
+
+    So do added and removed terms and school years.
+
+        >>> sy2['fall'] = Term("Fall", date(2006, 9, 1), date(2006, 12, 31))
+        >>> syc.getDateIndex().getTerm(sy2, date(2006, 10, 1)).title
+        'Fall'
+
+        >>> del sy1['fall']
+        >>> print syc.getDateIndex().getTerm(sy1, date(2006, 1, 15))
+        None
+
+        >>> syc['2004'] = SchoolYear("2004", date(2004, 9, 1),
+        ...                          date(2005, 6, 30))
+        >>> [sy.title for sy in syc.sorted_schoolyears]
+        ['2004', '2005', '2006']
+
+    """
+
+
 def test_suite():
     optionflags = doctest.NORMALIZE_WHITESPACE | doctest.ELLIPSIS
     suite = doctest.DocTestSuite(optionflags=optionflags,
@@ -22,6 +22,8 @@ Customisation for SchoolTool security policy.
 from zope.interface import implements
 from zope.annotation.interfaces import IAnnotations
 from zope.component import subscribers
+from zope.event import notify
+from zope.lifecycleevent import ObjectModifiedEvent
 from persistent import Persistent
 from persistent.dict import PersistentDict
 from schooltool.securitypolicy.interfaces import IAccessControlCustomisations
@@ -48,6 +50,7 @@ class AccessControlCustomisations(Persistent):
     def set(self, key, value):
         if self.getSetting(key):
             self._settings[key] = value
+            notify(ObjectModifiedEvent(self))
 
     def __iter__(self):
         settings = subscribers([None], IAccessControlSetting)
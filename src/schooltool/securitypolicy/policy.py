@@ -19,14 +19,27 @@
 SchoolTool security policy.
 
 """
+import datetime
+import threading
+
 import zope.keyreference.interfaces
+from BTrees.Length import Length
+from zope.annotation.interfaces import IAnnotations
+from zope.security.proxy import removeSecurityProxy
 from zope.security.simplepolicies import ParanoidSecurityPolicy
-from zope.component import queryAdapter
+from zope.component import queryAdapter, queryUtility
+from zope.intid.interfaces import IIntIds
 from zope.traversing.api import getParent
+from schooltool.app.interfaces import ISchoolToolApplication
+from schooltool.common.cache import LRUCache
+from schooltool.term.interfaces import IDateManager
 from schooltool.securitypolicy.crowds import ICrowd
 from schooltool.securitypolicy.metaconfigure import getCrowdsUtility
 
 
+CROWDS_VERSION_KEY = 'schooltool.securitypolicy.crowds_version'
+
+
 class SchoolToolSecurityPolicy(ParanoidSecurityPolicy):
     """Crowd-based security policy."""
 
@@ -67,9 +80,76 @@ class SchoolToolSecurityPolicy(ParanoidSecurityPolicy):
         return False
 
 
+def getCrowdsVersion():
+    """Return the version of data crowds are evaluated against.
+
+    Permission decisions cached with an older version are stale.
+    """
+    app = ISchoolToolApplication(None, None)
+    if app is None:
+        return None
+    counter = IAnnotations(app).get(CROWDS_VERSION_KEY)
+    dateman = queryUtility(IDateManager)
+    if dateman is not None:
+        today = dateman.today
+    else:
+        today = datetime.date.today()
+    if counter is None:
+        return 0, today
+    return counter(), today
+
+
+def crowdsChangedInTransaction():
+    """Were crowds invalidated in the current transaction?
+
+    Decisions made from uncommitted data must not be shared: the
+    transaction may still be aborted or retried.
+    """
+    app = ISchoolToolApplication(None, None)
+    if app is None:
+        return True
+    counter = IAnnotations(app).get(CROWDS_VERSION_KEY)
+    if counter is None:
+        return False
+    return counter._p_jar is None or bool(counter._p_changed)
+
+
+def invalidateCrowds():
+    app = ISchoolToolApplication(None, None)
+    if app is None:
+        return
+    annotations = IAnnotations(app)
+    if CROWDS_VERSION_KEY not in annotations:
+        annotations[CROWDS_VERSION_KEY] = Length()
+    annotations[CROWDS_VERSION_KEY].change(1)
+
+
+def invalidateCrowdsOnRelationshipChange(event):
+    """Invalidate cached permissions when relationships change."""
+    if getattr(event, 'batch', None) is not None:
+        return # invalidated once for the whole batch
+    invalidateCrowds()
+
+
+def invalidateCrowdsOnLinkChange(link, event):
+    """Invalidate cached permissions when shared link state changes.
+
+    Every write to the shared state of a link, like temporal state
+    changes, ends up here.
+    """
+    invalidateCrowds()
+
+
+def invalidateCrowdsOnSettingsChange(customisations, event):
+    """Invalidate cached permissions when security settings change."""
+    invalidateCrowds()
+
+
 class CachingSecurityPolicy(ParanoidSecurityPolicy):
     """Crowd-based caching security policy."""
 
+    shared_cache = None
+
     def cachingKey(self, permission, obj):
         try:
             ref = zope.keyreference.interfaces.IKeyReference(obj, None)
@@ -90,6 +170,45 @@ class CachingSecurityPolicy(ParanoidSecurityPolicy):
                 return None
         return participation._st_perm_cache
 
+    def sharedCachingKey(self, participation, permission, obj):
+        cache = self.getCache(participation)
+        if cache is None or not cache['enabled']:
+            return None
+        principal_id = getattr(participation.principal, 'id', None)
+        if principal_id is None:
+            return None
+        if 'version' not in cache:
+            cache['version'] = getCrowdsVersion()
+        if cache['version'] is None or crowdsChangedInTransaction():
+            return None
+        int_ids = queryUtility(IIntIds)
+        if int_ids is None:
+            return None
+        obj_id = int_ids.queryId(removeSecurityProxy(obj))
+        if obj_id is None:
+            return None
+        return (principal_id, permission, obj_id, cache['version'])
+
+    def checkSharedCache(self, permission, obj):
+        result = None
+        cacheable = False
+        for participation in self.participations:
+            key = self.sharedCachingKey(participation, permission, obj)
+            if key is not None:
+                cacheable = True
+                perm = self.shared_cache.get(key)
+                result = max(result, perm)
+        if not cacheable:
+            self.countSharedCheck('uncacheable')
+        elif result is None:
+            self.countSharedCheck('misses')
+        else:
+            self.countSharedCheck('hits')
+        return result
+
+    def countSharedCheck(self, outcome):
+        pass
+
     def checkCache(self, permission, obj):
         key = self.cachingKey(permission, obj)
         if key is None:
@@ -100,6 +219,8 @@ class CachingSecurityPolicy(ParanoidSecurityPolicy):
             if cache is not None:
                 perm = cache['perm'].get(key, None)
                 result = max(result, perm)
+        if result is None and self.shared_cache is not None:
+            result = self.checkSharedCache(permission, obj)
         return result
 
     def cache(self, participation, permission, obj, value):
@@ -110,6 +231,10 @@ class CachingSecurityPolicy(ParanoidSecurityPolicy):
         if key is None:
             return # uncacheable
         cache['perm'][key] = value
+        if self.shared_cache is not None:
+            shared_key = self.sharedCachingKey(participation, permission, obj)
+            if shared_key is not None:
+                self.shared_cache.set(shared_key, value)
 
     def checkPermission(self, permission, obj):
         """Return True if principal has permission on object."""
@@ -162,3 +287,31 @@ class CachingSecurityPolicy(ParanoidSecurityPolicy):
                     return True
             self.cache(participation, permission, obj, False)
         return False
+
+
+class SharedCachingSecurityPolicy(CachingSecurityPolicy):
+    """Caching security policy that also shares decisions between requests.
+
+    Decisions are cached per principal, permission, object int id and
+    crowds version.  Relationship and security setting changes bump the
+    version, so stale decisions are never reused.  Once a transaction
+    changes them, its decisions are no longer shared.
+    """
+
+    shared_cache = LRUCache(size=10000)
+
+    shared_stats = {'hits': 0, 'misses': 0, 'uncacheable': 0}
+    shared_stats_lock = threading.Lock()
+
+    def countSharedCheck(self, outcome):
+        with self.shared_stats_lock:
+            self.shared_stats[outcome] += 1
+
+    @classmethod
+    def sharedCacheStats(cls):
+        """Return counts of shared cache hits, misses and checks that
+        could not use it, and the number of cached decisions."""
+        with cls.shared_stats_lock:
+            stats = dict(cls.shared_stats)
+        stats['size'] = cls.shared_cache.stats()['size']
+        return stats
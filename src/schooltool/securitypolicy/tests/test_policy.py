@@ -197,6 +197,119 @@ def test_SchoolToolSecurityPolicy_checkCrowds():
     """
 
 
+def test_SharedCachingSecurityPolicy_transactions():
+    """Shared decisions are never made from uncommitted data.
+
+        >>> import transaction
+        >>> from persistent import Persistent
+        >>> from ZODB.DB import DB
+        >>> from ZODB.MappingStorage import MappingStorage
+        >>> from zope.annotation.interfaces import IAttributeAnnotatable
+        >>> from zope.intid.interfaces import IIntIds
+        >>> from zope.keyreference.interfaces import IKeyReference
+        >>> from schooltool.app.interfaces import ISchoolToolApplication
+        >>> from schooltool.common.cache import LRUCache
+        >>> from schooltool.securitypolicy.crowds import CrowdsUtility
+        >>> from schooltool.securitypolicy.interfaces import ICrowdsUtility
+        >>> from schooltool.securitypolicy import policy
+
+        >>> setup.setUpAnnotations()
+
+        >>> class AppStub(Persistent):
+        ...     implements(ISchoolToolApplication, IAttributeAnnotatable)
+        ...     open = True
+
+        >>> db = DB(MappingStorage())
+        >>> connection = db.open()
+        >>> app = connection.root()['app'] = AppStub()
+        >>> transaction.commit()
+        >>> provideAdapter(lambda ignored: app, (None, ), ISchoolToolApplication)
+
+        >>> class IntIdsStub(object):
+        ...     def queryId(self, obj):
+        ...         return 1
+        >>> provideUtility(IntIdsStub(), IIntIds)
+        >>> provideAdapter(lambda obj: 'obj', (IObj, ), IKeyReference)
+
+    The crowd lets everyone in while the application is open.
+
+        >>> class OpenCrowd(Crowd):
+        ...     def contains(self, principal):
+        ...         print 'Checking crowd'
+        ...         return app.open
+        >>> cru = CrowdsUtility()
+        >>> provideUtility(cru, ICrowdsUtility)
+        >>> cru.factories = {'open': OpenCrowd}
+        >>> cru.crowds[('perm', None)] = ['open']
+
+        >>> class PrincipalStub(object):
+        ...     id = 'sb.person.john'
+
+        >>> def checkPermission(obj):
+        ...     participation = ParticipationStub()
+        ...     participation.principal = PrincipalStub()
+        ...     sp = policy.SharedCachingSecurityPolicy(participation)
+        ...     return sp.checkPermission('perm', obj)
+
+        >>> old_cache = policy.SharedCachingSecurityPolicy.shared_cache
+        >>> policy.SharedCachingSecurityPolicy.shared_cache = LRUCache(10)
+        >>> shared_cache = policy.SharedCachingSecurityPolicy.shared_cache
+        >>> old_stats = policy.SharedCachingSecurityPolicy.shared_stats
+        >>> policy.SharedCachingSecurityPolicy.shared_stats = {
+        ...     'hits': 0, 'misses': 0, 'uncacheable': 0}
+
+    Decisions are shared between requests.
+
+        >>> obj = Obj()
+        >>> checkPermission(obj)
+        Checking crowd
+        True
+        >>> checkPermission(obj)
+        True
+
+    A request closes the application, which invalidates crowds.  Its
+    decisions are neither taken from nor stored in the shared cache.
+
+        >>> app.open = False
+        >>> policy.invalidateCrowds()
+        >>> checkPermission(obj)
+        Checking crowd
+        False
+        >>> shared_cache.get(('sb.person.john', 'perm', 1,
+        ...                   policy.getCrowdsVersion()))
+
+    The change is aborted, other requests still see the open application.
+
+        >>> transaction.abort()
+        >>> app.open
+        True
+        >>> checkPermission(obj)
+        True
+
+    Once the change is committed, decisions are made again.
+
+        >>> app.open = False
+        >>> policy.invalidateCrowds()
+        >>> transaction.commit()
+        >>> checkPermission(obj)
+        Checking crowd
+        False
+        >>> checkPermission(obj)
+        False
+
+    The policy counts how shared decisions were looked up.
+
+        >>> sorted(policy.SharedCachingSecurityPolicy.sharedCacheStats().items())
+        [('hits', 3), ('misses', 2), ('size', 2), ('uncacheable', 1)]
+
+        >>> policy.SharedCachingSecurityPolicy.shared_cache = old_cache
+        >>> policy.SharedCachingSecurityPolicy.shared_stats = old_stats
+        >>> connection.close()
+        >>> db.close()
+
+    """
+
+
 def setUp(test=None):
     setup.placelessSetUp()
 
@@ -208,4 +321,5 @@ def test_suite():
     return unittest.TestSuite([
             doctest.DocTestSuite(optionflags=doctest.ELLIPSIS,
                                  setUp=setUp, tearDown=tearDown),
+            doctest.DocTestSuite('schooltool.securitypolicy.policy'),
            ])
@@ -188,6 +188,9 @@ class IPDFPage(IRMLTemplated, IPageBase):
     content_template = Attribute(
         u"Template that renders the main content.")
 
+    def renderToPDF(filename=None):
+        """Render the document to PDF data."""
+
 
 IPDFPage.setTaggedValue('flourish.template_content_type', 'xml')
 
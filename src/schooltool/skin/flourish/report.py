@@ -35,11 +35,13 @@ from zope.cachedescriptors.property import Lazy
 from zope.interface import implements, Interface
 from zope.i18n import translate
 from zope.publisher.browser import BrowserView
+from zope.security.proxy import removeSecurityProxy
 from z3c.rml import rml2pdf
 
 from schooltool.app import pdf
 from schooltool.app.interfaces import ISchoolToolApplication
 from schooltool.app.interfaces import IApplicationPreferences
+from schooltool.common.cache import LRUCache
 from schooltool.skin.flourish.helpers import quoteFilename
 from schooltool.skin.flourish import content
 from schooltool.skin.flourish import interfaces
@@ -73,6 +75,12 @@ class Box(object):
             self.bottom = bottom
 
 
+def renderRML(xml, filename=None):
+    """Render an RML document to PDF data."""
+    stream = rml2pdf.parseString(xml, filename=filename or None)
+    return stream.getvalue()
+
+
 class PDFPage(page.PageBase):
     implements(interfaces.IPDFPage)
 
@@ -97,10 +105,12 @@ class PDFPage(page.PageBase):
     # TODO: Should return True when devmode enabled
     render_debug = False
 
-    def renderPDF(self, xml):
-        filename = self.filename
-        stream = rml2pdf.parseString(xml, filename=filename or None)
-        data = stream.getvalue()
+    def renderToPDF(self, filename=None):
+        if filename is None:
+            filename = self.filename
+        return renderRML(self.render(), filename=filename)
+
+    def respondPDF(self, data, filename):
         response = self.request.response
         response.setHeader('Content-Type', 'application/pdf')
         response.setHeader('Content-Length', len(data))
@@ -114,6 +124,10 @@ class PDFPage(page.PageBase):
         response.setHeader('Content-Disposition', disposition)
         return data
 
+    def renderPDF(self, xml):
+        filename = self.filename
+        return self.respondPDF(renderRML(xml, filename=filename), filename)
+
     @property
     def base_filename(self):
         filename = self.__name__
@@ -139,10 +153,10 @@ class PDFPage(page.PageBase):
                                                  304, 305, 307]:
             return u''
 
-        rml = self.render()
-        data = self.renderPDF(rml)
+        filename = self.filename
+        data = self.renderToPDF(filename=filename)
 
-        return data
+        return self.respondPDF(data, filename)
 
 
 class IPlainPDFPage(interfaces.IPDFPage):
@@ -177,11 +191,62 @@ class PlainPDFPage(PDFPage):
     message_title = _('report')
 
 
-class PDFInitSection(viewlet.ViewletManager):
-    pass
+# Stylesheets of documents with the same templates and layout are the
+# same, so their RML is cached.  Resize to 0 to disable.
+rml_fragment_cache = LRUCache(size=200)
 
 
-class PDFPageInfoSection(viewlet.ViewletManager):
+class CachedSection(viewlet.ViewletManager):
+    """A document section rendered once per page.
+
+    If `shared`, the RML is also cached by viewlets, page layout and
+    language, so viewlets of shared sections must not depend on the
+    context.
+    """
+
+    shared = False
+    _rendered = None
+
+    @property
+    def language(self):
+        locale = getattr(self.request, 'locale', None)
+        if locale is None:
+            return None
+        return (locale.id.language, locale.id.territory, locale.id.variant)
+
+    @property
+    def cache_key(self):
+        view = self.view
+        margin = view.margin
+        return (self.__class__, view.__class__,
+                tuple([(name, removeSecurityProxy(self[name]).__class__)
+                      for name in self.order]),
+                tuple(view.page_size),
+                (margin.top, margin.right, margin.bottom, margin.left),
+                view.rotation,
+                self.language)
+
+    def __call__(self, *args, **kw):
+        if self._rendered is not None:
+            return self._rendered
+        cache = self.shared and rml_fragment_cache
+        if cache:
+            self.collect()
+            key = self.cache_key
+            self._rendered = cache.get(key)
+            if self._rendered is not None:
+                return self._rendered
+        self._rendered = viewlet.ViewletManager.__call__(self, *args, **kw)
+        if cache:
+            cache.set(key, self._rendered)
+        return self._rendered
+
+
+class PDFInitSection(CachedSection):
+    shared = True
+
+
+class PDFPageInfoSection(CachedSection):
 
     @property
     def page_size(self):
@@ -192,11 +257,22 @@ class PDFStylesheetInitSection(viewlet.ViewletManager):
     pass
 
 
-class PDFStylesheetSection(viewlet.ViewletManager):
-    pass
-
+class PDFStylesheetSection(CachedSection):
+    shared = True
 
-class PDFTemplateSection(viewlet.ViewletManager):
+    @property
+    def cache_key(self):
+        # Aliases are rendered into the stylesheet and may depend on
+        # the context.
+        providers = content.ContentProviders(
+            self.context, self.request, self)
+        aliases = providers.get('aliases')
+        if aliases is None:
+            return super(PDFStylesheetSection, self).cache_key
+        return super(PDFStylesheetSection, self).cache_key + (aliases(), )
+
+
+class PDFTemplateSection(CachedSection):
 
     page_size = property(lambda self: self.view.page_size)
     margin = property(lambda self: self.view.margin)
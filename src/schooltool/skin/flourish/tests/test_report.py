@@ -21,6 +21,10 @@ Report Tests
 import unittest
 from textwrap import dedent
 
+from reportlab.lib import pagesizes
+
+from schooltool.common.cache import LRUCache
+from schooltool.skin.flourish import report
 from schooltool.skin.flourish.report import buildHTMLParagraphs
 from schooltool.testing.util import NiceDiffsMixin
 
@@ -79,5 +83,175 @@ class TestBuildHTMLParagraphs(NiceDiffsMixin, unittest.TestCase):
                          ['&lt;ul&gt;&lt;li&gt;One&lt;/li&gt;&lt;li&gt;Two&lt;/li&gt;&lt;/ul&gt;'])
 
 
+class ViewStub(object):
+
+    page_size = pagesizes.A4
+    margin = report.Box(10)
+    rotation = 0
+
+
+class StylesViewletStub(object):
+    pass
+
+
+class LocaleIdStub(object):
+
+    territory = variant = None
+
+    def __init__(self, language):
+        self.language = language
+
+
+class RequestStub(object):
+
+    def __init__(self, language):
+        self.locale = LocaleIdStub(None)
+        self.locale.id = LocaleIdStub(language)
+
+
+class SectionStub(report.CachedSection):
+
+    renders = 0
+
+    def collect(self):
+        self.cache = {'styles': StylesViewletStub()}
+        self.order = ['styles']
+
+    def update(self):
+        pass
+
+    def render(self):
+        SectionStub.renders += 1
+        return '<stylesheet/>'
+
+
+class TestCachedSection(unittest.TestCase):
+
+    def setUp(self):
+        self.old_cache = report.rml_fragment_cache
+        report.rml_fragment_cache = LRUCache(size=10)
+        SectionStub.renders = 0
+
+    def tearDown(self):
+        report.rml_fragment_cache = self.old_cache
+        SectionStub.shared = False
+
+    def render(self, view, request=None):
+        return SectionStub(None, request, view)()
+
+    def test_rendered_once_per_page(self):
+        section = SectionStub(None, None, ViewStub())
+        self.assertEqual(section(), '<stylesheet/>')
+        self.assertEqual(section(), '<stylesheet/>')
+        self.assertEqual(SectionStub.renders, 1)
+        self.render(ViewStub())
+        self.assertEqual(SectionStub.renders, 2)
+
+    def test_shared(self):
+        SectionStub.shared = True
+        self.assertEqual(self.render(ViewStub()), '<stylesheet/>')
+        self.assertEqual(self.render(ViewStub()), '<stylesheet/>')
+        self.assertEqual(SectionStub.renders, 1)
+        landscape = ViewStub()
+        landscape.page_size = pagesizes.landscape(pagesizes.A4)
+        self.render(landscape)
+        self.assertEqual(SectionStub.renders, 2)
+        self.assertEqual(report.rml_fragment_cache.stats(),
+                         {'hits': 1, 'misses': 2, 'size': 2})
+
+    def test_shared_by_language(self):
+        SectionStub.shared = True
+        self.render(ViewStub(), RequestStub('en'))
+        self.render(ViewStub(), RequestStub('en'))
+        self.assertEqual(SectionStub.renders, 1)
+        self.render(ViewStub(), RequestStub('lt'))
+        self.assertEqual(SectionStub.renders, 2)
+
+    def test_cache_disabled(self):
+        SectionStub.shared = True
+        report.rml_fragment_cache.resize(0)
+        self.render(ViewStub())
+        self.render(ViewStub())
+        self.assertEqual(SectionStub.renders, 2)
+
+
+class StylesheetSectionStub(report.PDFStylesheetSection):
+
+    def collect(self):
+        self.cache = {'styles': StylesViewletStub()}
+        self.order = ['styles']
+
+
+class AliasesStub(object):
+
+    def __init__(self, rml):
+        self.rml = rml
+
+    def __call__(self):
+        return self.rml
+
+
+class TestStylesheetSection(unittest.TestCase):
+
+    def setUp(self):
+        self.old_providers = report.content.ContentProviders
+        aliases = self.aliases = {}
+        class ContentProvidersStub(object):
+            def __init__(self, context, request, view):
+                self.context = context
+            def get(self, name):
+                assert name == 'aliases'
+                return aliases.get(self.context)
+        report.content.ContentProviders = ContentProvidersStub
+
+    def tearDown(self):
+        report.content.ContentProviders = self.old_providers
+
+    def cache_key(self, context):
+        section = StylesheetSectionStub(context, None, ViewStub())
+        section.collect()
+        return section.cache_key
+
+    def test_cache_key_aliases(self):
+        self.assertEqual(self.cache_key('one'), self.cache_key('two'))
+        self.aliases['one'] = AliasesStub('<alias id="x" value="one"/>')
+        self.aliases['two'] = AliasesStub('<alias id="x" value="two"/>')
+        self.assertNotEqual(self.cache_key('one'), self.cache_key('two'))
+        self.assertEqual(self.cache_key('one')[-1],
+                         '<alias id="x" value="one"/>')
+
+
+class PDFPageStub(report.PDFPage):
+
+    filename = 'report.pdf'
+
+    def __init__(self):
+        pass
+
+    def render(self):
+        return '<document/>'
+
+
+class TestRenderToPDF(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+        self.old_renderRML = report.renderRML
+        def renderRML(xml, filename=None):
+            self.calls.append((xml, filename))
+            return 'PDF'
+        report.renderRML = renderRML
+
+    def tearDown(self):
+        report.renderRML = self.old_renderRML
+
+    def test_renderToPDF(self):
+        page = PDFPageStub()
+        self.assertEqual(page.renderToPDF('out.pdf'), 'PDF')
+        self.assertEqual(page.renderToPDF(), 'PDF')
+        self.assertEqual(self.calls, [('<document/>', 'out.pdf'),
+                                      ('<document/>', 'report.pdf')])
+
+
 if __name__ == '__main__':
     unittest.main()
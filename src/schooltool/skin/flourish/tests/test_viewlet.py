@@ -440,6 +440,50 @@ def doctest_ViewletManager_collect():
     """
 
 
+def doctest_ViewletManager_registry_cache():
+    """Tests for caching of viewlet lookups in the component registry.
+
+        >>> from zope.component import getSiteManager
+        >>> from schooltool.skin.flourish.viewlet import getRegistryCache
+
+        >>> context = 'context'
+        >>> request = TestRequest()
+        >>> view = 'view'
+
+        >>> manager = ViewletManager(context, request, view)
+        >>> provideViewlet(viewletClass(after=('v2', )), manager, 'v1')
+        >>> provideViewlet(viewletClass(), manager, 'v2')
+
+        >>> manager.viewlets
+        [<TestViewlet u'v2'>, <TestViewlet u'v1'>]
+
+    Viewlet factories and their order are cached in the registry.
+
+        >>> cache = getRegistryCache(getSiteManager())
+        >>> sorted([key[0] for key in cache])
+        ['factories', 'order']
+
+    Other managers reuse them, but get viewlets of their own.
+
+        >>> other = ViewletManager(context, request, view)
+        >>> other.viewlets
+        [<TestViewlet u'v2'>, <TestViewlet u'v1'>]
+        >>> other['v1'] is manager['v1']
+        False
+        >>> len(cache)
+        2
+
+    The cache is reset when the registry changes.
+
+        >>> provideViewlet(viewletClass(), manager, 'v0')
+        >>> getRegistryCache(getSiteManager()) is cache
+        False
+        >>> ViewletManager(context, request, view).viewlets
+        [<TestViewlet u'v0'>, <TestViewlet u'v2'>, <TestViewlet u'v1'>]
+
+    """
+
+
 def doctest_ViewletManager_filter():
     """Tests for ViewletManager.filter
 
@@ -18,12 +18,13 @@
 """
 SchoolTool flourish viewlets and viewlet managers.
 """
+import zope.component
 import zope.contentprovider.interfaces
 import zope.event
 import zope.security
 import zope.viewlet.interfaces
 from zope.component import adapts
-from zope.interface import implements
+from zope.interface import implements, providedBy
 from zope.proxy import removeAllProxies
 from zope.proxy.decorator import SpecificationDecoratorBase
 from zope.publisher.browser import BrowserPage
@@ -120,27 +121,62 @@ class ViewletProxy(SpecificationDecoratorBase):
         return self.render(*args, **kw)
 
 
+def getRegistryCache(registry):
+    """Return a dict for caching viewlet lookups in the registry.
+
+    The dict is emptied when the registry or its bases change.
+    """
+    adapters = registry.adapters
+    generations = tuple([getattr(r, '_generation', None)
+                         for r in getattr(adapters, 'ro', (adapters, ))])
+    cached = getattr(adapters, '_v_flourish_viewlet_cache', None)
+    if cached is None or cached[0] != generations:
+        cached = (generations, {})
+        adapters._v_flourish_viewlet_cache = cached
+    return cached[1]
+
+
 class ViewletManagerBase(ContentProvider):
     implements(IViewletManager)
 
     cache = None
     order = None
+    _lookup_key = None
 
     render = lambda self, *args, **kw: ''
 
-    def collectViewlets(self):
-        indirect = list(zope.component.getAdapters(
-                (self.context, self.request, self.view, self),
-                zope.viewlet.interfaces.IViewlet))
-        adapted = [(v, IViewlet(a, None))
-                   for (v, a) in indirect]
-
-        result = dict(adapted)
+    def lookupViewletFactories(self):
+        """Return {name: (factory, is_zope_viewlet)} of viewlets for the
+        interfaces provided by the context, request, view and manager.
+        """
+        registry = zope.component.getSiteManager()
+        required = tuple([providedBy(ob) for ob in
+                          (self.context, self.request, self.view, self)])
+        cache = getRegistryCache(registry)
+        key = ('factories', ) + required
+        factories = cache.get(key)
+        if factories is None:
+            factories = {}
+            for name, factory in registry.adapters.lookupAll(
+                required, zope.viewlet.interfaces.IViewlet):
+                factories[name] = (factory, True)
+            for name, factory in registry.adapters.lookupAll(
+                required, IViewlet):
+                factories[name] = (factory, False)
+            cache[key] = factories
+        self._lookup_key = required
+        return factories
 
-        direct = list(zope.component.getAdapters(
-                (self.context, self.request, self.view, self),
-                IViewlet))
-        result.update(dict(direct))
+    def collectViewlets(self):
+        objects = (self.context, self.request, self.view, self)
+        result = {}
+        for name, (factory, indirect) in self.lookupViewletFactories().items():
+            viewlet = factory(*objects)
+            if viewlet is None:
+                continue
+            if indirect:
+                viewlet = IViewlet(viewlet, None)
+            result[name] = viewlet
 
         # XXX: This is also a workaround Zope's bug - if an adapter
         #      has a specified a permission and returns None, instead
@@ -177,6 +213,20 @@ class ViewletManagerBase(ContentProvider):
         return sorted(viewlet_dict)
 
     def buildOrder(self, viewlet_dict):
+        if (self._lookup_key is not None and
+            self.presort.im_func is ViewletManagerBase.presort.im_func):
+            # Viewlets are ordered by their registrations, so the order
+            # of the same viewlets can be shared between requests.
+            cache = getRegistryCache(zope.component.getSiteManager())
+            key = ('order', self.__class__, self._lookup_key,
+                   tuple(sorted(viewlet_dict)))
+            names = cache.get(key)
+            if names is None:
+                names = cache[key] = self.sortViewlets(viewlet_dict)
+            return list(names)
+        return self.sortViewlets(viewlet_dict)
+
+    def sortViewlets(self, viewlet_dict):
         presort_order = self.presort(viewlet_dict)
         before = {}
         after = {}
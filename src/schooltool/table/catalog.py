@@ -23,6 +23,7 @@ from zope.interface import implements, implementsOnly
 from zope.cachedescriptors.property import Lazy
 from zope.component import getUtility
 from zope.container.contained import Contained
+from zope.catalog.attribute import AttributeIndex
 from zope.catalog.interfaces import ICatalogIndex
 from zope.catalog.interfaces import ICatalog
 from zope.intid.interfaces import IIntIds
@@ -92,6 +93,119 @@ class ConvertingSetIndex(ConvertingSetIndexMixin, SetIndex, Contained):
     implements(IConvertingSetIndex)
 
 
+def normalizeSearchText(value):
+    if isinstance(value, str):
+        value = value.decode('UTF-8', 'replace')
+    elif not isinstance(value, unicode):
+        value = unicode(value)
+    return value.lower()
+
+
+class ISubstringIndex(IValueIndex):
+    """Value index that finds documents by a substring of their value."""
+
+    def search(text):
+        """Return a set of ids of documents containing text.
+
+        Search is case insensitive.
+        """
+
+
+class SubstringIndex(ValueIndex):
+    """Value index with trigram postings for substring searches.
+
+    Every value is lowercased and padded at the end, so that each position
+    in it starts a trigram.  Longer queries intersect the postings of their
+    trigrams, queries shorter than a trigram union the postings of
+    trigrams they prefix.
+    """
+    implements(ISubstringIndex)
+
+    padding = u'\x00\x00'
+
+    def clear(self):
+        super(SubstringIndex, self).clear()
+        self.trigrams = self.family.OO.BTree()
+
+    def _trigrams(self, value):
+        text = normalizeSearchText(value) + self.padding
+        return set([text[n:n+3] for n in range(len(text) - 2)])
+
+    def _addTrigrams(self, doc_id, value):
+        for trigram in self._trigrams(value):
+            docs = self.trigrams.get(trigram)
+            if docs is None:
+                docs = self.trigrams[trigram] = self.family.IF.TreeSet()
+            docs.insert(doc_id)
+
+    def _removeTrigrams(self, doc_id, value):
+        for trigram in self._trigrams(value):
+            docs = self.trigrams.get(trigram)
+            if docs is None:
+                continue
+            if doc_id in docs:
+                docs.remove(doc_id)
+            if not docs:
+                del self.trigrams[trigram]
+
+    def index_doc(self, doc_id, value):
+        old = self.documents_to_values.get(doc_id)
+        super(SubstringIndex, self).index_doc(doc_id, value)
+        new = self.documents_to_values.get(doc_id)
+        if old == new:
+            return
+        if old is not None:
+            self._removeTrigrams(doc_id, old)
+        if new is not None:
+            self._addTrigrams(doc_id, new)
+
+    def unindex_doc(self, doc_id):
+        old = self.documents_to_values.get(doc_id)
+        super(SubstringIndex, self).unindex_doc(doc_id)
+        if old is not None:
+            self._removeTrigrams(doc_id, old)
+
+    def search(self, text):
+        IF = self.family.IF
+        text = normalizeSearchText(text)
+        if not text:
+            return IF.TreeSet(self.documents_to_values.keys())
+        if len(text) < 3:
+            return IF.multiunion(
+                list(self.trigrams.values(text, text + u'\uffff')))
+        candidates = None
+        for n in range(len(text) - 2):
+            docs = self.trigrams.get(text[n:n+3])
+            if docs is None:
+                return IF.TreeSet()
+            candidates = IF.intersection(candidates, docs)
+        values = self.documents_to_values
+        return IF.TreeSet([doc_id for doc_id in candidates
+                           if text in normalizeSearchText(values[doc_id])])
+
+    def apply(self, query):
+        if len(query) == 1 and 'substring' in query:
+            return self.search(query['substring'])
+        return super(SubstringIndex, self).apply(query)
+
+
+class IConvertingSubstringIndex(ISubstringIndex, ICatalogIndex):
+    """Substring index of values created by external converter."""
+
+
+class ConvertingSubstringIndex(ConvertingIndexMixin, SubstringIndex,
+                               Contained):
+    implements(IConvertingSubstringIndex)
+
+
+class IAttributeSubstringIndex(ISubstringIndex, ICatalogIndex):
+    """Substring index of an attribute."""
+
+
+class AttributeSubstringIndex(AttributeIndex, SubstringIndex, Contained):
+    implements(IAttributeSubstringIndex)
+
+
 class IndexedFilterWidget(FilterWidget):
 
     search_index = 'title'
@@ -100,15 +214,23 @@ class IndexedFilterWidget(FilterWidget):
     def catalog(self):
         return ICatalog(self.source)
 
+    def searchIndex(self, index, searchstr, items):
+        """Return items whose value in the index contains searchstr."""
+        if ISubstringIndex.providedBy(index):
+            matching = index.search(searchstr)
+            return [item for item in items if item['id'] in matching]
+        searchstr = searchstr.lower()
+        results = []
+        for item in items:
+            title = index.documents_to_values[item['id']]
+            if searchstr in title.lower():
+                results.append(item)
+        return results
+
     def filter(self, items):
         index = self.catalog[self.search_index]
         if 'SEARCH' in self.request and 'CLEAR_SEARCH' not in self.request:
-            searchstr = self.request['SEARCH'].lower()
-            results = []
-            for item in items:
-                title = index.documents_to_values[item['id']]
-                if searchstr in title.lower():
-                    results.append(item)
+            results = self.searchIndex(index, self.request['SEARCH'], items)
         else:
             self.request.form['SEARCH'] = ''
             results = items
@@ -294,8 +294,13 @@ class MultiStateColumn(zc.table.column.Column):
 class IndexedGetterColumn(zc.table.column.GetterColumn):
     implements(IIndexedColumn, zc.table.interfaces.ISortableColumn)
 
+    # Set if the index holds the values of the getter, so that printed
+    # tables need not load the objects.
+    value_from_index = False
+
     def __init__(self, **kwargs):
         self.index = kwargs.pop('index')
+        self.value_from_index = kwargs.pop('value_from_index', False)
         super(IndexedGetterColumn, self).__init__(**kwargs)
 
     def _sort(self, items, formatter, start, stop, sorters, multiplier):
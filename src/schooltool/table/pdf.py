@@ -61,6 +61,11 @@ class FlatRMLTable(flourish.content.ContentProvider):
     formatter = None
 
     template = flourish.templates.XMLFile('rml/table.pt')
+    block_template = flourish.templates.XMLFile('rml/table_block.pt')
+
+    # Rows are rendered in blocks of this size, so that only one block
+    # of rendered cells is kept in memory.
+    block_size = 500
 
     def __init__(self, context, request, schooltool_formatter, table):
         flourish.content.ContentProvider.__init__(
@@ -139,6 +144,25 @@ class FlatRMLTable(flourish.content.ContentProvider):
                    for column in rml_columns]]
         return result
 
+    def iterRows(self, items, rml_columns):
+        for item in items:
+            yield [column.renderCell(item, self.formatter)
+                   for column in rml_columns]
+
+    def iterTables(self, items, rml_columns):
+        rows = []
+        for row in self.iterRows(items, rml_columns):
+            rows.append(row)
+            if len(rows) >= self.block_size:
+                yield {'rows': rows}
+                rows = []
+        if rows:
+            yield {'rows': rows}
+
+    def renderBlocks(self, tables, col_widths):
+        for table in tables:
+            yield self.block_template(table=table, col_widths=col_widths)
+
     def render(self):
         columns = self.getColumns()
         rml_columns = self.getRMLColumns(columns)
@@ -150,14 +174,11 @@ class FlatRMLTable(flourish.content.ContentProvider):
 
         widths_string = self.getColumnWidths(rml_columns)
         headers = self.getHeaders(rml_columns)
-        tables = [
-            {'rows': [[column.renderCell(item, self.formatter)
-                       for column in rml_columns]
-                      for item in items]
-             }]
+        blocks = self.renderBlocks(self.iterTables(items, rml_columns),
+                                   widths_string)
 
         rml = self.template(
-            headers=headers, content=tables,
+            headers=headers, blocks=blocks,
             col_widths=widths_string)
         return rml
 
@@ -173,43 +194,27 @@ class RMLTable(FlatRMLTable):
                        if column.name != group_by_column]
         return columns
 
-    def render(self):
-        columns = self.getColumns()
-        rml_columns = self.getRMLColumns(columns)
-
-        if not rml_columns:
-            return ''
-
-        items = self.getItems()
-
-        widths_string = self.getColumnWidths(rml_columns)
-        headers = self.getHeaders(rml_columns)
-        tables = []
+    def iterTables(self, items, rml_columns):
         rows = []
         current_group = None
         for item in items:
             group = minimal_escape_rml(self.formatter.getSubGroup(item))
-            if group != current_group:
+            if group != current_group or len(rows) >= self.block_size:
                 if rows:
-                    tables.append({
+                    yield {
                         'headers': current_group and [[current_group]] or [],
                         'rows': rows,
-                        })
+                        }
                 current_group = group
                 rows = []
             rows.append([column.renderCell(item, self.formatter)
                          for column in rml_columns])
 
         if rows:
-            tables.append({
-                    'headers': current_group and [[current_group]] or [],
-                    'rows': rows,
-                    })
-
-        rml = self.template(
-            headers=headers, content=tables,
-            col_widths=widths_string)
-        return rml
+            yield {
+                'headers': current_group and [[current_group]] or [],
+                'rows': rows,
+                }
 
 
 class IndexedRMLTable(RMLTable):
@@ -310,6 +315,10 @@ class RMLDateColumn(RMLColumn):
 class RMLIndexedColumn(RMLGetterColumn):
 
     def renderCell(self, indexed_item, formatter):
+        if getattr(self.column, 'value_from_index', False):
+            index = indexed_item['catalog'][self.column.index]
+            value = index.documents_to_values.get(indexed_item['id'])
+            return self.escape(value)
         item = unindex(indexed_item)
         cell = super(RMLIndexedColumn, self).renderCell(item, formatter)
         return cell
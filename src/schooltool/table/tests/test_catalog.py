@@ -113,6 +113,88 @@ def doctest_IndexedFilterWidget():
         >>> request.form['SEARCH']
         ''
 
+    Substring indexes are searched instead of scanning the values.
+
+        >>> from schooltool.table.catalog import SubstringIndex
+        >>> index = catalog['title'] = SubstringIndex()
+        >>> index.index_doc(5, 'Lambda')
+        >>> index.index_doc(6, 'Alpha')
+        >>> index.index_doc(7, 'Beta')
+
+        >>> request.form = {'SEARCH': 'TA'}
+        >>> widget.filter(items)
+        [{'id': 7}]
+        >>> request.form = {'SEARCH': 'a'}
+        >>> widget.filter(items)
+        [{'id': 5}, {'id': 6}, {'id': 7}]
+
+    """
+
+
+def doctest_SubstringIndex():
+    """Tests for SubstringIndex.
+
+        >>> from schooltool.table.catalog import SubstringIndex
+        >>> index = SubstringIndex()
+
+        >>> index.index_doc(1, u'Peter Johnson')
+        >>> index.index_doc(2, 'Johnny Cash')
+        >>> index.index_doc(3, u'Al')
+
+    Search is case insensitive and finds documents containing the text
+    anywhere in their value.
+
+        >>> list(index.search('john'))
+        [1, 2]
+        >>> list(index.search('NSON'))
+        [1]
+        >>> list(index.search('ter jo'))
+        [1]
+        >>> list(index.search('johnsonn'))
+        []
+
+    Queries shorter than a trigram work too, also at the end of a value.
+
+        >>> list(index.search('j'))
+        [1, 2]
+        >>> list(index.search('al'))
+        [3]
+        >>> list(index.search('h'))
+        [1, 2]
+
+    Trigrams present in a value do not guarantee a match.
+
+        >>> index.index_doc(4, u'abcd bcde')
+        >>> list(index.search('abcde'))
+        []
+
+    Empty search finds everything.
+
+        >>> list(index.search(''))
+        [1, 2, 3, 4]
+
+    The index can be queried like other catalog indexes.
+
+        >>> list(index.apply({'substring': 'cash'}))
+        [2]
+        >>> list(index.apply({'any_of': [u'Al']}))
+        [3]
+
+    Reindexing and unindexing updates the trigrams.
+
+        >>> index.index_doc(3, u'Alice')
+        >>> list(index.search('lic'))
+        [3]
+        >>> index.unindex_doc(1)
+        >>> list(index.search('john'))
+        [2]
+        >>> sorted(index.trigrams.keys())[:3]
+        [u' bc', u' ca', u'abc']
+
+        >>> index.clear()
+        >>> list(index.search('j'))
+        []
+
     """
 
 
@@ -24,6 +24,7 @@ from pprint import pprint
 from schooltool.app.browser.testing import setUp, tearDown
 from schooltool.table.pdf import GridCell, Grid
 from schooltool.table.pdf import makeCoordinateBlocks
+from schooltool.table.pdf import FlatRMLTable, RMLTable, RMLIndexedColumn
 
 
 def print_blocks(blocks):
@@ -164,6 +165,56 @@ def doctest_Grid_getStyleDirectives():
     """
 
 
+def doctest_RMLTable_iterTables():
+    """Rows are rendered in blocks of at most block_size rows.
+
+        >>> class ColumnStub(object):
+        ...     def renderCell(self, item, formatter):
+        ...         return item[1]
+
+        >>> class FormatterStub(object):
+        ...     def getSubGroup(self, item):
+        ...         return item[0]
+
+        >>> items = [('A', '1'), ('A', '2'), ('A', '3'), ('B', '4')]
+
+        >>> table = FlatRMLTable(None, None, None, None)
+        >>> table.formatter = FormatterStub()
+        >>> table.block_size = 2
+        >>> pprint(list(table.iterTables(iter(items), [ColumnStub()])))
+        [{'rows': [['1'], ['2']]}, {'rows': [['3'], ['4']]}]
+
+    Blocks of grouped tables repeat the group header.
+
+        >>> table = RMLTable(None, None, None, None)
+        >>> table.formatter = FormatterStub()
+        >>> table.block_size = 2
+        >>> pprint(list(table.iterTables(iter(items), [ColumnStub()])))
+        [{'headers': [['A']], 'rows': [['1'], ['2']]},
+         {'headers': [['A']], 'rows': [['3']]},
+         {'headers': [['B']], 'rows': [['4']]}]
+
+    """
+
+
+def doctest_RMLIndexedColumn_value_from_index():
+    """Cells of some indexed columns are rendered from index values.
+
+        >>> class IndexStub(object):
+        ...     documents_to_values = {1: u'Jonas & Co'}
+
+        >>> class ColumnStub(object):
+        ...     index = 'title'
+        ...     value_from_index = True
+
+        >>> column = RMLIndexedColumn(None, None, None, ColumnStub())
+        >>> column.renderCell({'id': 1, 'catalog': {'title': IndexStub()}},
+        ...                   None)
+        u'Jonas &amp; Co'
+
+    """
+
+
 def test_suite():
     optionflags = (doctest.ELLIPSIS | doctest.REPORT_NDIFF |
                    doctest.NORMALIZE_WHITESPACE)
@@ -45,6 +45,7 @@ SCHOOLTOOL_CONFIG_NAMESPACES = {
     "SCHOOLTOOL": {
         "CONFIG": celery.app.defaults.Option('schooltool.conf', type="string"),
         "RETRY_DB_CONFLICTS": celery.app.defaults.Option(3, type="int"),
+        "EXPORT_PROCESSES": celery.app.defaults.Option(1, type="int"),
         }
     }
 celery.app.defaults.NAMESPACES.update(SCHOOLTOOL_CONFIG_NAMESPACES)
@@ -175,6 +176,27 @@ def open_schooltool_db():
     return ACTIVE_MACHINERY.db
 
 
+def reopen_schooltool_db():
+    """Open the database anew in a process forked from a worker.
+
+    Storage connections inherited from the parent process must not be
+    shared with it.
+    """
+    global ACTIVE_MACHINERY
+    if ACTIVE_MACHINERY is None:
+        return None
+    ACTIVE_MACHINERY.db = None
+    return open_schooltool_db()
+
+
+def schooltool_worker_option(name, default=None):
+    """Return a setting of the worker SchoolTool runs in."""
+    global ACTIVE_MACHINERY
+    if ACTIVE_MACHINERY is None:
+        return default
+    return getattr(ACTIVE_MACHINERY.app.conf, name, default)
+
+
 def close_schooltool_db():
     global ACTIVE_MACHINERY
     if ACTIVE_MACHINERY is None:
@@ -65,3 +65,5 @@ CELERY_ACCEPT_CONTENT = ['json', 'pickle']
 
 SCHOOLTOOL_CONFIG = os.environ.get('SCHOOLTOOL_CONF')
 SCHOOLTOOL_RETRY_DB_CONFLICTS = 3
+# Maximum number of emails sent per second, None for no limit
+SCHOOLTOOL_EMAIL_RATE = None
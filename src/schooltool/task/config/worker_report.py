@@ -2,3 +2,6 @@ from schooltool.task.config.worker_default import *
 
 CELERYD_POOL = 'processes'
 CELERYD_CONCURRENCY = 1 # use a single worker
+
+# Export sheets of school data in this many processes at the same time
+SCHOOLTOOL_EXPORT_PROCESSES = 1
@@ -48,6 +48,16 @@ class ITerm(IDateRange, IContained):
         Raises a ValueError if the date is outside of the term covered.
         """
 
+    def countSchooldays(first=None, last=None):
+        """Return the number of schooldays from first to last, inclusive.
+
+        Only days of the term are counted.  The count is looked up in a
+        cached index, so it takes the same time for any range.
+        """
+
+    def iterSchooldays(first=None, last=None):
+        """Iterate schooldays of the term from first to last, inclusive."""
+
 
 class ITermWrite(Interface):
     """A term is a set of school days inside a given date range.
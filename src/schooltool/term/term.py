@@ -18,9 +18,10 @@
 """
 Term implementation
 """
+import array
 import persistent
 import pytz
-from datetime import datetime
+from datetime import datetime, timedelta
 
 import zope.interface
 from zope.event import notify
@@ -43,6 +44,7 @@ from schooltool.app.interfaces import IApplicationPreferences
 from schooltool.app.interfaces import ISchoolToolApplication
 from schooltool.common import IDateRange
 from schooltool.common import DateRange
+from schooltool.common import getRequestFromInteraction
 
 from schooltool.term.interfaces import TermDateNotInSchoolYear
 from schooltool.term import interfaces
@@ -75,11 +77,21 @@ class EmergencyDayEvent(object):
 class Term(DateRange, contained.Contained, persistent.Persistent):
     zope.interface.implements(interfaces.ITerm, interfaces.ITermWrite)
 
+    # Schooldays are bits in a string, the lowest bit of the first byte
+    # standing for _schoolday_origin.  The origin may be before the first
+    # day of the term.
+    _schoolday_origin = None
+    _schoolday_bits = ''
+
+    # Number of schooldays before each day of the term, rebuilt on demand
+    _v_schoolday_counts = None
+
     def __init__(self, title, first, last):
         self.title = title
         self._first = first
         self._last = last
-        self._schooldays = set()
+        self._schoolday_origin = first
+        self._schoolday_bits = ''
         if last < first:
             raise ValueError("Last date %r less than first date %r" %
                              (last, first))
@@ -98,7 +110,9 @@ class Term(DateRange, contained.Contained, persistent.Persistent):
                              (self._last, new_first_date))
 
         notify(TermBeforeChangeEvent(self, old_dates, new_dates))
+        self._moveSchooldayOrigin(new_first_date)
         self._first = new_first_date
+        self._v_schoolday_counts = None
         notify(TermAfterChangeEvent(self, old_dates, new_dates))
 
     @property
@@ -116,6 +130,7 @@ class Term(DateRange, contained.Contained, persistent.Persistent):
 
         notify(TermBeforeChangeEvent(self, old_dates, new_dates))
         self._last = new_last_date
+        self._v_schoolday_counts = None
         notify(TermAfterChangeEvent(self, old_dates, new_dates))
 
     def _validate(self, date):
@@ -123,39 +138,119 @@ class Term(DateRange, contained.Contained, persistent.Persistent):
             raise ValueError("Date %r not in term [%r, %r]" %
                              (date, self.first, self.last))
 
+    def _moveSchooldayOrigin(self, date):
+        """Make the schoolday bitmap start on or before `date`."""
+        days = (self._schoolday_origin - date).days
+        if days <= 0:
+            return
+        padding = (days + 7) // 8
+        self._schoolday_origin -= timedelta(padding * 8)
+        if self._schoolday_bits:
+            self._schoolday_bits = '\0' * padding + self._schoolday_bits
+
+    def _offset(self, date):
+        return (date - self._schoolday_origin).days
+
+    def _isSchooldayOffset(self, offset):
+        byte = offset >> 3
+        if byte >= len(self._schoolday_bits):
+            return False
+        return bool(ord(self._schoolday_bits[byte]) & (1 << (offset & 7)))
+
+    def _changeSchooldays(self, offsets, value):
+        """Set, clear or (if `value` is None) toggle schoolday bits."""
+        bits = bytearray(self._schoolday_bits)
+        for offset in offsets:
+            byte, mask = offset >> 3, 1 << (offset & 7)
+            if byte >= len(bits):
+                if value is False:
+                    continue
+                bits.extend('\0' * (byte - len(bits) + 1))
+            if value is None:
+                bits[byte] ^= mask
+            elif value:
+                bits[byte] |= mask
+            else:
+                bits[byte] &= ~mask & 0xff
+        self._schoolday_bits = str(bits).rstrip('\0')
+        self._v_schoolday_counts = None
+
+    def _weekdayOffsets(self, weekdays):
+        start = self._offset(self._first)
+        end = self._offset(self._last)
+        first_weekday = self._first.weekday()
+        offsets = []
+        for weekday in set(weekdays):
+            offsets.extend(range(start + (weekday - first_weekday) % 7,
+                                 end + 1, 7))
+        return offsets
+
     def isSchoolday(self, date):
         self._validate(date)
-        if date in self._schooldays:
-            return True
-        return False
+        return self._isSchooldayOffset(self._offset(date))
 
     def add(self, date):
         self._validate(date)
-        self._schooldays.add(date)
-        self._schooldays = self._schooldays  # persistence
+        self._changeSchooldays([self._offset(date)], True)
 
     def remove(self, date):
         self._validate(date)
-        self._schooldays.remove(date)
-        self._schooldays = self._schooldays  # persistence
+        offset = self._offset(date)
+        if not self._isSchooldayOffset(offset):
+            raise KeyError(date)
+        self._changeSchooldays([offset], False)
+
+    def _getSchooldayCounts(self):
+        counts = self._v_schoolday_counts
+        if counts is None:
+            counts = array.array('l', [0])
+            n = 0
+            for offset in range(self._offset(self._first),
+                                self._offset(self._last) + 1):
+                if self._isSchooldayOffset(offset):
+                    n += 1
+                counts.append(n)
+            self._v_schoolday_counts = counts
+        return counts
+
+    def countSchooldays(self, first=None, last=None):
+        counts = self._getSchooldayCounts()
+        start, end = 0, len(counts) - 1
+        if first is not None:
+            start = max((first - self._first).days, start)
+        if last is not None:
+            end = min((last - self._first).days + 1, end)
+        if end <= start:
+            return 0
+        return counts[end] - counts[start]
+
+    def iterSchooldays(self, first=None, last=None):
+        if first is None or first < self._first:
+            first = self._first
+        if last is None or last > self._last:
+            last = self._last
+        bits = self._schoolday_bits
+        offset = self._offset(first)
+        end = self._offset(last)
+        while offset <= end:
+            byte = offset >> 3
+            if byte >= len(bits):
+                break
+            if bits[byte] == '\0':
+                offset = (byte + 1) << 3
+                continue
+            if ord(bits[byte]) & (1 << (offset & 7)):
+                yield self._schoolday_origin + timedelta(offset)
+            offset += 1
 
     def addWeekdays(self, *weekdays):
-        for date in self:
-            if date.weekday() in weekdays:
-                self.add(date)
+        self._changeSchooldays(self._weekdayOffsets(weekdays), True)
 
     def removeWeekdays(self, *weekdays):
-        for date in self:
-            if date.weekday() in weekdays and self.isSchoolday(date):
-                self.remove(date)
+        self._changeSchooldays(self._weekdayOffsets(weekdays), False)
 
     def toggleWeekdays(self, *weekdays):
-        for date in self:
-            if date.weekday() in weekdays:
-                if self.isSchoolday(date):
-                    self.remove(date)
-                else:
-                    self.add(date)
+        self._changeSchooldays(self._weekdayOffsets(weekdays), None)
 
     def reset(self, first, last):
         if last < first:
@@ -164,19 +259,33 @@ class Term(DateRange, contained.Contained, persistent.Persistent):
                              (last, first))
         self.first = first
         self.last = last
-        self._schooldays.clear()
+        self._schoolday_origin = first
+        self._schoolday_bits = ''
+        self._v_schoolday_counts = None
 
 
 class TermContainer(btree.BTreeContainer):
     """BBB: only there for backwards compatibility."""
 
 
+def getDateIndex(terms):
+    """Return the date index of the school years if `terms` is one."""
+    schoolyears = getattr(terms, '__parent__', None)
+    if (ISchoolYear.providedBy(terms) and
+        ISchoolYearContainer.providedBy(schoolyears)):
+        return schoolyears.getDateIndex()
+    return None
+
+
 def getTermForDate(date):
     """Find the term that contains `date`.
 
     Returns None if `date` falls outside all terms.
     """
     terms = interfaces.ITermContainer(date, {})
+    index = getDateIndex(terms)
+    if index is not None:
+        return index.getTerm(terms, date)
     for term in terms.values():
         if date in term:
             return term
@@ -194,6 +303,9 @@ def getNextTermForDate(date):
     Returns None if there are no terms.
     """
     terms = interfaces.ITermContainer(date, {})
+    index = getDateIndex(terms)
+    if index is not None:
+        return index.getNextTerm(terms, date)
     before, after = [], []
     for term in terms.values():
         if date in term:
@@ -241,19 +353,39 @@ def getNextTerm(term):
     return None
 
 
+DATE_MANAGER_CACHE_KEY = 'schooltool.term.DateManagerUtility'
+
+
 class DateManagerUtility(object):
     zope.interface.implements(interfaces.IDateManager)
 
+    def getRequestCache(self):
+        """Values remembered for the duration of the current request."""
+        request = getRequestFromInteraction()
+        if request is None:
+            return {}
+        return request.annotations.setdefault(DATE_MANAGER_CACHE_KEY, {})
+
     @property
     def today(self):
-        app = ISchoolToolApplication(None)
-        tzinfo = pytz.timezone(IApplicationPreferences(app).timezone)
-        dt = pytz.utc.localize(datetime.utcnow())
-        return dt.astimezone(tzinfo).date()
+        cache = self.getRequestCache()
+        if 'today' not in cache:
+            app = ISchoolToolApplication(None)
+            tzinfo = pytz.timezone(IApplicationPreferences(app).timezone)
+            dt = pytz.utc.localize(datetime.utcnow())
+            cache['today'] = dt.astimezone(tzinfo).date()
+        return cache['today']
 
     @property
     def current_term(self):
-        return getNextTermForDate(self.today)
+        cache = self.getRequestCache()
+        today = self.today
+        terms = interfaces.ITermContainer(today, {})
+        key = (today, getDateIndex(terms))
+        if key[1] is None or cache.get('current_term_key') != key:
+            cache['current_term_key'] = key
+            cache['current_term'] = getNextTermForDate(today)
+        return cache['current_term']
 
 
 class TodayDescriptor(object):
@@ -326,6 +458,16 @@ class TermOverlapValidationSubscriber(EventAdapterSubscriber):
             validateTermsForOverlap(sy, dr, self.event.term)
 
 
+class TermDateIndexSubscriber(EventAdapterSubscriber):
+    adapts(TermAfterChangeEvent)
+    implements(ISubscriber)
+
+    def __call__(self):
+        schoolyear = self.event.term.__parent__
+        if ISchoolYear.providedBy(schoolyear):
+            schoolyear.invalidateDateIndex()
+
+
 class TermOverflowValidationSubscriber(EventAdapterSubscriber):
     adapts(TermBeforeChangeEvent)
     implements(ISubscriber)
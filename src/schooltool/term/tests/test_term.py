@@ -141,6 +141,44 @@ class TestTerm(unittest.TestCase):
             self.assert_(not cal.isSchoolday(date(2003, 9, day+1)))
             self.assert_(cal.isSchoolday(date(2003, 9, day+2)))
 
+    def testCountSchooldays(self):
+        cal = term.Term('Sample', date(2003, 9, 1), date(2003, 9, 30))
+        self.assertEqual(cal.countSchooldays(), 0)
+        cal.addWeekdays(calendar.MONDAY, calendar.TUESDAY)
+        self.assertEqual(cal.countSchooldays(), 10)
+        self.assertEqual(cal.countSchooldays(date(2003, 9, 2)), 9)
+        self.assertEqual(cal.countSchooldays(date(2003, 9, 2),
+                                             date(2003, 9, 15)), 4)
+        self.assertEqual(cal.countSchooldays(date(2003, 8, 1),
+                                             date(2003, 9, 1)), 1)
+        self.assertEqual(cal.countSchooldays(date(2003, 9, 3),
+                                             date(2003, 9, 7)), 0)
+        self.assertEqual(cal.countSchooldays(date(2003, 10, 1)), 0)
+        self.assertEqual(cal.countSchooldays(None, date(2003, 8, 31)), 0)
+
+        # Counts follow changes to the schooldays and to the dates
+        cal.remove(date(2003, 9, 8))
+        self.assertEqual(cal.countSchooldays(), 9)
+        cal.add(date(2003, 9, 10))
+        self.assertEqual(cal.countSchooldays(None, date(2003, 9, 10)), 4)
+        cal.first = date(2003, 9, 9)
+        self.assertEqual(cal.countSchooldays(), 8)
+        cal.reset(date(2003, 9, 1), date(2003, 9, 30))
+        self.assertEqual(cal.countSchooldays(), 0)
+
+    def testIterSchooldays(self):
+        cal = term.Term('Sample', date(2003, 9, 1), date(2003, 12, 31))
+        cal.addWeekdays(calendar.MONDAY, calendar.FRIDAY)
+        cal.remove(date(2003, 9, 5))
+        self.assertEqual(list(cal.iterSchooldays(date(2003, 9, 1),
+                                                 date(2003, 9, 15))),
+                         [date(2003, 9, 1), date(2003, 9, 8),
+                          date(2003, 9, 12), date(2003, 9, 15)])
+        self.assertEqual(len(list(cal.iterSchooldays())), 34)
+        self.assertEqual(list(cal.iterSchooldays(date(2004, 1, 1))), [])
+        # One bit per day
+        self.assertEqual(len(cal._schoolday_bits), 15)
+
     def test_contains(self):
         cal = term.Term('Sample', date(2003, 9, 1), date(2003, 9, 16))
         self.assert_(date(2003, 8, 31) not in cal)
@@ -239,6 +277,23 @@ def doctest_DateManagerUtility_today():
         >>> dm.today == today_date
         True
 
+    During a request, today is computed once.
+
+        >>> from zope.publisher.browser import TestRequest
+        >>> from zope.security.management import newInteraction
+        >>> from zope.security.management import endInteraction
+        >>> request = TestRequest()
+        >>> newInteraction(request)
+
+        >>> today = dm.today
+        >>> tz_name = 'Pacific/Midway'
+        >>> dm.today is today
+        True
+        >>> request.annotations['schooltool.term.DateManagerUtility']
+        {'today': datetime.date(...)}
+
+        >>> endInteraction()
+
     """
 
 
@@ -31,7 +31,6 @@ from zope.intid.interfaces import IIntIds
 from schooltool.app.app import InitBase, StartUpBase
 from schooltool.app.interfaces import ISchoolToolApplication
 from schooltool.app.interfaces import IApplicationPreferences
-from schooltool.common import DateRange
 from schooltool.course.section import InstructorsCrowd, LearnersCrowd
 from schooltool.course.parent import ParentsOfLearnersCrowd
 from schooltool.course.interfaces import ISection
@@ -142,6 +141,10 @@ class UpdateSelectedPeriodsSchedules(ObjectEventAdapterSubscriber):
 
     def __call__(self):
         app = ISchoolToolApplication(None)
+        modifications = [
+            description
+            for description in self.event.descriptions
+            if interfaces.IScheduleModification.providedBy(description)]
         # XXX: extremely nasty loop through all schedules.
         schedule_containers = app[SCHEDULES_KEY]
         for container in schedule_containers.values():
@@ -151,7 +154,7 @@ class UpdateSelectedPeriodsSchedules(ObjectEventAdapterSubscriber):
                     sameProxiedObjects(schedule.timetable, self.object)):
                     notify_container = True
             if notify_container:
-                zope.lifecycleevent.modified(container)
+                zope.lifecycleevent.modified(container, *modifications)
 
 
 class RemoveRelatedSelectedPeriodsSchedules(ObjectEventAdapterSubscriber):
@@ -189,14 +192,30 @@ class SchooldaysForSchedule(object):
 
     def __iter__(self):
         schedule = self.schedule
-        dates = DateRange(schedule.first, schedule.last)
-        return self.iterDates(dates)
+        terms = sorted(self.schoolyear.values(), key=lambda term: term.first)
+        for term in terms:
+            for date in term.iterSchooldays(schedule.first, schedule.last):
+                yield date
 
     def iterDates(self, dates):
+        terms = list(self.schoolyear.values())
+        term = None
         for date in dates:
-            if date in self:
+            if term is None or date not in term:
+                for term in terms:
+                    if date in term:
+                        break
+                else:
+                    term = None
+                    continue
+            if term.isSchoolday(date):
                 yield date
 
+    def countDates(self, first, last):
+        return sum([term.countSchooldays(first, last)
+                    for term in self.schoolyear.values()
+                    if term.first <= last and first <= term.last])
+
 
 class SchooldaysForTimetable(SchooldaysForSchedule):
     adapts(interfaces.ITimetable)
@@ -45,6 +45,7 @@ from schooltool.skin import flourish
 from schooltool.term.interfaces import ITerm
 from schooltool.term.term import getTermForDate
 from schooltool.timetable.schedule import MeetingException
+from schooltool.timetable.schedule import ScheduleModification
 from schooltool.timetable.interfaces import IHaveSchedule
 
 from schooltool.common import SchoolToolMessage as _
@@ -197,10 +198,11 @@ class SpecialDayView(BrowserView):
                 dtstart, duration,
                 period=meeting.period,
                 meeting_id=meeting.meeting_id))
-        # XXX: broken permissions with PersistentDict
+        # XXX: broken permissions with OOBTree
         exceptions = removeSecurityProxy(self.schedule.exceptions)
         exceptions[self.date] = template
-        zope.lifecycleevent.modified(self.schedule)
+        zope.lifecycleevent.modified(
+            self.schedule, ScheduleModification(self.date))
 
     def update(self):
         """Read and validate form data, and update model if necessary.
@@ -689,27 +689,36 @@ class SelectedPeriodsScheduleEditView(form.EditForm):
             self.status = self.formErrorsMessage
             return
         changes = self.applyChanges(data)
+        toggled = self.updatePeriods(self.context)
+        self.status = self.successMessage
+        self.scheduleModified(self.context, changes, toggled)
+        self.redirectToParent()
 
-        schedule_changed = bool(changes)
-
-        timetable = self.context.timetable
+    def updatePeriods(self, schedule):
+        """Add and remove selected periods, return the toggled periods."""
+        toggled = []
+        timetable = schedule.timetable
         for day in timetable.periods.templates.values():
             for period in day.values():
                 key = self.getPeriodKey(day, period)
                 selected = bool(self.request.get(key))
-                scheduled = self.context.hasPeriod(period)
+                scheduled = schedule.hasPeriod(period)
                 if selected and not scheduled:
-                    self.context.addPeriod(period)
-                    schedule_changed = True
+                    schedule.addPeriod(period)
+                    toggled.append(removeSecurityProxy(period))
                 elif not selected and scheduled:
-                    self.context.removePeriod(period)
-                    schedule_changed = True
-
-        self.status = self.successMessage
+                    schedule.removePeriod(period)
+                    toggled.append(removeSecurityProxy(period))
+        return toggled
 
-        if schedule_changed:
-            zope.lifecycleevent.modified(self.context)
-        self.redirectToParent()
+    def scheduleModified(self, schedule, changes, toggled):
+        if changes:
+            zope.lifecycleevent.modified(schedule)
+        elif toggled:
+            # Only meetings of toggled periods need to be synchronised.
+            modifications = removeSecurityProxy(
+                schedule).periodModifications(toggled)
+            zope.lifecycleevent.modified(schedule, *modifications)
 
     @button.buttonAndHandler(_("Cancel"), name='cancel')
     def handle_cancel_action(self, action):
@@ -759,20 +768,8 @@ class FlourishSelectedPeriodsMultiScheduleEditView(flourish.page.WideContainerPa
             zope.event.notify(
                 zope.lifecycleevent.ObjectModifiedEvent(schedule, *descriptions))
 
-        schedule_changed = bool(changes)
-        timetable = schedule.timetable
-        for day in timetable.periods.templates.values():
-            for period in day.values():
-                key = self.getPeriodKey(day, period)
-                selected = bool(self.request.get(key))
-                scheduled = schedule.hasPeriod(period)
-                if selected and not scheduled:
-                    schedule.addPeriod(period)
-                    schedule_changed = True
-                elif not selected and scheduled:
-                    schedule.removePeriod(period)
-                    schedule_changed = True
-        return schedule_changed
+        toggled = self.updatePeriods(schedule)
+        self.scheduleModified(schedule, changes, toggled)
 
     @property
     def other_params(self):
@@ -826,14 +823,9 @@ class FlourishSelectedPeriodsMultiScheduleEditView(flourish.page.WideContainerPa
         if errors:
             self.status = self.formErrorsMessage
             return
-        changed = self.applyChangesToSchedule(self.getContent(), data)
-        if changed:
-            zope.lifecycleevent.modified(self.getContent())
-
+        self.applyChangesToSchedule(self.getContent(), data)
         for schedule in self.other_schedules:
-            changed = self.applyChangesToSchedule(schedule, data)
-            if changed:
-                zope.lifecycleevent.modified(schedule)
+            self.applyChangesToSchedule(schedule, data)
 
         self.status = self.successMessage
 
@@ -18,16 +18,19 @@
 """
 Synchronisation between timetables and calendars.
 """
+import datetime
 import pytz
 
 import zope.lifecycleevent.interfaces
 from zope.annotation.interfaces import IAnnotations
+from zope.cachedescriptors.property import Lazy
 from zope.component import adapts, adapter, getUtility
 from zope.interface import implements
 from zope.intid.interfaces import IIntIds
 from zope.security.proxy import removeSecurityProxy
 
 from schooltool.timetable import interfaces
+from schooltool.timetable.schedule import date_timespan
 from schooltool.app.cal import CalendarEvent, Calendar
 from schooltool.calendar.simple import ImmutableCalendar
 from schooltool.schoolyear.subscriber import ObjectEventAdapterSubscriber
@@ -65,7 +68,8 @@ class UpdateEventTitles(ObjectEventAdapterSubscriber):
         if calendar is None:
             return
         for event in calendar:
-            if (interfaces.IScheduleCalendarEvent.providedBy(event)):
+            if (interfaces.IScheduleCalendarEvent.providedBy(event) and
+                event.title != title):
                 event.title = title
 
 
@@ -77,8 +81,26 @@ class ImmutableScheduleCalendar(ImmutableCalendar):
 
     def __init__(self, schedule):
         self.schedule = schedule
-        events = tuple(self.createEvents())
-        super(ImmutableScheduleCalendar, self).__init__(events=events)
+
+    @Lazy
+    def _events(self):
+        return tuple(self.createEvents())
+
+    def expand(self, first, last):
+        """Expand only the meetings scheduled between first and last."""
+        schedule = self.schedule
+        if (schedule.first is None or
+            schedule.last is None):
+            return
+        # Meeting dates are in schedule timezone, so look a day around.
+        day = datetime.timedelta(days=1)
+        first_date = max(first.date() - day, schedule.first)
+        last_date = min(last.date() + day, schedule.last)
+        if first_date > last_date:
+            return
+        for event in self.createEvents(first_date, last_date):
+            for recurrence in event.expand(first, last):
+                yield recurrence
 
     def makeGUID(self, date, period, int_ids=None):
         if int_ids is None:
@@ -89,7 +111,7 @@ class ImmutableScheduleCalendar(ImmutableCalendar):
             int_ids.getId(period),
             )
 
-    def createEvents(self):
+    def createEvents(self, first=None, last=None):
         int_ids = getUtility(IIntIds)
         owner = interfaces.IHaveSchedule(self.schedule)
         title = getattr(owner, 'title', u'')
@@ -99,7 +121,11 @@ class ImmutableScheduleCalendar(ImmutableCalendar):
             schedule.last is None):
             return # Empty schedule
 
-        meetings = schedule.iterMeetings(schedule.first, schedule.last)
+        if first is None:
+            first = schedule.first
+        if last is None:
+            last = schedule.last
+        meetings = schedule.iterMeetings(first, last)
 
         for meeting in meetings:
             # We need to convert dtstart to UTC, because calendar
@@ -136,18 +162,57 @@ class ScheduleCalendar(Calendar):
                 changed = True
         return changed
 
-    def updateSchedule(self, schedule):
+    def iterScheduleEvents(self, schedule, first, last, period=None):
+        """Iterate events of a schedule on given dates (in schedule timezone).
+
+        Only events starting on those dates are loaded.
+        """
+        tz = pytz.timezone(schedule.timezone)
+        starts = date_timespan(first, tzinfo=tz)[0]
+        ends = date_timespan(last, tzinfo=tz)[1]
+        for event in list(self.iterEventsStarting(starts, ends)):
+            if getattr(event, 'schedule', None) is not schedule:
+                continue
+            if period is not None and event.period is not period:
+                continue
+            yield event
+
+    def updateSchedule(self, schedule, first=None, last=None, period=None):
+        """Synchronise events with the schedule.
+
+        If first and last dates are given, only events scheduled on those
+        dates (and, optionally, for the given period) are synchronised.
+        """
         schedule = removeSecurityProxy(schedule)
         schedule_cal = interfaces.IImmutableScheduleCalendar(schedule)
         if schedule_cal is None:
             self.removeSchedule(schedule)
             return
 
-        old_events = dict(
-            [(e.unique_id, e) for e in removeSecurityProxy(self)
-              if e.schedule is schedule])
-
-        new_events = dict([(e.unique_id, e) for e in schedule_cal])
+        partial = (first is not None or last is not None or
+                   period is not None)
+        if schedule.first is None or schedule.last is None:
+            partial = False # empty schedule, drop all events
+
+        if partial:
+            if first is None:
+                first = schedule.first
+            if last is None:
+                last = schedule.last
+            old_events = dict(
+                [(e.unique_id, e)
+                 for e in self.iterScheduleEvents(
+                        schedule, first, last, period=period)])
+            new_events = dict(
+                [(e.unique_id, e)
+                 for e in schedule_cal.createEvents(
+                        max(first, schedule.first), min(last, schedule.last))
+                 if period is None or e.period is period])
+        else:
+            old_events = dict(
+                [(e.unique_id, e) for e in removeSecurityProxy(self)
+                  if e.schedule is schedule])
+            new_events = dict([(e.unique_id, e) for e in schedule_cal])
 
         old_set = set(old_events)
         new_set = set(new_events)
@@ -180,19 +245,37 @@ def getScheduleCalendar(owner):
 getScheduleCalendar.factory = ScheduleCalendar
 
 
+def invalidateMeetingCache(container):
+    container = removeSecurityProxy(container)
+    invalidate = getattr(container, 'invalidateMeetingCache', None)
+    if invalidate is not None:
+        invalidate()
+
+
 class UpdateScheduleCalendar(ObjectEventAdapterSubscriber):
     def __call__(self):
         owner = interfaces.IHaveSchedule(self.object, None)
         if owner is None:
             return
-        calendar = interfaces.IScheduleCalendar(owner, None)
-        if calendar is None:
-            return
         container = interfaces.IScheduleContainer(owner, None)
         if container is None:
             return
+        invalidateMeetingCache(container)
+        calendar = interfaces.IScheduleCalendar(owner, None)
+        if calendar is None:
+            return
 
-        calendar.updateSchedule(container)
+        modifications = [
+            description
+            for description in getattr(self.event, 'descriptions', ())
+            if interfaces.IScheduleModification.providedBy(description)]
+        if not modifications:
+            calendar.updateSchedule(container)
+            return
+        for modification in modifications:
+            calendar.updateSchedule(
+                container, first=modification.first, last=modification.last,
+                period=modification.period)
 
 
 class RemoveScheduleCalendar(ObjectEventAdapterSubscriber):
@@ -200,11 +283,12 @@ class RemoveScheduleCalendar(ObjectEventAdapterSubscriber):
         owner = interfaces.IHaveSchedule(self.object, None)
         if owner is None:
             return
-        calendar = interfaces.IScheduleCalendar(owner, None)
-        if calendar is None:
-            return
         container = interfaces.IScheduleContainer(owner, None)
         if container is None:
             return
+        invalidateMeetingCache(container)
+        calendar = interfaces.IScheduleCalendar(owner, None)
+        if calendar is None:
+            return
         calendar.removeSchedule(self.object)
 
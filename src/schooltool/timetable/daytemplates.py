@@ -145,12 +145,11 @@ class SchoolDayTemplates(DayTemplateSchedule):
             return day_index
 
         if date > schedule.first:
-            skip_dates = DateRange(schedule.first, date - date.resolution)
+            skipped_schooldays = schooldays.countDates(
+                schedule.first, date - date.resolution)
         else:
-            skip_dates = DateRange(date + date.resolution, schedule.first)
-        skipped_schooldays = len(list(schooldays.iterDates(skip_dates)))
-        if date < schedule.first:
-            skipped_schooldays = -skipped_schooldays
+            skipped_schooldays = -schooldays.countDates(
+                date + date.resolution, schedule.first)
 
         day_index = (day_index + skipped_schooldays) % len(self.templates)
         return day_index
@@ -27,6 +27,7 @@ from zope.interface import Interface, Attribute
 from zope.container.constraints import contains
 from zope.container.interfaces import IContainer, IOrderedContainer
 from zope.container.interfaces import IContained
+from zope.lifecycleevent.interfaces import IModificationDescription
 
 from schooltool.app.interfaces import ISchoolToolCalendarEvent
 from schooltool.app.interfaces import ISchoolToolCalendar
@@ -114,7 +115,7 @@ class ISchedule(Interface):
         required=True)
 
     def iterMeetings(date, until_date=None):
-        """Yields meetings for the given date range."""
+        """Yields meetings for the given date range, ordered by dtstart."""
 
 
 class IMeetingException(IMeeting):
@@ -142,6 +143,24 @@ class IScheduleExceptions(Interface):
         """Yields meetings disregarding exception dates."""
 
 
+class IScheduleModification(IModificationDescription):
+    """Description of dates affected by a schedule modification.
+
+    Passed to IObjectModifiedEvent so that schedule calendars can be
+    synchronised only where meetings may have changed.
+    """
+
+    first = zope.schema.Date(
+        title=u"First affected day",
+        required=True)
+
+    last = zope.schema.Date(
+        title=u"Last affected day",
+        required=True)
+
+    period = Attribute("Affected period, or None for all periods.")
+
+
 class IScheduleWithExceptions(ISchedule, IScheduleExceptions):
     """Schedule with exception days."""
 
@@ -235,6 +254,9 @@ class ISchooldays(Interface):
     def iterDates(dates):
         """Iterate dates that are schooldays."""
 
+    def countDates(first, last):
+        """Return the number of schooldays from first to last, inclusive."""
+
     def __iter__():
         """Yield all schoolday dates."""
 
@@ -302,6 +324,12 @@ class ISelectedPeriodsScheduleRead(ISchedule):
     def hasPeriod(period):
         """Is the period added to this schedule."""
 
+    def periodModifications(periods):
+        """Describe meetings changed by adding or removing the periods.
+
+        Returns a list of IScheduleModification.
+        """
+
 
 class ISelectedPeriodsScheduleWrite(Interface):
 
@@ -18,10 +18,12 @@
 """
 Scheduling of meetings.
 """
+import heapq
+import itertools
 import pytz
 import datetime
 from persistent import Persistent
-from persistent.dict import PersistentDict
+from BTrees.OOBTree import OOBTree
 
 from zope.component import getUtility
 from zope.container.contained import Contained
@@ -31,6 +33,7 @@ from zope.interface import implements
 from zope.proxy import sameProxiedObjects
 
 from schooltool.common import DateRange
+from schooltool.schoolyear.interfaces import ISchoolYear
 from schooltool.timetable import interfaces
 
 
@@ -94,6 +97,17 @@ class MeetingException(Persistent, Meeting):
             self._period_id = int_ids.getId(value)
 
 
+class ScheduleModification(object):
+    implements(interfaces.IScheduleModification)
+
+    def __init__(self, first, last=None, period=None):
+        if last is None:
+            last = first
+        self.first = first
+        self.last = last
+        self.period = period
+
+
 class Schedule(Contained):
     """A non-persistent abstract schedule."""
     implements(interfaces.ISchedule)
@@ -143,31 +157,58 @@ def iterMeetingsInTimezone(schedule, other_timezone, date, until_date=None):
             yield meeting
 
 
+def mergeMeetings(streams):
+    """Merge meeting streams, each ordered by dtstart, into one.
+
+    Meetings that start at the same time keep the order of the streams.
+    """
+    def decorate(n, meetings):
+        counter = itertools.count()
+        for meeting in meetings:
+            yield (meeting.dtstart, n, counter.next()), meeting
+    decorated = [decorate(n, meetings) for n, meetings in enumerate(streams)]
+    for key, meeting in heapq.merge(*decorated):
+        yield meeting
+
+
+def iterExceptionDays(exceptions, date, until_date):
+    """Return ordered (date, meetings) of exception days in the range."""
+    if isinstance(exceptions, OOBTree):
+        return exceptions.items(date, until_date)
+    return sorted([(day, meetings) for day, meetings in exceptions.items()
+                   if date <= day <= until_date])
+
+
 def iterMeetingsWithExceptions(meetings, exceptions, timezone,
                                date, until_date=None):
+    """Replace meetings on exception days with the exception meetings.
+
+    Meetings must be ordered by dtstart.
+    """
     if until_date is None:
         until_date = date
 
-    by_date = {}
-    for d in DateRange(date, until_date):
-        if d in exceptions:
-            by_date[d] = list(exceptions[d])
-
     tz = pytz.timezone(timezone)
+    exception_days = iter(iterExceptionDays(exceptions, date, until_date))
+    next_day = next(exception_days, None)
 
     for original_meeting in meetings:
         meeting_date = original_meeting.dtstart.astimezone(tz).date()
 
+        while next_day is not None and next_day[0] <= meeting_date:
+            for meeting in sorted(next_day[1], key=lambda m: m.dtstart):
+                yield meeting
+            next_day = next(exception_days, None)
+
         if meeting_date in exceptions:
             continue
 
-        if meeting_date not in by_date:
-            by_date[meeting_date] = list()
-        by_date[meeting_date].append(original_meeting)
+        yield original_meeting
 
-    for d in sorted(by_date):
-        for meeting in sorted(by_date[d], key=lambda m: m.dtstart):
+    while next_day is not None:
+        for meeting in sorted(next_day[1], key=lambda m: m.dtstart):
             yield meeting
+        next_day = next(exception_days, None)
 
 
 class ScheduleContainer(BTreeContainer):
@@ -179,7 +220,7 @@ class ScheduleContainer(BTreeContainer):
     def __init__(self, timezone='UTC'):
         BTreeContainer.__init__(self)
         self.timezone = timezone
-        self.exceptions = PersistentDict()
+        self.exceptions = OOBTree()
 
     @property
     def first(self):
@@ -193,19 +234,68 @@ class ScheduleContainer(BTreeContainer):
                  if schedule.last is not None]
         return dates and max(dates) or None
 
-    def iterOriginalMeetings(self, date, until_date=None):
-        if until_date is None:
-            until_date = date
-        meetings = []
+    _meetings_version = 0
+
+    def invalidateMeetingCache(self):
+        """Forget cached meetings after schedules or exceptions change."""
+        self._meetings_version += 1
+
+    def _meetingCacheKey(self):
+        key = [self._meetings_version, self.timezone]
+        owner = interfaces.IHaveSchedule(self, None)
+        if owner is not None:
+            schoolyear = ISchoolYear(owner, None)
+        else:
+            schoolyear = None
+        if schoolyear is not None:
+            for term in schoolyear.values():
+                if term._p_changed:
+                    return None # schooldays changed in this transaction
+                key.append(term._p_serial)
+        return tuple(key)
+
+    def _getMeetingCache(self):
+        key = self._meetingCacheKey()
+        if key is None:
+            return None
+        cache = getattr(self, '_v_meeting_cache', None)
+        if cache is None or cache[0] != key:
+            cache = self._v_meeting_cache = (key, {})
+        return cache[1]
+
+    def _collectOriginalMeetings(self, date, until_date):
+        streams = []
         for schedule in self.values():
             if not sameProxiedObjects(schedule.__parent__, self):
                 # We are likely in the process of deleting/moving
                 # this schedule.  Ignore.
                 continue
-            tt_meetings = iterMeetingsInTimezone(
-                schedule, self.timezone, date, until_date=until_date)
-            meetings.extend(list(tt_meetings))
-        return sorted(meetings, key=lambda m: m.dtstart)
+            streams.append(iterMeetingsInTimezone(
+                schedule, self.timezone, date, until_date=until_date))
+        return mergeMeetings(streams)
+
+    def iterOriginalMeetings(self, date, until_date=None):
+        if until_date is None:
+            until_date = date
+        cache = self._getMeetingCache()
+        if cache is None:
+            return self._collectOriginalMeetings(date, until_date)
+        missing = [day for day in DateRange(date, until_date)
+                   if day not in cache]
+        if missing:
+            by_date = dict([(day, [])
+                            for day in DateRange(missing[0], missing[-1])])
+            tz = pytz.timezone(self.timezone)
+            for meeting in self._collectOriginalMeetings(
+                missing[0], missing[-1]):
+                day = meeting.dtstart.astimezone(tz).date()
+                by_date.setdefault(day, []).append(meeting)
+            for day, meetings in by_date.items():
+                cache[day] = tuple(meetings)
+        meetings = []
+        for day in DateRange(date, until_date):
+            meetings.extend(cache[day])
+        return meetings
 
     def iterMeetings(self, date, until_date=None):
         meetings = self.iterOriginalMeetings(date, until_date=until_date)
@@ -30,7 +30,9 @@ from zope.component import provideUtility, provideAdapter
 from test_schedule import ScheduleStub
 
 from schooltool.timetable.calendar import ImmutableScheduleCalendar
+from schooltool.timetable.calendar import ScheduleCalendar
 from schooltool.timetable.interfaces import IHaveSchedule
+from schooltool.timetable.interfaces import IImmutableScheduleCalendar
 
 
 class ImmutableScheduleCalendarForTest(ImmutableScheduleCalendar):
@@ -88,6 +90,90 @@ def test_ImmutableScheduleCalendar():
         Math on 2011-10-31 03:00 UTC
         Math on 2011-10-31 21:55 UTC
 
+    Expanding the calendar only generates meetings around the given
+    time period.
+
+        >>> class LoggingScheduleStub(ScheduleStub):
+        ...     def iterMeetings(self, start_date, until_date=None):
+        ...         print 'Meetings from', start_date, 'to', until_date
+        ...         return ScheduleStub.iterMeetings(
+        ...             self, start_date, until_date=until_date)
+        >>> provideAdapter(lambda s: Math, (LoggingScheduleStub, ),
+        ...                IHaveSchedule)
+
+        >>> cal = ImmutableScheduleCalendarForTest(
+        ...     LoggingScheduleStub(timezone='Europe/Vilnius'))
+        >>> print_events(cal.expand(
+        ...     datetime(2011, 10, 30, 0, 0, tzinfo=pytz.UTC),
+        ...     datetime(2011, 10, 31, 0, 0, tzinfo=pytz.UTC)))
+        Meetings from 2011-10-29 to 2011-10-31
+        Math on 2011-10-30 03:00 UTC
+        Math on 2011-10-30 21:55 UTC
+        Math on 2011-10-30 22:05 UTC
+
+        >>> list(cal.expand(
+        ...     datetime(2011, 12, 1, 0, 0, tzinfo=pytz.UTC),
+        ...     datetime(2011, 12, 2, 0, 0, tzinfo=pytz.UTC)))
+        []
+
+    """
+
+
+def test_ScheduleCalendar_updateSchedule():
+    """Tests for ScheduleCalendar.updateSchedule.
+
+    Let's take a schedule with a single meeting every day.
+
+        >>> class Math(object):
+        ...     title = 'Math'
+        >>> math = Math()
+        >>> provideAdapter(lambda s: math, (ScheduleStub, ), IHaveSchedule)
+        >>> provideAdapter(ImmutableScheduleCalendarForTest,
+        ...                (ScheduleStub, ), IImmutableScheduleCalendar)
+
+        >>> schedule = ScheduleStub(timezone='Europe/Vilnius')
+        >>> schedule.meeting_times = (time(10, 0), )
+
+        >>> calendar = ScheduleCalendar(math)
+        >>> calendar.updateSchedule(schedule)
+        >>> print_events(sorted(calendar))
+        Math on 2011-10-29 07:00 UTC
+        Math on 2011-10-30 08:00 UTC
+        Math on 2011-10-31 08:00 UTC
+
+    Events on given dates can be listed without going through the whole
+    calendar.
+
+        >>> print_events(calendar.iterScheduleEvents(
+        ...     schedule, date(2011, 10, 30), date(2011, 10, 31)))
+        Math on 2011-10-30 08:00 UTC
+        Math on 2011-10-31 08:00 UTC
+
+    When the schedule changes on a single day, only that day needs to be
+    synchronised.
+
+        >>> schedule.meeting_times = (time(11, 0), )
+        >>> calendar.updateSchedule(schedule, first=date(2011, 10, 30),
+        ...                         last=date(2011, 10, 30))
+        >>> print_events(sorted(calendar))
+        Math on 2011-10-29 07:00 UTC
+        Math on 2011-10-30 09:00 UTC
+        Math on 2011-10-31 08:00 UTC
+
+    Full synchronisation catches up with the rest.
+
+        >>> calendar.updateSchedule(schedule)
+        >>> print_events(sorted(calendar))
+        Math on 2011-10-29 08:00 UTC
+        Math on 2011-10-30 09:00 UTC
+        Math on 2011-10-31 09:00 UTC
+
+    Dates outside the schedule are ignored.
+
+        >>> calendar.updateSchedule(schedule, first=date(2011, 11, 5))
+        >>> len(calendar)
+        3
+
     """
 
 
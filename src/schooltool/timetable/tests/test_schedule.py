@@ -294,6 +294,132 @@ def test_iterMeetingsInTimezone_localized_schedule():
     """
 
 
+def test_mergeMeetings():
+    """Tests for mergeMeetings.
+
+        >>> from schooltool.timetable.schedule import Meeting, mergeMeetings
+        >>> from datetime import datetime, timedelta
+
+        >>> def meetings(title, *hours):
+        ...     return [Meeting(datetime(2011, 10, 29, hour, tzinfo=pytz.UTC),
+        ...                     timedelta(0, 900), meeting_id=title)
+        ...             for hour in hours]
+
+    Streams ordered by start are merged lazily into one ordered stream.
+    Meetings that start at the same time keep the order of streams.
+
+        >>> merged = mergeMeetings([iter(meetings('a', 9, 12, 14)),
+        ...                         iter(meetings('b', 8, 12)),
+        ...                         iter([])])
+        >>> merged
+        <generator object ...>
+
+        >>> for meeting in merged:
+        ...     print meeting.meeting_id, meeting.dtstart.hour
+        b 8
+        a 9
+        a 12
+        b 12
+        a 14
+
+    """
+
+
+def test_iterMeetingsWithExceptions():
+    """Tests for iterMeetingsWithExceptions.
+
+        >>> from BTrees.OOBTree import OOBTree
+        >>> from schooltool.timetable.schedule import Meeting
+        >>> from schooltool.timetable.schedule import iterMeetingsWithExceptions
+        >>> from datetime import datetime, timedelta
+
+        >>> def meeting(title, day, hour):
+        ...     return Meeting(datetime(2011, 10, day, hour, tzinfo=pytz.UTC),
+        ...                    timedelta(0, 900), meeting_id=title)
+
+        >>> meetings = [meeting('a', 28, 9), meeting('b', 29, 9),
+        ...             meeting('c', 29, 23), meeting('d', 31, 9)]
+
+    Meetings of exception days are replaced, and exception days without
+    original meetings are included too.
+
+        >>> exceptions = OOBTree()
+        >>> exceptions[date(2011, 10, 27)] = [meeting('x', 27, 9)]
+        >>> exceptions[date(2011, 10, 29)] = [meeting('y', 29, 12),
+        ...                                   meeting('z', 29, 8)]
+        >>> exceptions[date(2011, 10, 30)] = []
+        >>> exceptions[date(2011, 11, 1)] = [meeting('w', 31, 23)]
+
+        >>> def titles(meetings):
+        ...     return [m.meeting_id for m in meetings]
+
+        >>> titles(iterMeetingsWithExceptions(
+        ...     iter(meetings), exceptions, 'UTC',
+        ...     date(2011, 10, 28), date(2011, 11, 1)))
+        ['a', 'z', 'y', 'd', 'w']
+
+        >>> titles(iterMeetingsWithExceptions(
+        ...     iter(meetings[:3]), exceptions, 'UTC',
+        ...     date(2011, 10, 26), date(2011, 10, 29)))
+        ['x', 'a', 'z', 'y']
+
+    Day boundaries are in the given timezone.
+
+        >>> titles(iterMeetingsWithExceptions(
+        ...     iter(meetings[:3]), exceptions, 'Europe/Vilnius',
+        ...     date(2011, 10, 28), date(2011, 10, 30)))
+        ['a', 'z', 'y']
+
+    Plain dictionaries work too.
+
+        >>> titles(iterMeetingsWithExceptions(
+        ...     iter(meetings[1:3]), dict(exceptions.items()), 'UTC',
+        ...     date(2011, 10, 29)))
+        ['z', 'y']
+
+    """
+
+
+def test_ScheduleContainer_meeting_cache():
+    """Tests for ScheduleContainer meeting cache.
+
+        >>> from schooltool.timetable.schedule import ScheduleContainer
+
+        >>> class CountingScheduleStub(ScheduleStub):
+        ...     def iterMeetings(self, start_date, until_date=None):
+        ...         print 'Meetings from', start_date, 'to', until_date
+        ...         return ScheduleStub.iterMeetings(
+        ...             self, start_date, until_date=until_date)
+
+        >>> container = ScheduleContainer()
+        >>> container['s'] = CountingScheduleStub()
+
+    Original meetings are generated once per date.
+
+        >>> pprint(container.iterOriginalMeetings(date(2011, 10, 29)))
+        Meetings from 2011-10-29 to None
+        [<Meeting on 2011-10-29 00:05 UTC>,
+         <Meeting on 2011-10-29 05:00 UTC>,
+         <Meeting on 2011-10-29 23:55 UTC>]
+
+        >>> len(container.iterOriginalMeetings(date(2011, 10, 29)))
+        3
+
+        >>> len(container.iterOriginalMeetings(
+        ...     date(2011, 10, 29), date(2011, 10, 31)))
+        Meetings from 2011-10-30 to 2011-10-31
+        9
+
+    Invalidation forgets them.
+
+        >>> container.invalidateMeetingCache()
+        >>> len(container.iterOriginalMeetings(date(2011, 10, 29)))
+        Meetings from 2011-10-29 to None
+        3
+
+    """
+
+
 def setUp(test=None):
     pass
 
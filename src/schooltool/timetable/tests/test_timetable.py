@@ -219,6 +219,146 @@ def test_Timetable_duplicate_time_slot():
     """
 
 
+def test_Timetable_day_patterns():
+    """Tests for day patterns of Timetable.
+
+    Days that follow the same templates are worked out once per
+    expansion.
+
+        >>> class CountingTimetable(TimetableForTests):
+        ...     def getDayPattern(self, day_periods, day_time_slots):
+        ...         print 'Pattern of', day_periods.title
+        ...         return TimetableForTests.getDayPattern(
+        ...             self, day_periods, day_time_slots)
+
+        >>> tt = CountingTimetable(
+        ...     date(2011, 10, 28), date(2011, 11, 1),
+        ...     timezone='Europe/Vilnius')
+        >>> tt.setUp(periods=['A', 'B'], time_slots=[time(2, 30), time(9, 0)])
+
+        >>> pprint(tt.getDayPattern(tt.periods.default, tt.time_slots.default))
+        Pattern of Day 1
+        [(datetime.time(2, 30), datetime.timedelta(0, 900), <...Period ...>, u'A'),
+         (datetime.time(9, 0), datetime.timedelta(0, 900), <...Period ...>, u'B')]
+
+        >>> meetings = list(tt.iterOriginalMeetings(tt.first, tt.last))
+        Pattern of Day 1
+
+        >>> for meeting in meetings:
+        ...     print meeting.meeting_id, meeting.dtstart
+        2011-10-28.A 2011-10-28 02:30:00+03:00
+        2011-10-28.B 2011-10-28 09:00:00+03:00
+        2011-10-29.A 2011-10-29 02:30:00+03:00
+        2011-10-29.B 2011-10-29 09:00:00+03:00
+        2011-10-30.A 2011-10-30 02:30:00+03:00
+        2011-10-30.B 2011-10-30 09:00:00+02:00
+        2011-10-31.A 2011-10-31 02:30:00+02:00
+        2011-10-31.B 2011-10-31 09:00:00+02:00
+        2011-11-01.A 2011-11-01 02:30:00+02:00
+        2011-11-01.B 2011-11-01 09:00:00+02:00
+
+    """
+
+
+def test_SelectedPeriodsSchedule_periodModifications():
+    """Tests for SelectedPeriodsSchedule.periodModifications.
+
+    Adding or removing periods changes only the meetings of those periods.
+
+        >>> from schooltool.timetable.timetable import SelectedPeriodsSchedule
+        >>> tt = TimetableForTests(date(2011, 9, 1), date(2011, 12, 31))
+        >>> tt.setUp(periods=['A', 'B', 'C'],
+        ...          time_slots=[time(9, 0), time(10, 0), time(11, 0)])
+        >>> a, b, c = [tt.periods.default[key] for key in ['1', '2', '3']]
+
+        >>> schedule = SelectedPeriodsSchedule(
+        ...     tt, date(2011, 9, 1), date(2011, 10, 31))
+
+        >>> def describe(modifications):
+        ...     for modification in modifications:
+        ...         print modification.first, modification.last,
+        ...         print modification.period.title
+
+        >>> describe(schedule.periodModifications([a, c]))
+        2011-09-01 2011-10-31 A
+        2011-09-01 2011-10-31 C
+
+    When consecutive periods are scheduled as one meeting, the meeting of
+    the following period changes as well.
+
+        >>> schedule.consecutive_periods_as_one = True
+        >>> describe(schedule.periodModifications([a]))
+        2011-09-01 2011-10-31 A
+        2011-09-01 2011-10-31 B
+        >>> describe(schedule.periodModifications([b, a]))
+        2011-09-01 2011-10-31 B
+        2011-09-01 2011-10-31 C
+        2011-09-01 2011-10-31 A
+        >>> describe(schedule.periodModifications([c]))
+        2011-09-01 2011-10-31 C
+
+    """
+
+
+def test_SchoolDayTemplates_getDayIndex():
+    """Tests for SchoolDayTemplates.getDayIndex.
+
+    Day templates rotate on schooldays, starting with starting_index on
+    the first day of the schedule.
+
+        >>> from schooltool.timetable.daytemplates import SchoolDayTemplates
+        >>> templates = SchoolDayTemplates()
+        >>> templates.initTemplates()
+        >>> for title in ['A', 'B', 'C']:
+        ...     templates.templates[title] = DayTemplate(title)
+        >>> templates.starting_index = 1
+
+        >>> class SchooldaysStub(object):
+        ...     def __init__(self, *terms):
+        ...         self.terms = terms
+        ...     def __contains__(self, date):
+        ...         return (date.weekday() < 5 and
+        ...                 bool([term for term in self.terms if date in term]))
+        ...     def countDates(self, first, last):
+        ...         return len([date for date in DateRange(first, last)
+        ...                     if date in self])
+
+    There is a gap between the two terms.
+
+        >>> schooldays = SchooldaysStub(
+        ...     DateRange(date(2011, 9, 1), date(2011, 9, 16)),
+        ...     DateRange(date(2011, 10, 3), date(2011, 10, 14)))
+        >>> schedule = ScheduleStub(first=date(2011, 9, 5),
+        ...                         last=date(2011, 10, 14))
+
+        >>> def printIndexes(*dates):
+        ...     for day in dates:
+        ...         print day, templates.getDayIndex(schedule, schooldays, day)
+
+    Schooldays before the first day of the schedule rotate backwards.
+
+        >>> printIndexes(date(2011, 9, 1), date(2011, 9, 2), date(2011, 9, 5))
+        2011-09-01 2
+        2011-09-02 0
+        2011-09-05 1
+
+    Weekends are skipped after it.
+
+        >>> printIndexes(date(2011, 9, 6), date(2011, 9, 9), date(2011, 9, 12))
+        2011-09-06 2
+        2011-09-09 2
+        2011-09-12 0
+
+    The rotation carries on across the gap between terms.
+
+        >>> printIndexes(date(2011, 9, 16), date(2011, 10, 3), date(2011, 10, 4))
+        2011-09-16 1
+        2011-10-03 2
+        2011-10-04 0
+
+    """
+
+
 def setUp(test=None):
     setup.placelessSetUp()
     provideUtility(object(), IIntIds)
@@ -24,13 +24,15 @@ import urllib
 
 from persistent import Persistent
 from persistent.list import PersistentList
-from persistent.dict import PersistentDict
+from BTrees.OOBTree import OOBTree
 from zope.interface import implements
 from zope.container.btree import BTreeContainer
 
 from schooltool.common import DateRange
 from schooltool.timetable import interfaces
 from schooltool.timetable.schedule import Meeting, Schedule
+from schooltool.timetable.schedule import ScheduleModification
+from schooltool.timetable.schedule import date_timespan
 from schooltool.timetable.schedule import iterMeetingsInTimezone
 from schooltool.timetable.schedule import iterMeetingsWithExceptions
 
@@ -45,19 +47,30 @@ class Timetable(Persistent, Schedule):
     def __init__(self, *args, **kw):
         Persistent.__init__(self)
         Schedule.__init__(self, *args, **kw)
-        self.exceptions = PersistentDict()
+        self.exceptions = OOBTree()
 
-    def periodMeetingId(self, date, period, meeting_n):
-        date_id = date.isoformat()
+    def periodMeetingTitle(self, period, meeting_n):
         title = unicode(meeting_n)
         if (period is not None and
             period.title and
             period.title.strip()):
             title = unicode(period.title.strip())
             title = urllib.quote(title.encode('punycode'))
+        return title
+
+    def periodMeetingId(self, date, period, meeting_n):
+        date_id = date.isoformat()
+        title = self.periodMeetingTitle(period, meeting_n)
         uid = '%s.%s' % (date_id, title)
         return uid
 
+    def getDayPattern(self, day_periods, day_time_slots):
+        """Return (tstart, duration, period, meeting title) of a day."""
+        day = combineTemplates(day_periods, day_time_slots)
+        return [(time_slot.tstart, time_slot.duration, period,
+                 self.periodMeetingTitle(period, n+1))
+                for n, (period, time_slot) in enumerate(day)]
+
     def iterOriginalMeetings(self, from_date, until_date=None):
         if until_date is None:
             until_date = from_date
@@ -67,20 +80,41 @@ class Timetable(Persistent, Schedule):
         days = zip(dates,
                    self.periods.iterDates(dates),
                    self.time_slots.iterDates(dates))
+        # Days of a timetable follow a handful of templates, so each
+        # combination is only worked out once.
+        patterns = {}
         for day_date, day_periods, day_time_slots in days:
             if not day_periods:
                 continue
-            day = combineTemplates(day_periods, day_time_slots)
-            for n, (period, time_slot) in enumerate(day):
-                tstart = time_slot.tstart
+            key = (id(day_periods), id(day_time_slots))
+            pattern = patterns.get(key)
+            if pattern is None:
+                pattern = patterns[key] = self.getDayPattern(
+                    day_periods, day_time_slots)
+            if not pattern:
+                continue
+            day_start, day_end = date_timespan(day_date, tzinfo=timezone)
+            if day_start.utcoffset() == day_end.utcoffset():
+                tzinfo = day_start.tzinfo
+            else:
+                tzinfo = None # clocks change during this day
+            date_id = day_date.isoformat()
+            day_meetings = []
+            for tstart, duration, period, title in pattern:
                 dtstart = datetime.datetime.combine(day_date, tstart)
-                dtstart = timezone.localize(dtstart)
+                if tzinfo is not None:
+                    dtstart = dtstart.replace(tzinfo=tzinfo)
+                else:
+                    dtstart = timezone.localize(dtstart)
                 # Note we're using dates in timetable's timezone here
-                meeting_id = self.periodMeetingId(day_date, period, n+1)
-                meeting = Meeting(
-                    dtstart, time_slot.duration,
+                day_meetings.append(Meeting(
+                    dtstart, duration,
                     period=period,
-                    meeting_id=meeting_id)
+                    meeting_id='%s.%s' % (date_id, title)))
+            if tzinfo is None:
+                # Times skipped by the clock change may fall out of order.
+                day_meetings.sort(key=lambda m: m.dtstart)
+            for meeting in day_meetings:
                 yield meeting
 
     def iterMeetings(self, date, until_date=None):
@@ -181,6 +215,24 @@ class SelectedPeriodsSchedule(Persistent, Schedule):
         if key in self._periods:
             self._periods.remove(key)
 
+    def periodModifications(self, periods):
+        """Describe the meetings changed by adding or removing periods."""
+        affected = []
+        for period in periods:
+            changed = [period]
+            if self.consecutive_periods_as_one:
+                # The next period may be merged into this one.
+                day = period.__parent__
+                period_ids = list(day.keys())
+                idx = period_ids.index(period.__name__)
+                if idx + 1 < len(period_ids):
+                    changed.append(day[period_ids[idx + 1]])
+            for other in changed:
+                if other not in affected:
+                    affected.append(other)
+        return [ScheduleModification(self.first, self.last, period)
+                for period in affected]
+
     def iterMeetings(self, date, until_date=None):
         if self.timetable is None:
             return